@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+os.environ.setdefault('TELEGRAM_TOKEN', '123456:BENCHMARK')
+os.environ.setdefault('SUSPENSE_MODE', 'off')
+os.environ.setdefault('DB_NAME', os.path.join(tempfile.mkdtemp(), 'benchmark.db'))
+os.environ.setdefault('SEND_CHAT_RATE', '0')
+os.environ.setdefault('SEND_GLOBAL_RATE', '0')
+# Логи прогона не нужны в директории logs проекта, а запись каждого обновления искажает замеры
+os.environ.setdefault('LOG_DIR', tempfile.mkdtemp())
+os.environ.setdefault('LOG_UPDATES', 'false')
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from config import STORAGE_BACKEND
+from db import init_db, storage, session_cache
+from bot import dp
+from utils.send_scheduler import send_scheduler
+from utils.fake_telegram import FakeSession, make_message_update, make_callback_update, iter_buttons
+
+
+#####################################################################################
+# percentile
+def percentile(values, percent):
+    """ Возвращает перцентиль percent (0-100) отсортированного списка значений. """
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+#####################################################################################
+# play_quiz
+async def play_quiz(bot, session, user_id, latencies):
+    """
+    Проходит квиз за одного пользователя, передавая обновления прямо в диспетчер.
+
+    Сценарий: /start, "Начать игру", ответы на все вопросы случайными кнопками, "Результаты".
+    Время обработки каждого обновления сохраняется в latencies по типу обновления.
+    """
+    async def feed(kind, update):
+        started = time.perf_counter()
+        await dp.feed_raw_update(bot, update)
+        latencies[kind].append(time.perf_counter() - started)
+
+    await feed('start', make_message_update(user_id, "/start"))
+    await feed('new_quiz', make_message_update(user_id, "Начать игру"))
+    message = session.last_markup.get(user_id)
+    while message is not None:
+        await feed('answer', make_callback_update(user_id, message, random.choice(list(iter_buttons(message)))))
+        next_message = session.last_markup.get(user_id)
+        message = next_message if next_message is not message else None
+    await feed('results', make_message_update(user_id, "Результаты"))
+
+
+#####################################################################################
+# main
+async def main():
+    """
+    Нагрузочный тест конвейера обработчиков без сети.
+
+    Запускает настоящий Dispatcher из bot.py с ботом на FakeSession и временной базой данных
+    (или хранилищем в памяти при STORAGE_BACKEND=memory),
+    параллельно проходит квиз за N пользователей и печатает пропускную способность,
+    задержки обработки (p50/p95/p99) и количество обращений к базе на обновление.
+    """
+    parser = argparse.ArgumentParser(description="Нагрузочный тест обработчиков квиза")
+    parser.add_argument("--users", type=int, default=100, help="количество одновременных пользователей")
+    parser.add_argument("--api-delay", type=float, default=0.0, help="задержка ответа Bot API в секундах")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора случайных ответов")
+    parser.add_argument("--max-p95", type=float, default=None,
+                        help="завершиться с ошибкой, если p95 обработки обновления больше указанного (мс)")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    session = FakeSession(delay=args.api_delay)
+    bot = Bot(token=os.environ['TELEGRAM_TOKEN'], session=session, default=DefaultBotProperties(parse_mode='HTML'))
+    latencies = defaultdict(list)
+
+    await storage.open()
+    await init_db()
+    session_cache.start()
+    storage.stats.clear()
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(play_quiz(bot, session, 1000 + user, latencies) for user in range(args.users)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await send_scheduler.stop()
+        await session_cache.stop()
+        await storage.close()
+
+    all_latencies = sorted(value for values in latencies.values() for value in values)
+    updates = len(all_latencies)
+    print(f"Пользователей: {args.users}, обновлений: {updates}, время: {elapsed:.2f} с, "
+          f"обновлений в секунду: {updates / elapsed:.1f}")
+    print(f"{'тип':<10}{'кол-во':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'сред., мс':>11}")
+    for kind, values in [*sorted(latencies.items()), ('все', all_latencies)]:
+        values = sorted(values)
+        print(f"{kind:<10}{len(values):>8}{percentile(values, 50) * 1000:>10.2f}{percentile(values, 95) * 1000:>10.2f}"
+              f"{percentile(values, 99) * 1000:>10.2f}{statistics.fmean(values) * 1000:>11.2f}")
+    print(f"Хранилище {STORAGE_BACKEND} на обновление: чтений {storage.stats['reads'] / updates:.2f}, "
+          f"записей {storage.stats['writes'] / updates:.2f}, транзакций {storage.stats['commits'] / updates:.2f}")
+    print(f"Вызовов Bot API на обновление: {sum(session.calls.values()) / updates:.2f} {dict(session.calls)}")
+
+    if args.max_p95 is not None and percentile(all_latencies, 95) * 1000 > args.max_p95:
+        print(f"p95 превышает порог {args.max_p95} мс")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
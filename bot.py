@@ -1,16 +1,48 @@
+import asyncio
+import queue
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.filters.command import Command
 from aiogram.client.default import DefaultBotProperties
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import setup_application
 from aiogram import F
-from config import TOKEN, main_logger
+from config import (TOKEN, BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT,
+                    WEBHOOK_WORKERS, WEBHOOK_MAX_PENDING, QUESTIONS_WATCH_INTERVAL, LOG_UPDATES, METRICS_HOST, METRICS_PORT,
+                    USER_MAX_PENDING, ANSWER_DEDUP_SIZE,
+                    main_logger, bot_logger, db_logger, quiz_logger)
 from handlers.start import cmd_start
-from handlers.quiz import cmd_new_quiz, restart_quiz_confirm, restart_quiz, cmd_resume_quiz, right_answer, wrong_answer, callback_resume_quiz
-from handlers.results import cmd_results_request
-from utils.callback_data import CallbackAnswers
+from handlers.admin import cmd_reload
+from handlers.quiz import cmd_new_quiz, cmd_categories, cmd_review, restart_quiz_confirm, restart_quiz, cmd_resume_quiz, answer_question, callback_resume_quiz
+from handlers.results import cmd_results_request, cmd_top, cmd_stats
+from utils.callback_data import ANSWER_PREFIX
+from utils.webhook import BoundedRequestHandler
+from utils.middlewares import (LogContextMiddleware, HandlerContextMiddleware, UpdateMetricsMiddleware,
+                               HandlerMetricsMiddleware, UserLockMiddleware, AnswerDedupMiddleware)
+from utils.metrics import ErrorCountHandler, start_metrics_server
+from utils.send_scheduler import send_scheduler
+from utils.questions_loader import questions_loader
+from db import session_cache, stats_refresher
 
 bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode='HTML'))
 dp = Dispatcher()
 
+# Контекст логов (пользователь, обновление, обработчик) и время обработки каждого обновления
+dp.update.outer_middleware(LogContextMiddleware(bot_logger if LOG_UPDATES else None))
+dp.message.middleware(HandlerContextMiddleware())
+dp.callback_query.middleware(HandlerContextMiddleware())
+
+# Метрики: количество обновлений по типу, время и ошибки обработчиков, ошибки в логах
+dp.update.outer_middleware(UpdateMetricsMiddleware())
+dp.message.middleware(HandlerMetricsMiddleware())
+dp.callback_query.middleware(HandlerMetricsMiddleware())
+for logger in (main_logger, bot_logger, db_logger, quiz_logger):
+    logger.addHandler(ErrorCountHandler())
+
+# Повторные нажатия на кнопку ответа отбрасываются, обновления одного пользователя обрабатываются по очереди
+dp.update.outer_middleware(AnswerDedupMiddleware(ANSWER_DEDUP_SIZE))
+dp.update.outer_middleware(UserLockMiddleware(USER_MAX_PENDING, logger=bot_logger))
+
 #####################################################################################
 # Регистрация событий
 
@@ -20,18 +52,17 @@ dp.message.register(cmd_start, Command("start"))
 # Слушатели начала квиза
 dp.message.register(cmd_new_quiz, F.text == "Начать игру")
 dp.message.register(cmd_new_quiz, Command("quiz"))
+dp.message.register(cmd_categories, Command("categories"))
+
+# Слушатель повторения неправильно отвеченных вопросов
+dp.message.register(cmd_review, Command("review"))
 
 # Слушатели продолжения квиза
 dp.message.register(cmd_resume_quiz, F.text == "Продолжить игру")
 dp.message.register(cmd_resume_quiz, Command("resume"))
 
-# Слушатель правильного ответа
-# dp.callback_query.register(right_answer, F.data == "right_answer")
-dp.callback_query.register(right_answer, CallbackAnswers.filter(F.is_correct == "r"))
-
-# Слушатель не правильного ответа
-# dp.callback_query.register(wrong_answer, F.data == "w")
-dp.callback_query.register(wrong_answer, CallbackAnswers.filter(F.is_correct == "w"))
+# Слушатель ответа на вопрос (подписанные данные кнопки, см. utils/callback_data.py)
+dp.callback_query.register(answer_question, F.data.startswith(f"{ANSWER_PREFIX}:"))
 
 # Слушатели перезапуска квиза
 dp.message.register(restart_quiz_confirm, F.text == "Начать заново")
@@ -44,6 +75,13 @@ dp.callback_query.register(
 dp.message.register(cmd_results_request, F.text == "Результаты")
 dp.message.register(cmd_results_request, Command("results"))
 
+# Слушатели рейтинга и статистики
+dp.message.register(cmd_top, Command("top"))
+dp.message.register(cmd_stats, Command("stats"))
+
+# Слушатель перезагрузки вопросов администратором
+dp.message.register(cmd_reload, Command("reload"))
+
 
 #####################################################################################
 # start_bot
@@ -52,18 +90,150 @@ def on_startup():
     main_logger.info("Запуск бота... Успешно")
 
 
-async def start_bot():
+async def set_webhook(bot: Bot):
+    """ Регистрирует адрес вебхука в Telegram, если задан WEBHOOK_URL. """
+    if WEBHOOK_URL:
+        await bot.set_webhook(f"{WEBHOOK_URL}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET)
+        main_logger.info(f"Вебхук установлен: {WEBHOOK_URL}{WEBHOOK_PATH}")
+
+
+def create_webhook_app(bot: Bot):
+    """
+    Создает aiohttp-приложение, принимающее обновления от Telegram через вебхук.
+
+    Args:
+        bot (Bot): Экземпляр бота, от имени которого обрабатываются обновления.
+
+    Returns:
+        web.Application: Приложение с обработчиком вебхука по пути WEBHOOK_PATH.
+    """
+    app = web.Application()
+    handler = BoundedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=WEBHOOK_SECRET,
+        workers=WEBHOOK_WORKERS,
+        max_pending=WEBHOOK_MAX_PENDING
+    )
+    handler.register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(bot: Bot):
+    """
+    Запускает веб-сервер вебхука и работает до отмены задачи.
+
+    Args:
+        bot (Bot): Экземпляр бота.
+    """
+    dp.startup.register(set_webhook)
+    runner = web.AppRunner(create_webhook_app(bot))
+    await runner.setup()
+    site = web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT)
+    await site.start()
+    main_logger.info(f"Вебхук слушает {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def run_update_queue(bot: Bot, updates):
+    """
+    Обрабатывает необработанные обновления из очереди процесса-шарда до получения None.
+
+    Обновления забираются из очереди в порядке поступления, и задачи для них создаются в том же
+    порядке, поэтому UserLockMiddleware сохраняет порядок обновлений каждого пользователя.
+    Одновременно обрабатывается не больше WEBHOOK_WORKERS обновлений; следующее обновление
+    забирается из очереди, только когда освобождается обработчик.
+
+    Args:
+        bot (Bot): Экземпляр бота.
+        updates (ShardQueue): Очередь обновлений шарда (см. utils/sharding.py).
+    """
+    loop = asyncio.get_running_loop()
+    workers = asyncio.Semaphore(WEBHOOK_WORKERS)
+    tasks = set()
+
+    async def feed(update):
+        try:
+            result = await dp.feed_raw_update(bot=bot, update=update)
+        finally:
+            workers.release()
+        if isinstance(result, TelegramMethod):
+            await dp.silent_call_request(bot=bot, result=result)
+
+    def start(update):
+        task = asyncio.create_task(feed(update))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    try:
+        while True:
+            # Обновление забирается из очереди только при свободном обработчике: необработанные
+            # обновления остаются в очереди шарда, по размеру которой основной процесс отвечает 503
+            await workers.acquire()
+            update = await loop.run_in_executor(None, updates.get)
+            while update is not None:
+                start(update)
+                if workers.locked():
+                    break
+                await workers.acquire()
+                try:
+                    update = updates.get_nowait()
+                except queue.Empty:
+                    workers.release()
+                    break
+            else:
+                workers.release()
+                break
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+
+
+async def start_bot(updates=None):
     """
     Запускает бота для обработки сообщений.
 
     Регистрирует функцию on_startup для выполнения при запуске бота.
-    Запускает опрос сообщений с помощью метода start_polling объекта dp.
+    Запускает фоновую запись кеша сессий, слежение за файлом с вопросами, пересчет статистики,
+    сервер метрик (если задан METRICS_PORT) и получение обновлений:
+    опросом (start_polling) или через вебхук, в зависимости от BOT_MODE, а в процессе-шарде -
+    из очереди updates, которую заполняет основной процесс.
+    После остановки дожидается отправки исходящих сообщений и записывает в базу данных
+    все несохраненные сессии.
+
+    Args:
+        updates (multiprocessing.Queue, optional): Очередь обновлений шарда.
 
     Использование:
         Вызывается для начала работы бота и запуска процесса обработки сообщений.
     """
     dp.startup.register(on_startup)
+    session_cache.start()
+    questions_loader.start_watching(QUESTIONS_WATCH_INTERVAL)
+    stats_refresher.start()
+    metrics_runner = None
     try:
-        await dp.start_polling(bot)
+        if METRICS_PORT:
+            metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+            main_logger.info(f"Метрики доступны на http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        if updates is not None:
+            await run_update_queue(bot, updates)
+        elif BOT_MODE == 'webhook':
+            await run_webhook(bot)
+        else:
+            await dp.start_polling(bot)
     except Exception as e:
         main_logger.error(f"Ошибка при запуске бота. {e}")
+    finally:
+        await questions_loader.stop_watching()
+        await stats_refresher.stop()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await send_scheduler.stop()
+        await session_cache.stop()
@@ -1,13 +1,135 @@
 from dotenv import load_dotenv
+import hashlib
+import hmac
 import os
-from utils.logger import setup_logger
+from utils.logger import setup_logger, configure_logging
+from utils.sharding import shard_db_name
 
 load_dotenv()
 
 TOKEN = os.getenv('TELEGRAM_TOKEN')
 
-DB_NAME = 'quiz_bot.db'
+# Ключ подписи данных кнопок ответа; по умолчанию выводится из токена бота через HMAC,
+# поэтому без токена его нельзя вычислить
+CALLBACK_SECRET = os.getenv('CALLBACK_SECRET') or hmac.new((TOKEN or '').encode(), b'quiz-callback-secret', hashlib.sha256).hexdigest()
 
+# Администраторы бота: идентификаторы пользователей Telegram через запятую
+ADMIN_IDS = {int(admin_id) for admin_id in os.getenv('ADMIN_IDS', '').split(',') if admin_id.strip()}
+
+# Получение обновлений: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+WEBAPP_HOST = os.getenv('WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = int(os.getenv('WEBAPP_PORT', 8080))
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 64))
+WEBHOOK_MAX_PENDING = int(os.getenv('WEBHOOK_MAX_PENDING', 1000))
+
+# Шардированный режим: при SHARDS > 1 основной процесс принимает обновления и распределяет их
+# по SHARDS процессам-обработчикам по user_id. Номер шарда SHARD_INDEX задает основной процесс;
+# у каждого шарда своя база данных (<DB_NAME>.shard<N>), свои файлы логов и порт метрик METRICS_PORT + 1 + N.
+# Существующая общая база DB_NAME по шардам не делится: если баз шардов еще нет, шардированный режим не запускается
+SHARDS = int(os.getenv('SHARDS', 1))
+SHARD_INDEX = int(os.getenv('SHARD_INDEX')) if os.getenv('SHARD_INDEX') else None
+# Максимальное количество обновлений в очереди одного шарда, после которого вебхук отвечает 503
+SHARD_MAX_PENDING = int(os.getenv('SHARD_MAX_PENDING', 1000))
+
+# Хранилище прогресса пользователей: sqlite - база данных DB_NAME,
+# memory - в памяти процесса без записи на диск (для нагрузочных тестов, данные пропадают при остановке)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+DB_NAME = os.getenv('DB_NAME', 'quiz_bot.db')
+if SHARD_INDEX is not None:
+    DB_NAME = shard_db_name(DB_NAME, SHARD_INDEX)
+DB_READERS = int(os.getenv('DB_READERS', 4))
+DB_BUSY_TIMEOUT = int(os.getenv('DB_BUSY_TIMEOUT', 5000))
+# Групповая фиксация записей: не дольше DB_WRITE_BATCH_DELAY миллисекунд или DB_WRITE_BATCH_SIZE операций
+DB_WRITE_BATCH_DELAY = float(os.getenv('DB_WRITE_BATCH_DELAY', 2))
+DB_WRITE_BATCH_SIZE = int(os.getenv('DB_WRITE_BATCH_SIZE', 200))
+
+# Файл с вопросами и интервал проверки его изменений в секундах (0 - только по команде /reload)
+QUESTIONS_FILE = os.getenv('QUESTIONS_FILE', 'questions.json')
+QUESTIONS_WATCH_INTERVAL = float(os.getenv('QUESTIONS_WATCH_INTERVAL', 5))
+# Хранение банка вопросов: memory - целиком в памяти, sqlite - в файле QUESTIONS_DB
+# с кешем из QUESTIONS_CACHE_SIZE вопросов (для больших банков в формате JSON Lines)
+QUESTIONS_BACKEND = os.getenv('QUESTIONS_BACKEND', 'memory')
+QUESTIONS_DB = os.getenv('QUESTIONS_DB', 'questions_bank.db')
+QUESTIONS_CACHE_SIZE = int(os.getenv('QUESTIONS_CACHE_SIZE', 10000))
+
+# Хранение прогресса: table - строка на каждый ответ в user_answers,
+# bitset - битовые карты в quiz_state (бит на вопрос банка). Прогресс из устаревших текстовых столбцов переносится
+# в выбранный режим, между режимами table и bitset данные не переносятся.
+PROGRESS_STORAGE = os.getenv('PROGRESS_STORAGE', 'table')
+
+# Кеш сессий активных пользователей. SESSION_DURABILITY: write-through - запись в базу при каждом
+# изменении, write-behind - пачками раз в SESSION_FLUSH_INTERVAL секунд и при остановке бота
+SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', 10000))
+SESSION_TTL = float(os.getenv('SESSION_TTL', 1800))
+SESSION_FLUSH_INTERVAL = float(os.getenv('SESSION_FLUSH_INTERVAL', 1.0))
+SESSION_FLUSH_BATCH = int(os.getenv('SESSION_FLUSH_BATCH', 500))
+SESSION_DURABILITY = os.getenv('SESSION_DURABILITY', 'write-through')
+
+# Повторение неправильно отвеченных вопросов (SM-2): первый повтор через REVIEW_FIRST_INTERVAL секунд,
+# после первого правильного повтора - через REVIEW_SECOND_INTERVAL секунд. REVIEW_INTERLEAVE - подмешивать
+# подошедшие повторы в обычный квиз (по умолчанию выключено: повторение только по команде /review)
+REVIEW_FIRST_INTERVAL = float(os.getenv('REVIEW_FIRST_INTERVAL', 600))
+REVIEW_SECOND_INTERVAL = float(os.getenv('REVIEW_SECOND_INTERVAL', 86400))
+REVIEW_INTERLEAVE = os.getenv('REVIEW_INTERLEAVE', 'false').lower() in ('1', 'true', 'yes')
+
+# Статистика: размер рейтинга /top, интервал пересчета сводной статистики в секундах,
+# минимальное количество ответов на вопрос и количество самых сложных вопросов в /stats
+STATS_TOP_SIZE = int(os.getenv('STATS_TOP_SIZE', 10))
+STATS_REFRESH_INTERVAL = float(os.getenv('STATS_REFRESH_INTERVAL', 60))
+STATS_MIN_ATTEMPTS = int(os.getenv('STATS_MIN_ATTEMPTS', 5))
+STATS_HARDEST_COUNT = int(os.getenv('STATS_HARDEST_COUNT', 5))
+
+# Обновления одного пользователя обрабатываются по очереди, не больше USER_MAX_PENDING в работе и в очереди;
+# ANSWER_DEDUP_SIZE - количество запоминаемых ответов для отбрасывания повторных нажатий на кнопки
+USER_MAX_PENDING = int(os.getenv('USER_MAX_PENDING', 10))
+ANSWER_DEDUP_SIZE = int(os.getenv('ANSWER_DEDUP_SIZE', 10000))
+
+# Ограничения исходящих запросов к Bot API (запросов в секунду и размер всплеска), 0 - без ограничения
+SEND_CHAT_RATE = float(os.getenv('SEND_CHAT_RATE', 1))
+SEND_CHAT_BURST = int(os.getenv('SEND_CHAT_BURST', 10))
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', 30))
+if SHARD_INDEX is not None:
+    # Общий лимит бота делится между шардами
+    SEND_GLOBAL_RATE /= SHARDS
+SEND_GLOBAL_BURST = int(os.getenv('SEND_GLOBAL_BURST', 30))
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', 3))
+
+# Пауза перед объявлением результата ответа: off, fixed или random
+SUSPENSE_MODES = ('off', 'fixed', 'random')
+SUSPENSE_MODE = os.getenv('SUSPENSE_MODE', 'random')
+if SUSPENSE_MODE not in SUSPENSE_MODES:
+    # Опечатка в режиме не должна молча превращаться в random
+    raise ValueError(f"SUSPENSE_MODE={SUSPENSE_MODE!r} не из {', '.join(SUSPENSE_MODES)}")
+SUSPENSE_SECONDS = int(os.getenv('SUSPENSE_SECONDS', 3))
+SUSPENSE_MIN_SECONDS = int(os.getenv('SUSPENSE_MIN_SECONDS', 3))
+SUSPENSE_MAX_SECONDS = int(os.getenv('SUSPENSE_MAX_SECONDS', 5))
+
+# HTTP-сервер метрик в текстовом формате Prometheus (GET /metrics); по умолчанию отключен (METRICS_PORT=0),
+# для включения задайте порт, например METRICS_PORT=9090
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+if METRICS_PORT and SHARD_INDEX is not None:
+    METRICS_PORT += 1 + SHARD_INDEX
+
+# Логи: формат json или text, ротация по размеру (size, LOG_MAX_BYTES байт) или по времени (time, период LOG_ROTATE_WHEN),
+# LOG_BACKUP_COUNT старых файлов. LOG_UPDATES - записывать каждое обработанное обновление с временем обработки.
+# LOG_DIR - директория файлов логов (по умолчанию logs в корне проекта)
+LOG_DIR = os.getenv('LOG_DIR')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_ROTATION = os.getenv('LOG_ROTATION', 'size')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', 'midnight')
+LOG_UPDATES = os.getenv('LOG_UPDATES', 'true').lower() in ('1', 'true', 'yes')
+
+configure_logging(log_format=LOG_FORMAT, rotation=LOG_ROTATION, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                  when=LOG_ROTATE_WHEN, level=LOG_LEVEL, file_suffix=f"_shard{SHARD_INDEX}" if SHARD_INDEX is not None else "",
+                  logs_dir=LOG_DIR)
 main_logger = setup_logger("main")
 bot_logger = setup_logger("bot")
 db_logger = setup_logger("db")
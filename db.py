@@ -1,15 +1,145 @@
-import aiosqlite
-from config import DB_NAME, db_logger, main_logger
+from config import (STORAGE_BACKEND, DB_NAME, DB_READERS, DB_BUSY_TIMEOUT, DB_WRITE_BATCH_DELAY, DB_WRITE_BATCH_SIZE, PROGRESS_STORAGE,
+                    SESSION_CACHE_SIZE, SESSION_TTL, SESSION_FLUSH_INTERVAL, SESSION_FLUSH_BATCH, SESSION_DURABILITY, REVIEW_FIRST_INTERVAL,
+                    REVIEW_SECOND_INTERVAL, REVIEW_INTERLEAVE, STATS_REFRESH_INTERVAL, STATS_MIN_ATTEMPTS, STATS_HARDEST_COUNT,
+                    db_logger, main_logger)
 from utils.questions_loader import questions_loader
-import random
+from utils.session_cache import Session, SessionCache
+from utils import bitset
+from utils.permutation import Permutation, new_seed
+from utils.spaced_repetition import ReviewQueue
+from utils.stats import StatsSnapshot, StatsRefresher
+from utils.storage import MemoryStorage
+from utils.sqlite_storage import SqliteStorage
+from utils.metrics import registry, db_timed, db_errors_total
+import time
+
+# Хранилище прогресса пользователей (см. utils/storage.py)
+if STORAGE_BACKEND == 'memory':
+    storage = MemoryStorage()
+else:
+    storage = SqliteStorage(DB_NAME, readers=DB_READERS, busy_timeout=DB_BUSY_TIMEOUT, batch_delay=DB_WRITE_BATCH_DELAY / 1000,
+                            batch_size=DB_WRITE_BATCH_SIZE, progress_storage=PROGRESS_STORAGE, logger=db_logger)
 
-questions_data = questions_loader.get_data()
+
+#####################################################################################
+# load_session
+
+
+@db_timed
+async def load_session(user_id):
+    """
+    Загружает состояние квиза пользователя из хранилища в объект Session.
+
+    Позиция в порядке вопросов сохраняется, только если она записана при текущей версии банка вопросов.
+    Если хранилище требует перезаписать состояние (например, битовые карты построены по индексам
+    другой версии банка), сессия сразу помечается измененной.
+
+    Args:
+        user_id (int): Идентификатор пользователя.
+
+    Returns:
+        Session: Сессия пользователя. Для нового пользователя - пустая сессия.
+    """
+    stored = await storage.load_session(user_id)
+    reviews = ReviewQueue(REVIEW_FIRST_INTERVAL, REVIEW_SECOND_INTERVAL)
+    for review in stored.reviews:
+        reviews.load(review)
+
+    bank = questions_loader.bank
+    session = Session(user_id, exists=stored.exists, current_question_id=stored.current_question_id, bank_version=bank.version,
+                      reviews=reviews)
+    if stored.order_seed is not None:
+        session.order_seed = stored.order_seed
+        # Позиция в порядке вопросов имеет смысл только для той версии банка, при которой она записана
+        session.order_cursor = stored.order_cursor if stored.bank_version == bank.version else 0
+        session.category, session.difficulty = stored.category, stored.difficulty
+    for question_id, outcome in stored.answers:
+        session.load_answer(question_id, bank.index_of(question_id), outcome)
+    if stored.outdated:
+        session.state_changed = True
+        session.dirty = True
+    return session
+
+
+#####################################################################################
+# get_session
+
+
+@db_timed
+async def get_session(user_id):
+    """
+    Возвращает сессию пользователя, согласованную с текущей версией банка вопросов.
+
+    Если банк вопросов перезагрузили после загрузки сессии, битовая карта отвеченных вопросов
+    перестраивается под новые индексы. Если текущий вопрос пользователя удален из банка,
+    текущим становится случайный неотвеченный вопрос.
+
+    Args:
+        user_id (int): Идентификатор пользователя.
+
+    Returns:
+        Session: Сессия пользователя.
+    """
+    session = await session_cache.get(user_id)
+    bank = questions_loader.bank
+    if session.bank_version != bank.version:
+        session.rebase(bank.index_of, bank.version)
+        if session.exists and bank.get(session.current_question_id) is None:
+            session.set_current(pick_unanswered_question(session))
+        session.dirty = session.dirty or session.state_changed
+    return session
+
+
+#####################################################################################
+# save_bank_version
+
+
+@db_timed
+async def save_bank_version(bank):
+    """
+    Записывает версию банка вопросов после его перезагрузки.
+
+    Args:
+        bank (QuestionBank): Новый банк вопросов.
+    """
+    await storage.save_bank_version(bank)
+
+
+questions_loader.listeners.append(save_bank_version)
+
+
+#####################################################################################
+# persist_sessions
+
+
+@db_timed
+async def persist_sessions(changes):
+    """
+    Записывает изменения сессий в базу данных.
+
+    Запись передается хранилищу: в SQLite она ставится в очередь пула соединений и фиксируется
+    вместе с записями других пользователей в одной групповой транзакции.
+
+    Args:
+        changes (list): Список объектов SessionChanges.
+    """
+    await storage.write_changes(changes)
+
+
+session_cache = SessionCache(load_session, persist_sessions, max_size=SESSION_CACHE_SIZE, ttl=SESSION_TTL,
+                             flush_interval=SESSION_FLUSH_INTERVAL, flush_batch=SESSION_FLUSH_BATCH,
+                             write_behind=SESSION_DURABILITY == 'write-behind', logger=db_logger)
+
+registry.callback('quiz_db_operations_total', 'Операции хранилища: чтения, записи и транзакции.',
+                  lambda: {(kind,): count for kind, count in storage.stats.items()}, ('kind',), type='counter')
+registry.callback('quiz_sessions_cached', 'Сессии пользователей в кеше.', lambda: len(session_cache._sessions))
 
 
 #####################################################################################
 # get_result
 
 
+@db_timed
 async def get_result(user_id):
     """
     Получает данные о текущем состоянии квиза для пользователя.
@@ -22,32 +152,326 @@ async def get_result(user_id):
 
     """
     try:
-        async with aiosqlite.connect(DB_NAME) as db:
-            async with db.execute('SELECT answered_questions, wrong_questions, correct_questions FROM quiz_state WHERE user_id = ?', (user_id,)) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    answered_questions = row[0].split(',') if row[0] else []
-                    wrong_questions = row[1].split(',') if row[1] else []
-                    correct_questions = row[2].split(',') if row[2] else []
-                else:
-                    answered_questions = []
-                    wrong_questions = []
-                    correct_questions = []
-
-                result = {
-                    'answered_questions': answered_questions,
-                    'wrong_questions': wrong_questions,
-                    'correct_questions': correct_questions
-                }
-                return result
+        session = await get_session(user_id)
+        result = {
+            'answered_questions': list(session.outcomes),
+            'wrong_questions': [question_id for question_id, outcome in session.outcomes.items() if outcome == 'wrong'],
+            'correct_questions': [question_id for question_id, outcome in session.outcomes.items() if outcome == 'correct']
+        }
+        return result
     except Exception as e:
         db_logger.error(f"Ошибка в get_result: {e}")
+        db_errors_total.inc('get_result')
+
+
+#####################################################################################
+# get_result_counts
+
+
+@db_timed
+async def get_result_counts(user_id):
+    """
+    Получает количество отвеченных, правильных и неправильных вопросов пользователя.
+
+    В отличие от get_result не собирает списки идентификаторов: счетчики поддерживаются
+    в сессии пользователя при каждом ответе.
+
+    Args:
+        user_id (int): Идентификатор пользователя.
+
+    Returns:
+        dict: Словарь с количеством отвеченных, правильных и неправильных вопросов.
+    """
+    try:
+        session = await get_session(user_id)
+        result = {
+            'answered_questions': len(session.outcomes),
+            'correct_questions': session.correct_count,
+            'wrong_questions': session.wrong_count
+        }
+        return result
+    except Exception as e:
+        db_logger.error(f"Ошибка в get_result_counts: {e}")
+        db_errors_total.inc('get_result_counts')
+
+
+#####################################################################################
+# get_leaderboard
+
+
+@db_timed
+async def get_leaderboard(limit):
+    """
+    Возвращает лучших пользователей по количеству правильных ответов.
+
+    Чтение идет по индексу idx_user_stats_top и не агрегирует прогресс пользователей.
+    При равенстве правильных ответов выше тот, кто ответил на меньшее количество вопросов.
+
+    Args:
+        limit (int): Количество пользователей.
+
+    Returns:
+        list: Тройки (идентификатор пользователя, правильных, отвечено).
+    """
+    try:
+        return await storage.get_leaderboard(limit)
+    except Exception as e:
+        db_logger.error(f"Ошибка в get_leaderboard: {e}")
+        db_errors_total.inc('get_leaderboard')
+        return []
+
+
+#####################################################################################
+# get_user_rank
+
+
+@db_timed
+async def get_user_rank(user_id):
+    """
+    Возвращает место пользователя в рейтинге по количеству правильных ответов.
+
+    Счетчики берутся из сессии пользователя, а место - по гистограмме количества правильных ответов
+    (score_counts) как число пользователей с большим результатом (у равных пользователей одно место).
+
+    Args:
+        user_id (int): Идентификатор пользователя.
+
+    Returns:
+        tuple: Место в рейтинге (или None, если пользователь еще не отвечал), правильных и отвечено.
+    """
+    try:
+        session = await get_session(user_id)
+        if not session.outcomes:
+            return None, 0, 0
+        ahead = await storage.count_ahead(session.correct_count)
+        return ahead + 1, session.correct_count, len(session.outcomes)
+    except Exception as e:
+        db_logger.error(f"Ошибка в get_user_rank: {e}")
+        db_errors_total.inc('get_user_rank')
+        return None, 0, 0
+
+
+#####################################################################################
+# materialize_stats
+
+
+@db_timed
+async def materialize_stats():
+    """
+    Пересчитывает сводную статистику из агрегатных таблиц в stats_snapshot.
+
+    Итоги по пользователям считаются одним проходом по user_stats, статистика вопросов
+    группируется по категориям через индексы категорий банка вопросов. Самыми сложными
+    считаются вопросы с наименьшей долей правильных первых ответов среди вопросов,
+    на которые ответили не меньше STATS_MIN_ATTEMPTS раз. Вопросы, удаленные из банка,
+    не учитываются. Чтение идет через соединение для чтения и не задерживает запись ответов.
+    """
+    users, answers, correct, question_stats = await storage.load_stats()
+
+    ids = questions_loader.all_ids()
+    categories = []
+    for name, _ in questions_loader.categories():
+        attempts = correct_count = 0
+        for index in questions_loader.slice(name):
+            row = question_stats.get(ids[index])
+            if row is not None:
+                attempts += row[0]
+                correct_count += row[1]
+        categories.append((name, attempts, correct_count))
+
+    hardest = sorted(
+        ((question_id, attempts, correct_count) for question_id, (attempts, correct_count) in question_stats.items()
+         if attempts >= STATS_MIN_ATTEMPTS and questions_loader.index_of(question_id) is not None),
+        key=lambda row: (row[2] / row[1], -row[1])
+    )[:STATS_HARDEST_COUNT]
+    stats_snapshot.update(users, answers, correct, categories, hardest)
+
+
+stats_snapshot = StatsSnapshot()
+stats_refresher = StatsRefresher(materialize_stats, interval=STATS_REFRESH_INTERVAL, logger=db_logger)
+
+
+# Сколько отвеченных вопросов подряд пропускается в порядке перестановки, прежде чем
+# неотвеченный вопрос выбирается случайно по битовой карте
+ORDER_MAX_SKIPS = 32
+
+
+#####################################################################################
+# pick_unanswered_question
+
+
+def pick_unanswered_question(session):
+    """
+    Выбирает следующий вопрос, на который пользователь еще не отвечал.
+
+    Вопросы идут в порядке перестановки плотных индексов банка, заданной зерном пользователя
+    (order_seed): позиция order_cursor сдвигается вперед, пропуская отвеченные вопросы, поэтому
+    выбор занимает O(1) в среднем и не зависит от того, насколько плотны идентификаторы вопросов.
+    Зерно, позиция и версия банка однозначно определяют порядок, что позволяет воспроизвести его
+    при отладке. За один выбор пропускается не больше ORDER_MAX_SKIPS отвеченных вопросов:
+    если их больше (новый порядок у пользователя, ответившего на большую часть банка) или порядок
+    пройден, неотвеченный вопрос выбирается случайно по битовой карте.
+
+    Если пользователь выбрал категорию (и сложность), перестановка строится только по индексам
+    вопросов этой категории из questions_loader.slice, и весь банк не просматривается. Если
+    категории больше нет в банке (после перезагрузки), вопросы выбираются из всего банка.
+
+    Args:
+        session (Session): Сессия пользователя.
+
+    Returns:
+        int: Идентификатор выбранного вопроса.
+        None: Если неотвеченных вопросов не осталось.
+    """
+    ids = questions_loader.all_ids()
+    if session.order_seed is None:
+        session.start_order(new_seed())
+    candidates = None
+    if session.category is not None:
+        candidates = questions_loader.slice(session.category, session.difficulty)
+        if candidates is None:
+            session.start_order(session.order_seed)
+    size = len(candidates) if candidates is not None else len(ids)
+
+    order = Permutation(size, session.order_seed)
+    cursor = session.order_cursor
+    end = min(size, cursor + ORDER_MAX_SKIPS)
+    while cursor < end:
+        index = order[cursor]
+        cursor += 1
+        if candidates is not None:
+            index = candidates[index]
+        if not bitset.has_bit(session.answered_bits, index):
+            session.order_cursor = cursor
+            return ids[index]
+    session.order_cursor = cursor
+
+    if candidates is not None:
+        index = bitset.random_set(questions_loader.category_mask(session.category, session.difficulty) & ~session.answered_bits)
+    else:
+        index = bitset.random_unset(session.answered_bits, size)
+    if index is None:
+        return None
+    return ids[index]
+
+
+#####################################################################################
+# pick_due_review
+
+
+def pick_due_review(session, now):
+    """
+    Возвращает вопрос из очереди повторения, время которого наступило, или None.
+
+    Вопросы, удаленные из банка вопросов, убираются из очереди.
+
+    Args:
+        session (Session): Сессия пользователя.
+        now (float): Текущее время (Unix time).
+    """
+    while (item := session.reviews.due(now)) is not None:
+        if questions_loader.index_of(item.question_id) is not None:
+            return item.question_id
+        session.reviews.remove(item.question_id)
+    return None
+
+
+#####################################################################################
+# pick_next_question
+
+
+def pick_next_question(session, now):
+    """
+    Выбирает следующий вопрос пользователя.
+
+    Если включено REVIEW_INTERLEAVE, сначала берется вопрос из очереди повторения, время которого
+    наступило (O(log n) по куче сессии), иначе - следующий неотвеченный вопрос.
+
+    Args:
+        session (Session): Сессия пользователя.
+        now (float): Текущее время (Unix time).
+
+    Returns:
+        int: Идентификатор выбранного вопроса.
+        None: Если вопросов не осталось.
+    """
+    if REVIEW_INTERLEAVE:
+        question_id = pick_due_review(session, now)
+        if question_id is not None:
+            return question_id
+    return pick_unanswered_question(session)
+
+
+#####################################################################################
+# start_quiz
+
+
+@db_timed
+async def start_quiz(user_id, seed=None, category=None, difficulty=None):
+    """
+    Начинает для пользователя новый порядок вопросов и делает текущим первый неотвеченный вопрос.
+
+    Args:
+        user_id (int): Идентификатор пользователя.
+        seed (int, optional): Зерно порядка вопросов. По умолчанию случайное; явное зерно
+            позволяет воспроизвести порядок вопросов.
+        category (str, optional): Категория вопросов. По умолчанию - все вопросы банка.
+        difficulty (str, optional): Сложность вопросов внутри категории.
+
+    Returns:
+        int: Идентификатор первого вопроса.
+        None: Если неотвеченных вопросов не осталось.
+    """
+    try:
+        session = await get_session(user_id)
+        session.start_order(new_seed() if seed is None else seed, category, difficulty)
+        question_id = pick_next_question(session, time.time())
+        session.set_current(question_id)
+        await session_cache.commit(session)
+        db_logger.info(f"Пользователь: {user_id} начал квиз (категория {category}, сложность {difficulty}), "
+                       f"зерно порядка вопросов {session.order_seed}")
+        return question_id
+    except Exception as e:
+        db_logger.error(f"Ошибка в start_quiz: {e}")
+        db_errors_total.inc('start_quiz')
+
+
+#####################################################################################
+# start_review
+
+
+@db_timed
+async def start_review(user_id):
+    """
+    Делает текущим вопрос из очереди повторения, время которого наступило.
+
+    Args:
+        user_id (int): Идентификатор пользователя.
+
+    Returns:
+        tuple: Идентификатор вопроса (или None, если повторять пока нечего) и время ближайшего
+            повторения (Unix time) или None, если очередь повторения пуста.
+    """
+    try:
+        session = await get_session(user_id)
+        question_id = pick_due_review(session, time.time())
+        if question_id is not None:
+            session.set_current(question_id)
+            await session_cache.commit(session)
+            return question_id, None
+        item = session.reviews.peek()
+        return None, item.due_at if item is not None else None
+    except Exception as e:
+        db_logger.error(f"Ошибка в start_review: {e}")
+        db_errors_total.inc('start_review')
+        return None, None
 
 
 #####################################################################################
 # get_next_question_id
 
 
+@db_timed
 async def get_next_question_id(user_id, current_id):
     """
     Возвращает следующий идентификатор вопроса, на который пользователь еще не отвечал.
@@ -60,27 +484,12 @@ async def get_next_question_id(user_id, current_id):
         int: Идентификатор следующего вопроса.
     """
     try:
-        async with aiosqlite.connect(DB_NAME) as db:
-            async with db.execute('SELECT answered_questions FROM quiz_state WHERE user_id = ?', (user_id,)) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    answered_questions = row[0]
-                    answered_questions_list = answered_questions.split(',')
-
-                    unanswered_questions = [q['id'] for q in questions_data if str(
-                        q['id']) not in answered_questions_list]
-
-                    if not unanswered_questions:
-                        return None
-
-                    next_question_id = random.choice(unanswered_questions)
-                    return next_question_id
-
-                else:
-                    return random.choice([q['id'] for q in questions_data])
+        session = await get_session(user_id)
+        return pick_next_question(session, time.time())
 
     except Exception as e:
         db_logger.error(f"Ошибка в get_next_question_id: {e}")
+        db_errors_total.inc('get_next_question_id')
         return None
 
 
@@ -88,6 +497,7 @@ async def get_next_question_id(user_id, current_id):
 # get_questions_list
 
 
+@db_timed
 async def get_questions_list(user_id, question_type):
     """
     Получает список вопросов определенного типа (правильные, неправильные) для пользователя.
@@ -101,26 +511,23 @@ async def get_questions_list(user_id, question_type):
 
     """
     try:
-        async with aiosqlite.connect(DB_NAME) as db:
-            async with db.execute(f'SELECT {question_type}_questions FROM quiz_state WHERE user_id = ?', (user_id,)) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    questions = row[0]
-                    questions_list = questions.split(',') if questions else []
-                else:
-                    questions_list = []
-        return questions_list
+        session = await get_session(user_id)
+        return [question_id for question_id, outcome in session.outcomes.items() if outcome == question_type]
     except Exception as e:
         db_logger.error(f"Ошибка в get_questions_list: {e}")
+        db_errors_total.inc('get_questions_list')
 
 
 #####################################################################################
-# get_questions_list
+# update_questions_list
 
 
+@db_timed
 async def update_questions_list(user_id, question_id, question_type):
     """
-    Обновляет список вопросов определенного типа (правильные, неправильные) для пользователя.
+    Записывает результат ответа пользователя на вопрос (правильный или неправильный).
+
+    Если вопрос уже отмечен как отвеченный, у записи обновляется только результат.
 
     Args:
         user_id (int): Идентификатор пользователя.
@@ -129,22 +536,80 @@ async def update_questions_list(user_id, question_id, question_type):
 
     """
     try:
-        questions_list = await get_questions_list(user_id, question_type)
-        if str(question_id) not in questions_list:
-            questions_list.append(str(question_id))
-            questions = ','.join(questions_list)
-            async with aiosqlite.connect(DB_NAME) as db:
-                await db.execute(f'UPDATE quiz_state SET {question_type}_questions = ? WHERE user_id = ?', (questions, user_id))
-                await db.execute(f'INSERT OR IGNORE INTO quiz_state (user_id, {question_type}_questions) VALUES (?, ?)', (user_id, questions))
-                await db.commit()
+        session = await get_session(user_id)
+        session.record(question_id, questions_loader.index_of(question_id), question_type)
+        await session_cache.commit(session)
     except Exception as e:
         db_logger.error(f"Ошибка в update_questions_list: {e}")
+        db_errors_total.inc('update_questions_list')
+
+
+# Результат record_answer, если ответ не удалось записать в базу данных
+ANSWER_NOT_SAVED = object()
+# Результат record_answer, если ответ не принят: вопрос не текущий или на него уже ответили
+ANSWER_IGNORED = object()
+
+
+#####################################################################################
+# record_answer
+
+
+@db_timed
+async def record_answer(user_id, question_id, is_correct):
+    """
+    Записывает ответ пользователя и переводит его к следующему вопросу в одной транзакции.
+
+    Ответ записывается в сессию пользователя, выбирается следующий вопрос (pick_next_question),
+    и он становится текущим вопросом. Изменения сохраняются в базу одной транзакцией:
+    сразу или при фоновой записи, в зависимости от SESSION_DURABILITY. Принимается только ответ
+    на текущий вопрос пользователя: ответ на другой вопрос (например, нажатие на кнопку старой копии
+    вопроса) или повторный ответ на уже отвеченный вопрос ничего не меняет.
+
+    Неправильно отвеченный вопрос попадает в очередь повторения. Ответ на текущий вопрос
+    из очереди повторения не меняет результат первого ответа, а перепланирует повторение по SM-2.
+
+    Args:
+        user_id (int): Идентификатор пользователя.
+        question_id (int): Идентификатор вопроса, на который ответил пользователь.
+        is_correct (bool): Флаг, указывающий, был ли ответ правильным.
+
+    Returns:
+        int: Идентификатор следующего вопроса.
+        None: Если неотвеченных вопросов не осталось.
+        ANSWER_IGNORED: Если ответ не принят и ничего не записано.
+        ANSWER_NOT_SAVED: Если ответ не удалось записать. Изменения сессии в памяти при этом
+            отменяются (см. SessionCache.commit), и пользователь может ответить еще раз.
+    """
+    try:
+        session = await get_session(user_id)
+        now = time.time()
+        if question_id != session.current_question_id:
+            return ANSWER_IGNORED
+        if session.has_outcome(question_id):
+            if question_id not in session.reviews:
+                return ANSWER_IGNORED
+            session.reviews.record(question_id, is_correct, now)
+        else:
+            session.record(question_id, questions_loader.index_of(question_id), 'correct' if is_correct else 'wrong')
+            if not is_correct:
+                session.reviews.record(question_id, False, now)
+
+        next_question_id = pick_next_question(session, now)
+        if next_question_id is not None:
+            session.set_current(next_question_id)
+        await session_cache.commit(session)
+        return next_question_id
+    except Exception as e:
+        db_logger.error(f"Ошибка в record_answer: {e}")
+        db_errors_total.inc('record_answer')
+        return ANSWER_NOT_SAVED
 
 
 #####################################################################################
 # add_question_to_wrong
 
 
+@db_timed
 async def add_question_to_wrong(user_id, question_id):
     """
     Добавляет вопрос в список неправильных ответов для пользователя.
@@ -158,12 +623,14 @@ async def add_question_to_wrong(user_id, question_id):
         await update_questions_list(user_id, question_id, 'wrong')
     except Exception as e:
         db_logger.error(f"Ошибка в add_question_to_wrong: {e}")
+        db_errors_total.inc('add_question_to_wrong')
 
 
 #####################################################################################
 # add_question_to_correct
 
 
+@db_timed
 async def add_question_to_correct(user_id, question_id):
     """
     Добавляет вопрос в список правильных ответов для пользователя.
@@ -177,48 +644,42 @@ async def add_question_to_correct(user_id, question_id):
         await update_questions_list(user_id, question_id, 'correct')
     except Exception as e:
         db_logger.error(f"Ошибка в add_question_to_correct: {e}")
+        db_errors_total.inc('add_question_to_correct')
 
 
 #####################################################################################
 # add_question_to_answered
 
 
+@db_timed
 async def add_question_to_answered(user_id, question_id):
     """
     Добавляет вопрос в список отвеченных вопросов для пользователя.
 
+    Результат ответа при этом не заполняется, его записывают add_question_to_correct
+    и add_question_to_wrong.
+
     Args:
         user_id (int): Идентификатор пользователя.
         question_id (int): Идентификатор вопроса.
 
     """
-    question_id = str(question_id)
     try:
-        async with aiosqlite.connect(DB_NAME) as db:
-            async with db.execute('SELECT answered_questions FROM quiz_state WHERE user_id = ?', (user_id,)) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    answered_questions = row[0]
-                    answered_questions_list = answered_questions.split(
-                        ',') if answered_questions else []
-                else:
-                    answered_questions_list = []
-
-            if str(question_id) not in answered_questions_list:
-                answered_questions_list.append(str(question_id))
-                answered_questions = ','.join(answered_questions_list)
-
-                await db.execute('UPDATE quiz_state SET answered_questions = ? WHERE user_id = ?', (answered_questions, user_id))
-                await db.execute('INSERT OR IGNORE INTO quiz_state (user_id, answered_questions) VALUES (?, ?)', (user_id, answered_questions))
-                await db.commit()
+        question_id = int(question_id)
+        session = await get_session(user_id)
+        if question_id not in session.outcomes:
+            session.record(question_id, questions_loader.index_of(question_id), None)
+            await session_cache.commit(session)
     except Exception as e:
         db_logger.error(f"Ошибка в add_question_to_answered: {e}")
+        db_errors_total.inc('add_question_to_answered')
 
 
 #####################################################################################
 # del_user_progress
 
 
+@db_timed
 async def del_user_progress(user_id):
     """
     Очищает данные о прогрессе пользователя в базе данных.
@@ -230,17 +691,19 @@ async def del_user_progress(user_id):
         Вызывается для удаления данных о текущем прогрессе квиза у конкретного пользователя.
     """
     try:
-        async with aiosqlite.connect(DB_NAME) as db:
-            await db.execute('DELETE FROM quiz_state WHERE user_id = ?', (user_id,))
-            await db.commit()
+        session = await get_session(user_id)
+        session.clear()
+        await session_cache.commit(session)
     except Exception as e:
         db_logger.error(f"Ошибка в del_user_progress: {e}")
+        db_errors_total.inc('del_user_progress')
 
 
 #####################################################################################
 # check_user_exists
 
 
+@db_timed
 async def check_user_exists(user_id):
     """
     Проверяет, существует ли пользователь с указанным ID в базе данных квиза.
@@ -255,19 +718,18 @@ async def check_user_exists(user_id):
         Вызывается для проверки наличия пользователя в базе данных перед началом игры или продолжением.
     """
     try:
-        async with aiosqlite.connect(DB_NAME) as db:
-            async with db.execute("SELECT EXISTS(SELECT 1 FROM quiz_state WHERE user_id = ?)", (user_id,)) as cursor:
-                result = await cursor.fetchone()
-                exists = result[0]
-                return exists
+        session = await get_session(user_id)
+        return session.exists
     except Exception as e:
         db_logger.error(f"Ошибка в check_user_exists: {e}")
+        db_errors_total.inc('check_user_exists')
 
 
 #####################################################################################
 # update_user_current_quiz_id
 
 
+@db_timed
 async def update_user_current_quiz_id(user_id, id):
     """
     Обновляет идентификатор текущего вопроса для пользователя в базе данных.
@@ -285,18 +747,19 @@ async def update_user_current_quiz_id(user_id, id):
 
     """
     try:
-        async with aiosqlite.connect(DB_NAME) as db:
-            await db.execute('UPDATE quiz_state SET current_question_id = ? WHERE user_id = ?', (id, user_id))
-            await db.execute('INSERT OR IGNORE INTO quiz_state (user_id, current_question_id) VALUES (?, ?)', (user_id, id))
-            await db.commit()
+        session = await get_session(user_id)
+        session.set_current(id)
+        await session_cache.commit(session)
     except Exception as e:
         db_logger.error(f"Ошибка в update_user_current_quiz_id: {e}")
+        db_errors_total.inc('update_user_current_quiz_id')
 
 
 #####################################################################################
 # get_quiz_id
 
 
+@db_timed
 async def get_quiz_id(user_id):
     """
     Получает текущий идентификатор вопроса для пользователя из базы данных.
@@ -316,41 +779,61 @@ async def get_quiz_id(user_id):
 
     """
     try:
-        async with aiosqlite.connect(DB_NAME) as db:
-            async with db.execute('SELECT current_question_id FROM quiz_state WHERE user_id = (?)', (user_id, )) as cursor:
-                results = await cursor.fetchone()
-                if results is not None:
-                    return results[0]
-                else:
-                    return 1
+        session = await get_session(user_id)
+        if session.exists:
+            return session.current_question_id
+        else:
+            return 1
     except Exception as e:
         db_logger.error(f"Ошибка в get_quiz_id: {e}")
+        db_errors_total.inc('get_quiz_id')
+
+
+#####################################################################################
+# get_quiz_nonce
+
+
+@db_timed
+async def get_quiz_nonce(user_id):
+    """
+    Возвращает номер текущего квиза пользователя для подписи кнопок ответа.
+
+    Номер меняется при каждом новом квизе, поэтому кнопки вопросов прежнего квиза
+    перестают приниматься. Читается из сессии пользователя в памяти.
+
+    Args:
+        user_id (int): Идентификатор пользователя.
+
+    Returns:
+        int: Номер квиза (Session.nonce).
+    """
+    try:
+        session = await get_session(user_id)
+        return session.nonce
+    except Exception as e:
+        db_logger.error(f"Ошибка в get_quiz_nonce: {e}")
+        db_errors_total.inc('get_quiz_nonce')
 
 
 #####################################################################################
 # init_db
 
 
+@db_timed
 async def init_db():
     """
-    Инициализирует базу данных для хранения состояния квиза.
+    Инициализирует хранилище прогресса пользователей.
 
-    Создает таблицу quiz_state, если она не существует, для хранения информации о текущем вопросе,
-    ответах пользователя и статистике ответов.
+    Для SQLite создает таблицы базы данных и выполняет миграции схемы (см. SqliteStorage.init)
+    и запоминает текущую версию банка вопросов.
 
     Использование:
         Вызывается при старте бота для инициализации структуры базы данных.
     """
     try:
-        async with aiosqlite.connect(DB_NAME) as db:
-            await db.execute('''CREATE TABLE IF NOT EXISTS quiz_state (
-                                user_id INTEGER PRIMARY KEY,
-                                current_question_id INTEGER,
-                                answered_questions TEXT,
-                                correct_questions TEXT,
-                                wrong_questions TEXT)''')
-            await db.commit()
+        await storage.init(questions_loader.bank)
         main_logger.info("Подключение к базе данных... Успешно")
     except Exception as e:
         main_logger.error(
             f"Не удалось создать или подключиться к базе данных. {e}")
+        db_errors_total.inc('init_db')
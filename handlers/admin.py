@@ -0,0 +1,31 @@
+from aiogram import types
+from config import ADMIN_IDS, bot_logger
+from utils.questions_loader import questions_loader
+from utils.send_scheduler import send_scheduler
+
+#####################################################################################
+# cmd_reload
+async def cmd_reload(message: types.Message):
+    """
+    Обрабатывает команду /reload от администратора.
+
+    Перечитывает файл с вопросами без перезапуска бота. Если содержимое файла изменилось,
+    банк вопросов заменяется новой версией, а квизы пользователей продолжаются по ней.
+    Команды от пользователей, которых нет в ADMIN_IDS, игнорируются.
+
+    Args:
+        message (types.Message): Сообщение, вызвавшее команду.
+    """
+    user_id = message.from_user.id
+    if user_id not in ADMIN_IDS:
+        return
+
+    try:
+        bot_logger.info(f"Администратор: {user_id} запросил перезагрузку вопросов")
+        if await questions_loader.reload():
+            send_scheduler.answer(message, f"Вопросы обновлены. Версия банка: <b>{questions_loader.version}</b>, "
+                                           f"вопросов: <b>{questions_loader.count()}</b>")
+        else:
+            send_scheduler.answer(message, f"Вопросы не изменились. Версия банка: <b>{questions_loader.version}</b>")
+    except Exception as e:
+        bot_logger.error(f"Не удалось выполнить команду /reload {e}")
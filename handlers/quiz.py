@@ -1,138 +1,144 @@
-from aiogram import types
+import time
+from aiogram import types, html
 from aiogram import F
+from aiogram.filters.command import CommandObject
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 from config import quiz_logger
-from db import update_user_current_quiz_id, get_quiz_id, add_question_to_answered, del_user_progress, get_next_question_id, add_question_to_correct, add_question_to_wrong
+from db import start_quiz, start_review, get_quiz_id, get_quiz_nonce, del_user_progress, record_answer, ANSWER_NOT_SAVED, ANSWER_IGNORED
 from utils.questions_loader import questions_loader
+from utils.question import DIFFICULTIES
 from utils.get_question_by_id import get_question_by_id
 from handlers.results import callback_results_request
-from utils.callback_data import CallbackAnswers
+from utils.callback_data import answer_signer
 from utils.wait_for_result import wait_for_result
-import random
-
-questions_data = questions_loader.get_data()
+from utils.send_scheduler import send_scheduler, PRIORITY_QUESTION, PRIORITY_DECORATIVE
+from utils.metrics import answer_step_seconds, updates_dropped_total
 
 
 #####################################################################################
 # process_answer
 
 
-async def process_answer(callback: types.CallbackQuery, is_correct: bool):
+async def process_answer(callback: types.CallbackQuery):
     """
     Обрабатывает ответ пользователя на вопрос.
 
+    Данные кнопки проверяются без обращения к базе данных: подпись HMAC (utils.callback_data),
+    вопрос и вариант ответа - по банку вопросов в памяти, номер квиза - по сессии пользователя.
+    Правильность ответа определяется по банку вопросов. Кнопки с неверной подписью
+    отбрасываются, кнопки вопросов прежнего квиза не принимаются.
+    Если ответ не удалось записать в базу данных, пользователь получает текущий вопрос еще раз.
+    Ответ на не текущий или уже отвеченный вопрос (например, кнопка старой копии вопроса) не оценивается:
+    пользователь получает текущий вопрос.
+
+    Время шагов (запись ответа, пауза перед результатом, отправка следующего вопроса)
+    записывается в метрику quiz_answer_step_seconds.
+
     Args:
         callback (types.CallbackQuery): Объект коллбэк запроса от пользователя.
-        is_correct (bool): Флаг, указывающий, был ли ответ правильным.
 
     Использование:
         Эта функция вызывается при выборе варианта ответа пользователем.
     """
     try:
-        await callback.bot.edit_message_reply_markup(
-            chat_id=callback.from_user.id,
-            message_id=callback.message.message_id,
-            reply_markup=None
-        )
-
-        current_question_id = await get_quiz_id(callback.from_user.id)
-
-        await add_question_to_answered(callback.from_user.id, current_question_id)
-
-        callback_data = CallbackAnswers.unpack(callback.data)
-        option_index = callback_data.option_index
-        question = await get_question_by_id(callback_data.id)
-        
-
-        await callback.message.answer(f"Ваш ответ: <b>'{question["options"][option_index]}'</b>")
-        await callback.message.answer("И это...")
-        await wait_for_result(callback.message)
+        user_id = callback.from_user.id
+        answer = answer_signer.unpack(user_id, callback.data)
+        if answer is None:
+            updates_dropped_total.inc('forged')
+            quiz_logger.warning(f"Пользователь: {user_id} - неверная подпись кнопки ответа: {callback.data}")
+            return
+
+        send_scheduler.remove_reply_markup(callback.message)
+
+        question = await get_question_by_id(answer.question_id)
+        if question is None or answer.option_index >= len(question.options):
+            # Вопрос удален или изменен при перезагрузке банка вопросов, пока пользователь на него отвечал
+            send_scheduler.answer(callback.message, "Этот вопрос больше недоступен. Следующий вопрос...")
+            await get_question(callback.message, user_id)
+            return
+        if answer.nonce != await get_quiz_nonce(user_id):
+            send_scheduler.answer(callback.message, "Этот вопрос из прошлого квиза. Текущий вопрос...")
+            await get_question(callback.message, user_id)
+            return
+
+        is_correct = answer.option_index == question.correct_option
+        with answer_step_seconds.time('record_answer'):
+            next_question_id = await record_answer(user_id, answer.question_id, is_correct)
+        if next_question_id is ANSWER_NOT_SAVED:
+            send_scheduler.answer(callback.message, "Не удалось сохранить ответ. Попробуйте ответить еще раз.")
+            await get_question(callback.message, user_id)
+            return
+        if next_question_id is ANSWER_IGNORED:
+            send_scheduler.answer(callback.message, "На этот вопрос ответ уже не принимается. Текущий вопрос...")
+            await get_question(callback.message, user_id)
+            return
+
+        send_scheduler.answer(callback.message, f"Ваш ответ: <b>'{question.options[answer.option_index]}'</b>", priority=PRIORITY_DECORATIVE)
+        send_scheduler.answer(callback.message, "И это...", priority=PRIORITY_DECORATIVE)
+        with answer_step_seconds.time('suspense'):
+            await wait_for_result(callback.message)
 
         if is_correct:
-            await add_question_to_correct(callback.from_user.id, current_question_id)
-            await callback.message.answer("<b>Верно! 👍</b>")
+            send_scheduler.answer(callback.message, "<b>Верно! 👍</b>")
         else:
-            await add_question_to_wrong(callback.from_user.id, current_question_id)
-            await callback.message.answer("<b>Не верно! 😭</b>")
-
-        next_question_id = await get_next_question_id(callback.from_user.id, current_question_id)
+            send_scheduler.answer(callback.message, "<b>Не верно! 😭</b>")
 
         if next_question_id:
-            await update_user_current_quiz_id(callback.from_user.id, next_question_id)
-            await get_question(callback.message, callback.from_user.id)
+            with answer_step_seconds.time('next_question'):
+                await get_question(callback.message, user_id, next_question_id)
         else:
-            await callback.message.answer("Это был последний вопрос. Квиз завершен!")
+            send_scheduler.answer(callback.message, "Это был последний вопрос. Квиз завершен!")
             await callback_results_request(callback)
     except Exception as e:
         quiz_logger.error(f"Ошибка в process_answer. {e}")
 
 
 #####################################################################################
-# wrong_answer
-
-
-async def wrong_answer(callback: types.CallbackQuery):
-    """
-    Обрабатывает неправильный ответ пользователя.
-
-    Args:
-        callback (types.CallbackQuery): Объект коллбэк запроса от пользователя.
-    """
-    try:
-        await process_answer(callback, is_correct=False)
-    except Exception as e:
-        quiz_logger.error(f"Ошибка в wrong_answer. {e}")
-
-
-#####################################################################################
-# right_answer
+# answer_question
 
 
-async def right_answer(callback: types.CallbackQuery):
+async def answer_question(callback: types.CallbackQuery):
     """
-    Обрабатывает правильный ответ пользователя.
+    Обрабатывает нажатие на кнопку ответа на вопрос.
 
     Args:
         callback (types.CallbackQuery): Объект коллбэк запроса от пользователя.
     """
     try:
-        await process_answer(callback, is_correct=True)
+        await process_answer(callback)
     except Exception as e:
-        quiz_logger.error(f"Ошибка в right_answer. {e}")
+        quiz_logger.error(f"Ошибка в answer_question. {e}")
 
 
 #####################################################################################
 # generate_options_keyboard
 
 
-def generate_options_keyboard(answer_options, right_answer, current_question_id):
+def generate_options_keyboard(answer_options, user_id, question_id, nonce):
     """
     Создает клавиатуру с вариантами ответов для квиза.
 
-    Добавляет кнопки с текстом вариантов ответов. Кнопка с правильным ответом получает callback_data "right_answer",
-    а кнопки с неправильными ответами получают callback_data "wrong_answer".
+    Данные каждой кнопки подписываются для пользователя (utils.callback_data), поэтому клавиатура
+    строится при каждой отправке вопроса и не кешируется.
 
     Args:
-        answer_options (list): Список вариантов ответов.
-        right_answer (str): Правильный ответ.
+        answer_options (tuple): Варианты ответов.
+        user_id (int): Идентификатор пользователя, которому отправляется вопрос.
+        question_id (int): Идентификатор вопроса.
+        nonce (int): Номер квиза пользователя.
 
     Returns:
-        types.InlineKeyboardMarkup: Клавиатура с вариантами ответов.
+        types.InlineKeyboardMarkup: Клавиатура с вариантами ответов, по одной кнопке в ряд.
 
     Использование:
         Эта функция вызывается для создания клавиатуры с вариантами ответов для вопроса в квизе.
         Обычно вызывается из других функций, управляющих ходом квиза, таких как get_question.
     """
     try:
-        builder = InlineKeyboardBuilder()
-        for idx, option in enumerate(answer_options):
-            builder.add(types.InlineKeyboardButton(
-                text=option,
-                callback_data=CallbackAnswers(is_correct="r" if option == right_answer else "w",id=current_question_id, option_index=idx).pack())
-            )
-
-        builder.adjust(1)
-        return builder.as_markup()
+        return types.InlineKeyboardMarkup(inline_keyboard=[
+            [types.InlineKeyboardButton(text=option, callback_data=answer_signer.pack(user_id, question_id, idx, nonce))]
+            for idx, option in enumerate(answer_options)
+        ])
     except Exception as e:
         quiz_logger.error(f"Ошибка в generate_options_keyboard. {e}")
 
@@ -141,7 +147,7 @@ def generate_options_keyboard(answer_options, right_answer, current_question_id)
 # get_question
 
 
-async def get_question(message, user_id):
+async def get_question(message, user_id, question_id=None):
     """
     Отправляет текущий вопрос квиза пользователю.
 
@@ -151,6 +157,7 @@ async def get_question(message, user_id):
     Args:
         message (types.Message): Сообщение, вызвавшее команду. Содержит информацию о пользователе и тексте команды.
         user_id (int): Идентификатор пользователя.
+        question_id (int, optional): Идентификатор вопроса, если он уже известен. Иначе читается из базы данных.
 
     Использование:
         Эта функция вызывается для отправки следующего вопроса в квизе пользователю.
@@ -158,13 +165,11 @@ async def get_question(message, user_id):
 
     """
     try:
-        current_question_id = await get_quiz_id(user_id)
+        current_question_id = question_id if question_id is not None else await get_quiz_id(user_id)
         question = await get_question_by_id(current_question_id)
         if question:
-            correct_index = question['correct_option']
-            opts = question['options']
-            kb = generate_options_keyboard(opts, opts[correct_index], current_question_id)
-            await message.answer(f"{question['question']}", reply_markup=kb)
+            kb = generate_options_keyboard(question.options, user_id, current_question_id, await get_quiz_nonce(user_id))
+            await send_scheduler.answer(message, question.text, reply_markup=kb, priority=PRIORITY_QUESTION)
     except Exception as e:
         quiz_logger.error(f"Ошибка в get_question. {e}")
 
@@ -173,25 +178,30 @@ async def get_question(message, user_id):
 # new_quiz
 
 
-async def new_quiz(message, user_id):
+async def new_quiz(message, user_id, category=None, difficulty=None):
     """
     Начинает новый квиз для пользователя.
 
-    Выбирает случайный вопрос из списка доступных вопросов, обновляет текущий идентификатор вопроса для пользователя
-    и отправляет вопрос пользователю.
+    Начинает для пользователя новый случайный порядок вопросов (всего банка или выбранной
+    категории и сложности), делает текущим первый неотвеченный вопрос и отправляет его пользователю.
 
     Args:
         message (types.Message): Сообщение, вызвавшее команду. Содержит информацию о пользователе и тексте команды.
+        user_id (int): Идентификатор пользователя.
+        category (str, optional): Категория вопросов. По умолчанию - все вопросы.
+        difficulty (str, optional): Сложность вопросов внутри категории.
 
     Использование:
         Эта функция вызывается внутри других команд или обработчиков, таких как cmd_new_quiz, чтобы начать новый квиз.
 
     """
     try:
-        current_question_id = random.randint(1, len(questions_data))
-        await update_user_current_quiz_id(user_id, current_question_id)
+        current_question_id = await start_quiz(user_id, category=category, difficulty=difficulty)
+        if current_question_id is None:
+            send_scheduler.answer(message, "Вы уже ответили на все вопросы. Квиз завершен!")
+            return
 
-        await get_question(message, user_id)
+        await get_question(message, user_id, current_question_id)
     except Exception as e:
         quiz_logger.error(f"Ошибка в new_quiz. {e}")
 
@@ -213,7 +223,7 @@ async def cmd_resume_quiz(message: types.Message):
         builder.add(types.KeyboardButton(text="Начать заново"))
         builder.add(types.KeyboardButton(text="Результаты"))
 
-        await message.answer("Отлично, продолжаем.", reply_markup=builder.as_markup(resize_keyboard=True))
+        send_scheduler.answer(message, "Отлично, продолжаем.", reply_markup=builder.as_markup(resize_keyboard=True))
         await get_question(message, message.from_user.id)
         quiz_logger.info(f"Пользователь: {message.from_user.id} возобновил игру")
     except Exception as e:
@@ -232,12 +242,8 @@ async def callback_resume_quiz(callback: types.CallbackQuery):
         callback (types.CallbackQuery): Callback-запрос от пользователя.
     """
     try:
-        await callback.bot.edit_message_reply_markup(
-            chat_id=callback.from_user.id,
-            message_id=callback.message.message_id,
-            reply_markup=None
-        )
-        await callback.message.answer("Отлично, продолжаем.")
+        send_scheduler.remove_reply_markup(callback.message)
+        send_scheduler.answer(callback.message, "Отлично, продолжаем.")
         await get_question(callback.message, callback.message.chat.id)
     except Exception as e:
         quiz_logger.error(f"Ошибка в callback_resume_quiz. {e}")
@@ -261,13 +267,9 @@ async def restart_quiz(callback: types.CallbackQuery):
         Удаляет данные о текущем прогрессе пользователя и запускает новый квиз.
     """
     try:
-        await callback.bot.edit_message_reply_markup(
-            chat_id=callback.from_user.id,
-            message_id=callback.message.message_id,
-            reply_markup=None
-        )
+        send_scheduler.remove_reply_markup(callback.message)
         await del_user_progress(callback.from_user.id)
-        await callback.message.answer("Квиз перезапущен. Начинаем новый квиз...")
+        send_scheduler.answer(callback.message, "Квиз перезапущен. Начинаем новый квиз...")
         await new_quiz(callback.message, callback.message.chat.id)
     except Exception as e:
         quiz_logger.error(f"Ошибка в restart_quiz. {e}")
@@ -301,24 +303,122 @@ async def restart_quiz_confirm(message: types.Message):
 
         builder.adjust(1)
         markup = builder.as_markup()
-        await message.answer("Вы уверены, что хотите начать quiz заново?", reply_markup=markup)
+        await send_scheduler.answer(message, "Вы уверены, что хотите начать quiz заново?", reply_markup=markup)
     except Exception as e:
         quiz_logger.error(f"Ошибка в restart_quiz_confirm. {e}")
 
 
+#####################################################################################
+# parse_quiz_filter
+
+
+def parse_quiz_filter(args):
+    """
+    Разбирает аргументы команды /quiz <категория> [сложность].
+
+    Последнее слово считается сложностью, если это одно из значений DIFFICULTIES,
+    остальные слова - названием категории.
+
+    Args:
+        args (str): Текст после команды.
+
+    Returns:
+        tuple: Категория и сложность (или None).
+    """
+    words = args.split()
+    difficulty = None
+    if len(words) > 1 and words[-1].lower() in DIFFICULTIES:
+        difficulty = words.pop().lower()
+    return " ".join(words), difficulty
+
+
+#####################################################################################
+# format_categories
+
+
+def format_categories():
+    """ Возвращает список категорий банка вопросов с количеством вопросов для отправки пользователю. """
+    categories = questions_loader.categories()
+    if not categories:
+        return "В банке вопросов нет категорий."
+    lines = [f"• <b>{html.quote(name)}</b> ({count})" for name, count in categories]
+    return "Категории вопросов:\n" + "\n".join(lines) + f"\n\nКвиз по категории: /quiz &lt;категория&gt; [{'|'.join(DIFFICULTIES)}]"
+
+
+#####################################################################################
+# cmd_categories
+
+
+async def cmd_categories(message: types.Message):
+    """
+    Обрабатывает команду /categories: показывает категории вопросов.
+
+    Args:
+        message (types.Message): Сообщение, вызвавшее команду.
+    """
+    try:
+        send_scheduler.answer(message, format_categories())
+    except Exception as e:
+        quiz_logger.error(f"Ошибка в cmd_categories. {e}")
+
+
+#####################################################################################
+# format_wait
+
+
+def format_wait(seconds):
+    """ Возвращает время ожидания в виде "2 ч 5 мин" для сообщения пользователю. """
+    minutes = max(1, round(seconds / 60))
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    parts = [f"{value} {unit}" for value, unit in ((days, "дн"), (hours, "ч"), (minutes, "мин")) if value]
+    return " ".join(parts)
+
+
+#####################################################################################
+# cmd_review
+
+
+async def cmd_review(message: types.Message):
+    """
+    Обрабатывает команду /review: повторение неправильно отвеченных вопросов.
+
+    Отправляет вопрос из очереди повторения, время которого наступило. Если повторять пока нечего,
+    сообщает, когда наступит ближайшее повторение.
+
+    Args:
+        message (types.Message): Сообщение, вызвавшее команду.
+    """
+    try:
+        user_id = message.from_user.id
+        question_id, next_due_at = await start_review(user_id)
+        if question_id is not None:
+            send_scheduler.answer(message, "Повторим вопрос, на который вы ответили неправильно.")
+            await get_question(message, user_id, question_id)
+        elif next_due_at is not None:
+            send_scheduler.answer(message, f"Пока повторять нечего. Следующее повторение через {format_wait(next_due_at - time.time())}.")
+        else:
+            send_scheduler.answer(message, "Нет вопросов для повторения.")
+    except Exception as e:
+        quiz_logger.error(f"Ошибка в cmd_review. {e}")
+
+
 #####################################################################################
 # cmd_new_quiz
 
 
-async def cmd_new_quiz(message: types.Message):
+async def cmd_new_quiz(message: types.Message, command: CommandObject = None):
     """
     Функция запускает квиз при команде /quiz или при нажатии кнопки "Начать игру".
 
     Заменяет текущую кнопку "Начать игру" на кнопки "Начать заново" и "Результаты".
     Отправляет приветственное сообщение и вызывает функцию new_quiz для начала нового квиза.
+    Команда /quiz <категория> [сложность] начинает квиз только по вопросам этой категории;
+    для неизвестной категории отправляется список доступных.
 
     Args:
         message (types.Message): Сообщение, вызвавшее команду. Содержит информацию о пользователе и тексте команды.
+        command (CommandObject, optional): Разобранная команда /quiz с аргументами.
 
     Использование:
         Эта функция регистрируется как обработчик команд в диспетчере бота:
@@ -327,13 +427,20 @@ async def cmd_new_quiz(message: types.Message):
         dp.message.register(cmd_new_quiz, Command("quiz"))
     """
     try:
+        category = difficulty = None
+        if command is not None and command.args:
+            category, difficulty = parse_quiz_filter(command.args)
+            if questions_loader.slice(category, difficulty) is None:
+                send_scheduler.answer(message, f"Нет вопросов в категории <b>{html.quote(command.args)}</b>.\n\n{format_categories()}")
+                return
+
         builder = ReplyKeyboardBuilder()
 
         builder.add(types.KeyboardButton(text="Начать заново"))
         builder.add(types.KeyboardButton(text="Результаты"))
 
-        await message.answer("Мы начинаем. Первый вопрос...", reply_markup=builder.as_markup(resize_keyboard=True))
+        send_scheduler.answer(message, "Мы начинаем. Первый вопрос...", reply_markup=builder.as_markup(resize_keyboard=True))
 
-        await new_quiz(message, message.from_user.id)
+        await new_quiz(message, message.from_user.id, category, difficulty)
     except Exception as e:
         quiz_logger.error(f"Ошибка в cmd_new_quiz. {e}")
\ No newline at end of file
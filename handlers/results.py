@@ -1,9 +1,9 @@
-from aiogram import types
-from db import get_result
+from aiogram import types, html
+from db import get_result_counts, get_leaderboard, get_user_rank, stats_snapshot
 from utils.questions_loader import questions_loader
-from config import quiz_logger
-
-questions_data = questions_loader.get_data()
+from utils.stats import percent
+from config import quiz_logger, STATS_TOP_SIZE
+from utils.send_scheduler import send_scheduler
 
 
 #####################################################################################
@@ -19,16 +19,16 @@ async def show_results(message, user_id):
         user_id (int): Идентификатор пользователя, для которого отображаются результаты.
     """
     try:
-        result = await get_result(user_id)
-
-        count_of_all_questions = len(questions_data)
-        count_of_answered_questions = len(result["answered_questions"])
-        count_of_correct_questions = len(result["correct_questions"])
-        count_of_wrong_questions = len(result["wrong_questions"])
-        await message.answer("Ваш результат:")
-        await message.answer(f"Вы ответили на <b>{count_of_answered_questions}</b> вопросов из <b>{count_of_all_questions}</b>")
-        await message.answer(f"Правильных ответов: <b>{count_of_correct_questions}</b>")
-        await message.answer(f"Не правильных ответов: <b>{count_of_wrong_questions}</b>")
+        result = await get_result_counts(user_id)
+
+        count_of_all_questions = questions_loader.count()
+        count_of_answered_questions = result["answered_questions"]
+        count_of_correct_questions = result["correct_questions"]
+        count_of_wrong_questions = result["wrong_questions"]
+        send_scheduler.answer(message, "Ваш результат:")
+        send_scheduler.answer(message, f"Вы ответили на <b>{count_of_answered_questions}</b> вопросов из <b>{count_of_all_questions}</b>")
+        send_scheduler.answer(message, f"Правильных ответов: <b>{count_of_correct_questions}</b>")
+        send_scheduler.answer(message, f"Не правильных ответов: <b>{count_of_wrong_questions}</b>")
     except Exception as e:
         quiz_logger.error(f"Ошибка в show_results. {e}")
 
@@ -65,3 +65,79 @@ async def callback_results_request(callback: types.CallbackQuery):
         await show_results(callback.message, callback.message.chat.id)
     except Exception as e:
         quiz_logger.error(f"Ошибка в callback_results_request. {e}")
+
+
+#####################################################################################
+# cmd_top
+
+
+async def cmd_top(message: types.Message):
+    """
+    Обрабатывает команду /top: показывает рейтинг пользователей по правильным ответам.
+
+    Args:
+        message (types.Message): Сообщение, вызвавшее команду.
+    """
+    try:
+        user_id = message.from_user.id
+        leaderboard = await get_leaderboard(STATS_TOP_SIZE)
+        if not leaderboard:
+            send_scheduler.answer(message, "Рейтинг пока пуст: еще никто не отвечал на вопросы.")
+            return
+        lines = []
+        for place, (leader_id, correct, answered) in enumerate(leaderboard, start=1):
+            mark = " (вы)" if leader_id == user_id else ""
+            lines.append(f"{place}. Игрок {leader_id}{mark}: <b>{correct}</b> правильных из {answered}")
+        rank, correct, answered = await get_user_rank(user_id)
+        if rank is not None and rank > len(leaderboard):
+            lines.append(f"\nВаше место: <b>{rank}</b> ({correct} правильных из {answered})")
+        send_scheduler.answer(message, "Лучшие игроки:\n" + "\n".join(lines))
+    except Exception as e:
+        quiz_logger.error(f"Ошибка в cmd_top. {e}")
+
+
+#####################################################################################
+# format_stats
+
+
+def format_stats():
+    """ Возвращает сводную статистику из stats_snapshot для отправки пользователю. """
+    if stats_snapshot.refreshed_at is None:
+        return "Статистика еще не посчитана, попробуйте позже."
+    lines = [f"Игроков: <b>{stats_snapshot.users}</b>, ответов: <b>{stats_snapshot.answers}</b>, "
+             f"правильных: <b>{percent(stats_snapshot.correct, stats_snapshot.answers)}%</b>"]
+    categories = [(name, attempts, correct) for name, attempts, correct in stats_snapshot.categories if attempts]
+    if categories:
+        lines.append("\nПравильных ответов по категориям:")
+        lines.extend(f"• {html.quote(name)}: {percent(correct, attempts)}% ({attempts})" for name, attempts, correct in categories)
+    hardest = []
+    for question_id, attempts, correct in stats_snapshot.hardest:
+        question = questions_loader.get(question_id)
+        if question is not None:
+            hardest.append(f"• {html.quote(question.text)} - {percent(correct, attempts)}% ({attempts})")
+    if hardest:
+        lines.append("\nСамые сложные вопросы:")
+        lines.extend(hardest)
+    return "\n".join(lines)
+
+
+#####################################################################################
+# cmd_stats
+
+
+async def cmd_stats(message: types.Message):
+    """
+    Обрабатывает команду /stats: показывает место пользователя в рейтинге и сводную статистику.
+
+    Сводная статистика пересчитывается фоновой задачей раз в STATS_REFRESH_INTERVAL секунд.
+
+    Args:
+        message (types.Message): Сообщение, вызвавшее команду.
+    """
+    try:
+        rank, correct, answered = await get_user_rank(message.from_user.id)
+        if rank is not None:
+            send_scheduler.answer(message, f"Ваше место в рейтинге: <b>{rank}</b> ({correct} правильных из {answered})")
+        send_scheduler.answer(message, format_stats())
+    except Exception as e:
+        quiz_logger.error(f"Ошибка в cmd_stats. {e}")
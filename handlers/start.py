@@ -2,6 +2,7 @@ from aiogram import types
 from aiogram.utils.keyboard import ReplyKeyboardBuilder
 from config import bot_logger
 from db import check_user_exists
+from utils.send_scheduler import send_scheduler
 
 #####################################################################################
 # cmd_start
@@ -28,11 +29,11 @@ async def cmd_start(message: types.Message):
         if user_exists:
             bot_logger.info(f"Пользователь: {user_id} найден в базе данных")
             builder.add(types.KeyboardButton(text="Продолжить игру"))
-            await message.answer("<b>С возвращением!</b>", reply_markup=builder.as_markup(resize_keyboard=True))
+            send_scheduler.answer(message, "<b>С возвращением!</b>", reply_markup=builder.as_markup(resize_keyboard=True))
         else:
             bot_logger.info(f"Пользователь: {user_id} не найден в базе данных")
             builder.add(types.KeyboardButton(text="Начать игру"))
-            await message.answer("<b>Добро пожаловать в квиз!</b>", reply_markup=builder.as_markup(resize_keyboard=True))
+            send_scheduler.answer(message, "<b>Добро пожаловать в квиз!</b>", reply_markup=builder.as_markup(resize_keyboard=True))
 
     except Exception as e:
         bot_logger.error(f"Не удалось выполнить команду /start {e}")
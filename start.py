@@ -1,16 +1,25 @@
 import asyncio
-from config import main_logger
-from db import init_db
-from bot import start_bot
+import os
+from aiohttp import web
+from config import (TOKEN, BOT_MODE, WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT,
+                    SHARDS, SHARD_MAX_PENDING, STORAGE_BACKEND, DB_NAME, main_logger)
+from utils.logger import stop_logging
+from db import init_db, storage
+from bot import bot, start_bot, set_webhook
+from utils.sharding import ShardRouter, poll_updates, create_front_webhook_app, shard_db_name
 
 #####################################################################################
 # main
-async def main():
+async def main(updates=None):
     """
     Основная функция запуска бота.
 
-    Инициализирует подключение к базе данных, запускает бота для обработки сообщений.
-    Логирует каждый этап запуска, обработки ошибок и завершения.
+    Открывает пул соединений с базой данных, инициализирует ее структуру и запускает бота
+    для обработки сообщений. После остановки бота закрывает все соединения с базой.
+    Логирует каждый этап запуска, обработки ошибок и завершения и в конце дописывает логи из очереди в файлы.
+
+    Args:
+        updates (multiprocessing.Queue, optional): Очередь обновлений, если бот запущен как шард.
 
     Использование:
         Вызывается при запуске скрипта для старта бота и подключения к базе данных.
@@ -18,14 +27,79 @@ async def main():
     main_logger.info("Начало запуска...")
     try:
         main_logger.info("Подключение к базе данных...")
+        await storage.open()
         await init_db()
        
         main_logger.info("Запуск бота...")
-        await start_bot()
+        await start_bot(updates)
     except Exception as e:
         main_logger.error(f"Произошла ошибка во время выполнения: {e}")
         main_logger.exception("Исключение при запуске бота:")
+    finally:
+        await storage.close()
+        main_logger.info("Соединения с базой данных закрыты")
+        stop_logging()
+
+
+#####################################################################################
+# run_shard
+def run_shard(updates):
+    """ Точка входа процесса-шарда: запускает бота, получающего обновления из очереди updates. """
+    asyncio.run(main(updates))
+
+
+#####################################################################################
+# run_sharded
+async def run_sharded():
+    """
+    Запускает шардированный режим: SHARDS процессов-шардов и прием обновлений в основном процессе.
+
+    Основной процесс получает обновления опросом или через вебхук (в зависимости от BOT_MODE)
+    и передает их шардам по хешу user_id, не разбирая в модели aiogram. Каждый шард обрабатывает
+    своих пользователей со своей базой данных, поэтому разбор обновлений, обработчики и работа
+    с базой распределяются по ядрам, а обновления одного пользователя обрабатываются по порядку.
+    Банк вопросов шарды читают из общего файла.
+
+    Если есть общая база данных DB_NAME, а баз шардов еще нет, шарды не запускаются:
+    иначе прогресс пользователей из общей базы молча пропал бы.
+
+    Использование:
+        Вызывается при запуске скрипта, если SHARDS > 1.
+    """
+    shard_dbs = [shard_db_name(DB_NAME, index) for index in range(SHARDS)]
+    if STORAGE_BACKEND == 'sqlite' and os.path.exists(DB_NAME) and not any(os.path.exists(name) for name in shard_dbs):
+        main_logger.error(f"База данных {DB_NAME} не разделена по шардам ({', '.join(shard_dbs)}). "
+                          f"Запустите бота с SHARDS=1 или перенесите прогресс пользователей в базы шардов")
+        stop_logging()
+        return
+    main_logger.info(f"Запуск {SHARDS} шардов...")
+    router = ShardRouter(SHARDS, run_shard, max_pending=SHARD_MAX_PENDING)
+    router.start()
+    runner = None
+    try:
+        if BOT_MODE == 'webhook':
+            await set_webhook(bot)
+            runner = web.AppRunner(create_front_webhook_app(router, WEBHOOK_PATH, WEBHOOK_SECRET), access_log=None)
+            await runner.setup()
+            await web.TCPSite(runner, WEBAPP_HOST, WEBAPP_PORT).start()
+            main_logger.info(f"Вебхук слушает {WEBAPP_HOST}:{WEBAPP_PORT}{WEBHOOK_PATH}")
+            await asyncio.Event().wait()
+        else:
+            await bot.delete_webhook()
+            await poll_updates(TOKEN, router, main_logger)
+    except Exception as e:
+        main_logger.error(f"Ошибка в run_sharded: {e}")
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+        await bot.session.close()
+        await router.stop()
+        main_logger.info("Шарды остановлены")
+        stop_logging()
 
 if __name__ == "__main__":
     main_logger.info("---")
-    asyncio.run(main())
+    if SHARDS > 1:
+        asyncio.run(run_sharded())
+    else:
+        asyncio.run(main())
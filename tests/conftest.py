@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Модули бота читают настройки из окружения при импорте config.py:
+# тесты не должны писать логи и базу данных в директорию проекта
+os.environ.setdefault('TELEGRAM_TOKEN', '123456:TESTS')
+os.environ.setdefault('DB_NAME', os.path.join(tempfile.mkdtemp(), 'tests.db'))
+os.environ.setdefault('LOG_DIR', tempfile.mkdtemp())
+os.environ.setdefault('LOG_UPDATES', 'false')
+os.environ.setdefault('QUESTIONS_FILE', os.path.join(ROOT, 'questions.json'))
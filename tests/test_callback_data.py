@@ -0,0 +1,31 @@
+from utils.callback_data import AnswerSigner, AnswerData, CALLBACK_DATA_LIMIT, is_answer_data
+
+signer = AnswerSigner(b'test-secret')
+
+
+def test_round_trip():
+    data = signer.pack(42, 123456, 3, 0xDEADBEEF)
+    assert is_answer_data(data)
+    assert len(data.encode()) <= CALLBACK_DATA_LIMIT
+    assert signer.unpack(42, data) == AnswerData(123456, 3, 0xDEADBEEF)
+
+
+def test_rejects_button_of_another_user():
+    assert signer.unpack(43, signer.pack(42, 1, 0, 1)) is None
+
+
+def test_rejects_forged_payload():
+    payload, _, signature = signer.pack(42, 1, 0, 1).rpartition(':')
+    forged = payload[:-1] + '2'
+    assert signer.unpack(42, f"{forged}:{signature}") is None
+
+
+def test_rejects_forged_signature_and_garbage():
+    data = signer.pack(42, 1, 0, 1)
+    assert signer.unpack(42, data[:-1] + ('A' if data[-1] != 'A' else 'B')) is None
+    assert signer.unpack(42, 'a:1:0:1') is None
+    assert signer.unpack(42, '') is None
+
+
+def test_rejects_other_secret():
+    assert AnswerSigner(b'other-secret').unpack(42, signer.pack(42, 1, 0, 1)) is None
@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_config(**env):
+    return subprocess.run([sys.executable, '-c', 'import config'], cwd=ROOT, env={**os.environ, **env},
+                          capture_output=True, text=True)
+
+
+@pytest.mark.parametrize('mode', ['off', 'fixed', 'random'])
+def test_known_suspense_modes_are_accepted(mode):
+    assert import_config(SUSPENSE_MODE=mode).returncode == 0
+
+
+def test_misspelled_suspense_mode_fails_at_startup():
+    result = import_config(SUSPENSE_MODE='randon')
+    assert result.returncode != 0
+    assert "SUSPENSE_MODE='randon'" in result.stderr
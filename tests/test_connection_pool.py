@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from utils.connection_pool import ConnectionPool
+
+
+async def insert(db, value):
+    await db.execute('INSERT INTO items (value) VALUES (?)', (value,))
+
+
+async def fail(db, value):
+    await db.execute('INSERT INTO items (value) VALUES (?)', (value,))
+    raise ValueError("ошибка операции")
+
+
+def test_failed_operation_rolls_back_only_itself(tmp_path):
+    async def scenario():
+        pool = ConnectionPool(str(tmp_path / 'pool.db'), readers=1, batch_delay=0.05)
+        await pool.open()
+        try:
+            async with pool.writer() as db:
+                await db.execute('CREATE TABLE items (value INTEGER)')
+            results = await asyncio.gather(pool.submit(insert, 1), pool.submit(fail, 2), pool.submit(insert, 3),
+                                           return_exceptions=True)
+            async with pool.reader() as db:
+                async with db.execute('SELECT value FROM items ORDER BY value') as cursor:
+                    rows = await cursor.fetchall()
+        finally:
+            await pool.close()
+        return results, rows
+
+    results, rows = asyncio.run(scenario())
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], ValueError)
+    assert rows == [(1,), (3,)]
+
+
+def test_failed_commit_and_rollback_keep_writer_alive(tmp_path):
+    async def scenario():
+        pool = ConnectionPool(str(tmp_path / 'pool.db'), readers=1)
+        await pool.open()
+        try:
+            async with pool.writer() as db:
+                await db.execute('CREATE TABLE items (value INTEGER)')
+            writer = pool._writer
+            commit, rollback = writer.commit, writer.rollback
+
+            async def broken_commit():
+                writer.commit = commit
+                raise OSError("диск недоступен")
+
+            async def broken_rollback():
+                writer.rollback = rollback
+                raise OSError("откат не удался")
+
+            writer.commit, writer.rollback = broken_commit, broken_rollback
+            await pool.submit(insert, 1)
+        except OSError as e:
+            error = e
+        else:
+            error = None
+        try:
+            await asyncio.wait_for(pool.submit(insert, 2), 5)
+            async with pool.reader() as db:
+                async with db.execute('SELECT value FROM items') as cursor:
+                    rows = await cursor.fetchall()
+        finally:
+            await pool.close()
+        return error, rows
+
+    error, rows = asyncio.run(scenario())
+    assert isinstance(error, OSError)
+    assert rows == [(2,)]
+
+
+def test_submit_requires_open_pool(tmp_path):
+    pool = ConnectionPool(str(tmp_path / 'pool.db'))
+    with pytest.raises(RuntimeError):
+        asyncio.run(pool.submit(insert, 1))
@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from utils.metrics import MetricsRegistry, timed, format_labels, create_metrics_app
+
+
+def test_render_counter_histogram_and_callback():
+    registry = MetricsRegistry()
+    counter = registry.counter('test_updates_total', 'Обновления.', ('type',))
+    histogram = registry.histogram('test_seconds', 'Время.', ('step',), buckets=(0.1, 1.0))
+    registry.callback('test_cached', 'Сессии.', lambda: 3)
+    counter.inc('message')
+    counter.inc('message', amount=2)
+    histogram.observe(0.05, 'save')
+    histogram.observe(0.5, 'save')
+    histogram.observe(5, 'save')
+
+    lines = registry.render().splitlines()
+    assert '# TYPE test_updates_total counter' in lines
+    assert 'test_updates_total{type="message"} 3' in lines
+    assert 'test_seconds_bucket{step="save",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{step="save",le="1"} 2' in lines
+    assert 'test_seconds_bucket{step="save",le="+Inf"} 3' in lines
+    assert 'test_seconds_sum{step="save"} 5.55' in lines
+    assert 'test_seconds_count{step="save"} 3' in lines
+    assert 'test_cached 3' in lines
+
+
+def test_labels_are_escaped_and_names_unique():
+    assert format_labels(('name',), ('a"b\\c\nd',)) == '{name="a\\"b\\\\c\\nd"}'
+    registry = MetricsRegistry()
+    registry.counter('test_total', 'Счетчик.')
+    with pytest.raises(ValueError):
+        registry.counter('test_total', 'Счетчик.')
+
+
+class Storage:
+    async def load(self, fail=False):
+        if fail:
+            raise OSError("ошибка")
+
+    async def wait(self):
+        await asyncio.sleep(10)
+
+
+def test_timed_labels_by_qualname_and_ignores_cancellation():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('test_call_seconds', 'Время.', ('function',))
+    errors = registry.counter('test_errors_total', 'Ошибки.', ('function',))
+    storage = Storage()
+    load, wait = timed(histogram, errors)(Storage.load), timed(histogram, errors)(Storage.wait)
+
+    async def scenario():
+        await load(storage)
+        with pytest.raises(OSError):
+            await load(storage, fail=True)
+        task = asyncio.create_task(wait(storage))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert errors.values == {('Storage.load',): 1}
+    assert histogram.values[('Storage.load',)][2] == 2
+    assert histogram.values[('Storage.wait',)][2] == 1
+
+
+def test_metrics_endpoint_serves_text_format():
+    from aiohttp.test_utils import TestClient, TestServer
+
+    async def scenario():
+        async with TestClient(TestServer(create_metrics_app())) as client:
+            response = await client.get('/metrics')
+            return response.status, response.headers['Content-Type'], await response.text()
+
+    status, content_type, text = asyncio.run(scenario())
+    assert status == 200 and content_type.startswith('text/plain')
+    assert '# TYPE quiz_updates_total counter' in text
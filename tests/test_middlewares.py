@@ -0,0 +1,80 @@
+import asyncio
+from types import SimpleNamespace
+from utils.callback_data import answer_signer
+from utils.keyed_lock import KeyedLock, RecentKeys
+from utils.middlewares import AnswerDedupMiddleware, UserLockMiddleware
+
+
+def answer_update(user_id, question_id, message_id, data=None):
+    if data is None:
+        data = answer_signer.pack(user_id, question_id, 0, 1)
+    callback = SimpleNamespace(data=data, from_user=SimpleNamespace(id=user_id), message=SimpleNamespace(message_id=message_id))
+    return SimpleNamespace(callback_query=callback)
+
+
+def test_dedup_drops_second_tap_on_the_same_message():
+    middleware = AnswerDedupMiddleware()
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+        return 'ok'
+
+    async def scenario():
+        updates = [answer_update(1, 5, 100), answer_update(1, 5, 100), answer_update(1, 5, 101),
+                   answer_update(2, 5, 100), answer_update(1, 6, 100, data='a:forged:0:1'),
+                   answer_update(1, 6, 100, data='a:forged:0:1')]
+        return [await middleware(handler, update, {}) for update in updates], updates
+
+    results, updates = asyncio.run(scenario())
+    assert results == ['ok', None, 'ok', 'ok', 'ok', 'ok']
+    assert handled == [updates[0], updates[2], updates[3], updates[4], updates[5]]
+
+
+def test_recent_keys_forget_the_oldest_key():
+    keys = RecentKeys(max_size=2)
+    assert not keys.check_and_add('a', 1)
+    assert not keys.check_and_add('b', 1)
+    assert keys.check_and_add('a', 1)
+    assert not keys.check_and_add('c', 1)
+    assert not keys.check_and_add('b', 1)
+    assert len(keys) == 2
+
+
+def test_user_lock_serializes_one_user_and_drops_overflow():
+    middleware = UserLockMiddleware(max_pending=2)
+    log = []
+
+    async def handler(event, data):
+        log.append(('start', event))
+        await asyncio.sleep(0.01)
+        log.append(('end', event))
+        return event
+
+    async def scenario():
+        data = {'event_from_user': SimpleNamespace(id=1)}
+        other = {'event_from_user': SimpleNamespace(id=2)}
+        results = await asyncio.gather(middleware(handler, 'a', data), middleware(handler, 'b', data),
+                                       middleware(handler, 'c', data), middleware(handler, 'x', other))
+        return results, len(middleware.locks)
+
+    results, locks = asyncio.run(scenario())
+    assert results == ['a', 'b', None, 'x']
+    assert log.index(('end', 'a')) < log.index(('start', 'b'))
+    assert log.index(('start', 'x')) < log.index(('end', 'a'))
+    assert locks == 0
+
+
+def test_keyed_lock_is_removed_after_failure():
+    locks = KeyedLock()
+
+    async def scenario():
+        try:
+            async with locks.hold(1):
+                assert locks.pending(1) == 1
+                raise ValueError
+        except ValueError:
+            pass
+        return len(locks), locks.pending(1)
+
+    assert asyncio.run(scenario()) == (0, 0)
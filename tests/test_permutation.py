@@ -0,0 +1,21 @@
+from utils.permutation import Permutation, mix64
+
+
+def test_same_seed_gives_same_order():
+    assert list(Permutation(1000, 12345)) == list(Permutation(1000, 12345))
+
+
+def test_order_is_a_permutation():
+    for size in (1, 2, 3, 7, 64, 100, 1001):
+        assert sorted(Permutation(size, size * 31)) == list(range(size))
+
+
+def test_different_seeds_give_different_orders():
+    assert list(Permutation(100, 1)) != list(Permutation(100, 2))
+
+
+def test_known_values_are_stable():
+    # Порядок вопросов пользователя восстанавливается из зерна, сохраненного в базе данных,
+    # поэтому вычисление перестановки не должно меняться между версиями бота
+    assert mix64(0) == 0xE220A8397B1DCDAF
+    assert list(Permutation(10, 7)) == [3, 8, 4, 5, 7, 9, 1, 0, 6, 2]
@@ -0,0 +1,31 @@
+import pytest
+from utils.question import Question, parse_questions
+
+
+def raw_question(**fields):
+    raw = {'id': 1, 'question': "Что такое Python?", 'options': ['Язык', 'Змея'], 'correct_option': 0,
+           'category': 'python', 'difficulty': 'easy'}
+    raw.update(fields)
+    return {key: value for key, value in raw.items() if value is not ...}
+
+
+def test_valid_question():
+    question = Question.from_dict(raw_question())
+    assert (question.id, question.text, question.options, question.correct_option) == (1, "Что такое Python?", ('Язык', 'Змея'), 0)
+
+
+@pytest.mark.parametrize('fields', [
+    {'question': ...}, {'question': None}, {'question': 42}, {'question': ''}, {'question': '   '},
+    {'id': ...}, {'id': '1'}, {'id': True},
+    {'options': []}, {'options': 'Язык'}, {'options': ['Язык', 2]},
+    {'correct_option': 2}, {'correct_option': -1}, {'correct_option': '0'},
+    {'category': ''}, {'difficulty': 'legendary'},
+])
+def test_invalid_question_is_rejected(fields):
+    with pytest.raises(ValueError):
+        Question.from_dict(raw_question(**fields))
+
+
+def test_duplicate_ids_are_rejected():
+    with pytest.raises(ValueError):
+        parse_questions([raw_question(), raw_question()])
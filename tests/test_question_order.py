@@ -0,0 +1,64 @@
+import db
+from utils import bitset
+from utils.permutation import Permutation
+from utils.questions_loader import questions_loader
+from utils.session_cache import Session
+
+
+class CountingPermutation(Permutation):
+    lookups = 0
+
+    def __getitem__(self, position):
+        CountingPermutation.lookups += 1
+        return super().__getitem__(position)
+
+
+def answered_all_but(indexes, seed=1, category=None):
+    ids = questions_loader.all_ids()
+    session = Session(1, bank_version=questions_loader.version)
+    for index, question_id in enumerate(ids):
+        if index not in indexes:
+            session.record(question_id, index, 'correct')
+    session.start_order(seed, category)
+    return session
+
+
+def test_walk_is_capped_for_nearly_finished_bank(monkeypatch):
+    monkeypatch.setattr(db, 'Permutation', CountingPermutation)
+    monkeypatch.setattr(db, 'ORDER_MAX_SKIPS', 3)
+    ids = questions_loader.all_ids()
+    last = len(ids) - 1
+    for seed in range(20):
+        CountingPermutation.lookups = 0
+        session = answered_all_but({last}, seed)
+        assert db.pick_unanswered_question(session) == ids[last]
+        assert CountingPermutation.lookups <= 3
+
+
+def test_capped_walk_stays_within_category(monkeypatch):
+    monkeypatch.setattr(db, 'ORDER_MAX_SKIPS', 1)
+    category = questions_loader.categories()[0][0]
+    slice_ = questions_loader.slice(category)
+    ids = questions_loader.all_ids()
+    free = {slice_[-1], next(index for index in range(len(ids)) if index not in slice_)}
+    for seed in range(20):
+        session = answered_all_but(free, seed, category)
+        assert db.pick_unanswered_question(session) == ids[slice_[-1]]
+
+
+def test_every_question_is_picked_once():
+    ids = questions_loader.all_ids()
+    session = Session(1, bank_version=questions_loader.version)
+    session.start_order(7)
+    picked = []
+    while (question_id := db.pick_unanswered_question(session)) is not None:
+        picked.append(question_id)
+        session.record(question_id, questions_loader.index_of(question_id), 'wrong')
+    assert sorted(picked) == sorted(ids)
+
+
+def test_random_set_and_from_indexes():
+    mask = bitset.from_indexes([1, 64, 130], 131)
+    assert list(bitset.iter_bits(mask)) == [1, 64, 130]
+    assert {bitset.random_set(mask) for _ in range(200)} == {1, 64, 130}
+    assert bitset.random_set(0) is None
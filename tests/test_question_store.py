@@ -0,0 +1,62 @@
+import json
+import pytest
+from utils.question_store import SqliteQuestionBank, bank_version, file_crc32
+from utils.questions_loader import QuestionBank
+
+
+def write_questions(path, ids, jsonl=False):
+    questions = [{'id': question_id, 'question': f"Вопрос {question_id}", 'options': ['да', 'нет'], 'correct_option': question_id % 2,
+                  'category': 'python' if question_id % 3 else 'sql', 'difficulty': 'easy'} for question_id in ids]
+    with open(path, 'w', encoding='utf-8') as file:
+        if jsonl:
+            file.writelines(json.dumps(question, ensure_ascii=False) + '\n' for question in questions)
+        else:
+            json.dump(questions, file, ensure_ascii=False)
+
+
+def test_backends_assign_the_same_indexes_to_an_unsorted_file(tmp_path):
+    source = tmp_path / 'questions.json'
+    write_questions(source, [30, 10, 20, 5])
+    memory = QuestionBank.from_file(str(source))
+    stored = SqliteQuestionBank.open(str(source), str(tmp_path / 'questions.db'))
+    try:
+        assert list(memory.ids) == list(stored.ids) == [5, 10, 20, 30]
+        assert memory.version == stored.version == bank_version(str(source))
+        assert [memory.index_of(question_id) for question_id in (5, 30)] == [stored.index_of(question_id) for question_id in (5, 30)]
+        assert memory.categories.get('sql') == stored.categories.get('sql')
+    finally:
+        stored.close()
+
+
+def test_version_differs_from_plain_file_crc(tmp_path):
+    # Банки прежних версий нумеровали вопросы в порядке файла с версией CRC32 файла:
+    # новая версия заставляет перевести их битовые карты на новые индексы
+    source = tmp_path / 'questions.json'
+    write_questions(source, [2, 1])
+    assert bank_version(str(source)) != file_crc32(str(source))
+
+
+def test_import_reads_jsonl_and_reuses_the_store(tmp_path):
+    source = tmp_path / 'questions.jsonl'
+    db_path = str(tmp_path / 'questions.db')
+    write_questions(source, range(1, 101), jsonl=True)
+    bank = SqliteQuestionBank.open(str(source), db_path, cache_size=10)
+    try:
+        assert len(bank.ids) == 100
+        assert bank.get(42).text == "Вопрос 42"
+        assert bank.get(1000) is None
+        assert SqliteQuestionBank.stored_version(db_path) == bank.version
+    finally:
+        bank.close()
+
+
+def test_import_rejects_duplicate_ids_and_keeps_previous_store(tmp_path):
+    source = tmp_path / 'questions.json'
+    db_path = str(tmp_path / 'questions.db')
+    write_questions(source, [1, 2])
+    SqliteQuestionBank.open(str(source), db_path).close()
+    version = SqliteQuestionBank.stored_version(db_path)
+    write_questions(source, [1, 1])
+    with pytest.raises(ValueError):
+        SqliteQuestionBank.open(str(source), db_path)
+    assert SqliteQuestionBank.stored_version(db_path) == version
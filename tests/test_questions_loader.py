@@ -0,0 +1,65 @@
+import asyncio
+import json
+import sqlite3
+import pytest
+from utils.questions_loader import DataLoader
+
+
+def write_questions(path, ids, text="Вопрос"):
+    questions = [{'id': question_id, 'question': f"{text} {question_id}", 'options': ['да', 'нет'], 'correct_option': 0,
+                  'category': 'python', 'difficulty': 'easy'} for question_id in ids]
+    path.write_text(json.dumps(questions, ensure_ascii=False), encoding='utf-8')
+
+
+def test_reload_swaps_bank_and_notifies_listeners(tmp_path):
+    source = tmp_path / 'questions.json'
+    write_questions(source, [1, 2])
+    loader = DataLoader(str(source))
+    loader.load_data()
+    notified = []
+
+    async def listener(bank):
+        notified.append(bank.version)
+
+    async def failing_listener(bank):
+        raise RuntimeError("ошибка обработчика")
+
+    loader.listeners.extend([failing_listener, listener])
+
+    async def scenario():
+        unchanged = await loader.reload()
+        write_questions(source, [1, 2, 3])
+        changed = await loader.reload()
+        source.write_text('[{"id": 1', encoding='utf-8')
+        broken = await loader.reload()
+        return unchanged, changed, broken
+
+    first_version = loader.version
+    assert asyncio.run(scenario()) == (False, True, False)
+    assert loader.version != first_version
+    assert notified == [loader.version]
+    assert list(loader.all_ids()) == [1, 2, 3]
+    assert loader.generation == 2
+
+
+def test_sqlite_reload_closes_the_previous_bank(tmp_path):
+    source = tmp_path / 'questions.json'
+    write_questions(source, [1, 2])
+    loader = DataLoader(str(source), backend='sqlite', db_path=str(tmp_path / 'questions.db'))
+    loader.load_data()
+    previous = loader.bank
+    seen = []
+
+    async def listener(bank):
+        seen.append(previous.get(1).text)
+
+    loader.listeners.append(listener)
+    write_questions(source, [1, 2], text="Новый вопрос")
+    try:
+        assert asyncio.run(loader.reload())
+        assert seen == ["Вопрос 1"]
+        assert loader.get(1).text == "Новый вопрос 1"
+        with pytest.raises(sqlite3.ProgrammingError):
+            previous._db.execute('SELECT 1')
+    finally:
+        loader.bank.close()
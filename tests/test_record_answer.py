@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+import db
+from utils.storage import MemoryStorage
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    storage = MemoryStorage()
+    monkeypatch.setattr(db, 'storage', storage)
+    db.session_cache._sessions.clear()
+    db.session_cache._evicted.clear()
+    asyncio.run(db.init_db())
+    yield storage
+    db.session_cache._sessions.clear()
+    db.session_cache._evicted.clear()
+
+
+def test_answer_to_current_question_advances(storage):
+    async def scenario():
+        await db.start_quiz(1, seed=1)
+        current = await db.get_quiz_id(1)
+        next_question_id = await db.record_answer(1, current, True)
+        return current, next_question_id, await db.get_quiz_id(1), await db.get_result_counts(1)
+
+    current, next_question_id, now_current, counts = asyncio.run(scenario())
+    assert next_question_id not in (None, current, db.ANSWER_IGNORED, db.ANSWER_NOT_SAVED)
+    assert now_current == next_question_id
+    assert counts == {'answered_questions': 1, 'correct_questions': 1, 'wrong_questions': 0}
+
+
+def test_stale_and_duplicate_answers_are_ignored(storage):
+    async def scenario():
+        await db.start_quiz(2, seed=1)
+        first = await db.get_quiz_id(2)
+        await db.record_answer(2, first, True)
+        current = await db.get_quiz_id(2)
+        other = next(question_id for question_id in db.questions_loader.all_ids() if question_id not in (first, current))
+        results = await db.record_answer(2, first, False), await db.record_answer(2, other, True)
+        return results, current, await db.get_quiz_id(2), await db.get_result_counts(2)
+
+    results, current, now_current, counts = asyncio.run(scenario())
+    assert results == (db.ANSWER_IGNORED, db.ANSWER_IGNORED)
+    assert now_current == current
+    assert counts == {'answered_questions': 1, 'correct_questions': 1, 'wrong_questions': 0}
+
+
+def test_failed_write_rolls_back_the_answer(storage):
+    async def fail(changes):
+        raise OSError("диск недоступен")
+
+    async def scenario():
+        await db.start_quiz(3, seed=1)
+        current = await db.get_quiz_id(3)
+        storage.write_changes = fail
+        result = await db.record_answer(3, current, True)
+        state = await db.get_quiz_id(3), await db.get_result_counts(3)
+        del storage.write_changes
+        return current, result, state, await db.record_answer(3, current, True)
+
+    current, result, (now_current, counts), retry = asyncio.run(scenario())
+    assert result is db.ANSWER_NOT_SAVED
+    assert now_current == current
+    assert counts['answered_questions'] == 0
+    assert retry not in (db.ANSWER_NOT_SAVED, db.ANSWER_IGNORED)
@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import ReplyKeyboardRemove
+from utils.send_scheduler import (SendScheduler, PriorityLimiter, PRIORITY_QUESTION, PRIORITY_NORMAL,
+                                  PRIORITY_DECORATIVE)
+
+
+class FakeBot:
+    """ Бот, который записывает вызовы и отвечает 429 на первые retry_after вызовов. """
+
+    def __init__(self, retry_after=0):
+        self.calls = []
+        self.retry_after = retry_after
+
+    async def __call__(self, method):
+        if self.retry_after:
+            self.retry_after -= 1
+            raise TelegramRetryAfter(method, "Too Many Requests", 0)
+        self.calls.append(method)
+        return len(self.calls)
+
+
+def message(bot, chat_id=1):
+    return SimpleNamespace(bot=bot, chat=SimpleNamespace(id=chat_id), message_id=10)
+
+
+def test_adjacent_plain_messages_are_merged():
+    async def run():
+        scheduler = SendScheduler(chat_rate=0, global_rate=0)
+        bot = FakeBot()
+        first = scheduler.answer(message(bot), "Ваш ответ")
+        second = scheduler.answer(message(bot), "Верно!")
+        question = scheduler.answer(message(bot), "Вопрос", reply_markup=ReplyKeyboardRemove())
+        await scheduler.stop()
+        return bot.calls, [first.result(), second.result(), question.result()]
+
+    calls, results = asyncio.run(run())
+    assert [call.text for call in calls] == ["Ваш ответ\nВерно!", "Вопрос"]
+    assert results == [1, 1, 2]
+
+
+def test_chat_queue_keeps_order_regardless_of_priority():
+    async def run():
+        scheduler = SendScheduler(chat_rate=0, global_rate=0)
+        bot = FakeBot()
+        scheduler.answer(message(bot), "И это...", priority=PRIORITY_DECORATIVE, merge=False)
+        scheduler.answer(message(bot), "Верно!", merge=False)
+        scheduler.answer(message(bot), "Вопрос", priority=PRIORITY_QUESTION, merge=False)
+        await scheduler.stop()
+        return [call.text for call in bot.calls]
+
+    assert asyncio.run(run()) == ["И это...", "Верно!", "Вопрос"]
+
+
+def test_retry_after_is_retried_and_then_given_up():
+    async def run(retry_after):
+        scheduler = SendScheduler(chat_rate=0, global_rate=0, max_retries=2)
+        bot = FakeBot(retry_after=retry_after)
+        future = scheduler.answer(message(bot), "Вопрос")
+        await scheduler.stop()
+        return future.result(), len(bot.calls)
+
+    assert asyncio.run(run(2)) == (1, 1)
+    assert asyncio.run(run(3)) == (None, 0)
+
+
+def test_limiter_grants_waiting_tokens_by_priority():
+    async def run():
+        limiter = PriorityLimiter(rate=1000, capacity=1)
+        granted = []
+
+        async def acquire(name, priority):
+            await limiter.acquire(priority)
+            granted.append(name)
+
+        await limiter.acquire(PRIORITY_NORMAL)
+        await asyncio.gather(acquire('decorative', PRIORITY_DECORATIVE), acquire('normal', PRIORITY_NORMAL),
+                             acquire('question', PRIORITY_QUESTION))
+        return granted
+
+    assert asyncio.run(run()) == ['question', 'normal', 'decorative']
+
+
+def test_question_chat_overtakes_decorative_chats():
+    async def run():
+        scheduler = SendScheduler(chat_rate=0, global_rate=1000, global_burst=1)
+        bot = FakeBot()
+        for chat_id in (1, 2, 3):
+            scheduler.answer(message(bot, chat_id), f"Точки {chat_id}", priority=PRIORITY_DECORATIVE)
+        scheduler.answer(message(bot, 4), "Вопрос", priority=PRIORITY_QUESTION)
+        await scheduler.stop()
+        return [call.text for call in bot.calls]
+
+    calls = asyncio.run(run())
+    assert calls[0] == "Точки 1"
+    assert calls[1] == "Вопрос"
@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from utils.session_cache import Session, SessionCache
+
+
+class FakeDatabase:
+    """ Загрузчик и запись сессий в памяти; fail - сколько следующих записей завершатся ошибкой. """
+
+    def __init__(self):
+        self.loads = []
+        self.writes = []
+        self.fail = 0
+
+    async def load(self, user_id):
+        self.loads.append(user_id)
+        return Session(user_id)
+
+    async def flush(self, changes):
+        if self.fail:
+            self.fail -= 1
+            raise OSError("база данных недоступна")
+        self.writes.append({change.user_id: dict(change.answers) for change in changes})
+
+
+def make_cache(database, **kwargs):
+    return SessionCache(database.load, database.flush, **kwargs)
+
+
+def test_write_behind_batches_changes_until_flush():
+    async def scenario():
+        database = FakeDatabase()
+        cache = make_cache(database, write_behind=True)
+        for user_id in (1, 2):
+            session = await cache.get(user_id)
+            session.record(10, 0, 'correct')
+            await cache.commit(session)
+        session.record(11, 1, 'wrong')
+        await cache.commit(session)
+        before = list(database.writes)
+        await cache.flush()
+        await cache.flush()
+        return database, before, session
+
+    database, before, session = asyncio.run(scenario())
+    assert before == []
+    assert database.writes == [{1: {10: 'correct'}, 2: {10: 'correct', 11: 'wrong'}}]
+    assert database.loads == [1, 2]
+    assert not session.dirty
+
+
+def test_failed_flush_restores_changes_for_the_next_one():
+    async def scenario():
+        database = FakeDatabase()
+        cache = make_cache(database, write_behind=True)
+        session = await cache.get(1)
+        session.record(10, 0, 'correct')
+        await cache.commit(session)
+        database.fail = 1
+        await cache.flush()
+        dirty = session.dirty
+        session.record(11, 1, 'wrong')
+        await cache.commit(session)
+        await cache.flush()
+        return database, dirty
+
+    database, dirty = asyncio.run(scenario())
+    assert dirty
+    assert database.writes == [{1: {10: 'correct', 11: 'wrong'}}]
+
+
+def test_failed_write_through_discards_the_session():
+    async def scenario():
+        database = FakeDatabase()
+        cache = make_cache(database)
+        session = await cache.get(1)
+        session.record(10, 0, 'correct')
+        database.fail = 1
+        with pytest.raises(OSError):
+            await cache.commit(session)
+        reloaded = await cache.get(1)
+        return database, session, reloaded
+
+    database, session, reloaded = asyncio.run(scenario())
+    assert reloaded is not session
+    assert not reloaded.has_outcome(10)
+    assert database.loads == [1, 1]
+    assert database.writes == []
+
+
+def test_evicted_dirty_session_is_kept_until_written():
+    async def scenario():
+        database = FakeDatabase()
+        cache = make_cache(database, max_size=1, write_behind=True)
+        session = await cache.get(1)
+        session.record(10, 0, 'correct')
+        await cache.commit(session)
+        await cache.get(2)
+        same = await cache.get(1) is session
+        await cache.get(2)
+        await cache.flush()
+        return database, same, dict(cache._evicted)
+
+    database, same, evicted = asyncio.run(scenario())
+    assert same
+    assert database.loads == [1, 2, 2]
+    assert database.writes == [{1: {10: 'correct'}}]
+    assert evicted == {}
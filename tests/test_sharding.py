@@ -0,0 +1,118 @@
+import asyncio
+import multiprocessing
+import queue
+import pytest
+from utils.sharding import ShardQueue, ShardRouter, extract_user_id, shard_for, shard_db_name
+
+
+def message_update(update_id, user_id):
+    return {'update_id': update_id, 'message': {'message_id': 1, 'from': {'id': user_id}, 'chat': {'id': user_id}}}
+
+
+def make_router(shards, max_pending):
+    router = ShardRouter(shards, target=None, max_pending=max_pending)
+    context = multiprocessing.get_context('spawn')
+    router.queues = [ShardQueue(context) for _ in range(shards)]
+    return router
+
+
+def test_extract_user_id():
+    assert extract_user_id(message_update(1, 77)) == 77
+    assert extract_user_id({'update_id': 1, 'callback_query': {'from': {'id': 5}, 'data': 'x'}}) == 5
+    assert extract_user_id({'update_id': 1, 'my_chat_member': {'chat': {'id': -100}}}) == -100
+    assert extract_user_id({'update_id': 1}) is None
+
+
+def test_shard_for_is_stable_and_in_range():
+    for user_id in (1, 2, 10 ** 12, -100500):
+        assert 0 <= shard_for(user_id, 4) < 4
+        assert shard_for(user_id, 4) == shard_for(user_id, 4)
+    assert shard_for(None, 4) == 0
+    assert len({shard_for(user_id, 4) for user_id in range(100)}) == 4
+
+
+def test_shard_db_name():
+    assert shard_db_name('quiz_bot.db', 2) == 'quiz_bot.shard2.db'
+    assert shard_db_name('/data/quiz', 0) == '/data/quiz.shard0'
+
+
+def test_updates_of_one_user_go_to_one_queue_in_order():
+    router = make_router(3, max_pending=100)
+    for update_id in range(5):
+        router.route(message_update(update_id, 42))
+    shard = router.queues[shard_for(42, 3)]
+    assert shard.qsize() == 5
+    assert [shard.get()['update_id'] for _ in range(5)] == list(range(5))
+    assert all(shard_queue.qsize() == 0 for shard_queue in router.queues)
+
+
+def test_full_shard_stops_accepting():
+    router = make_router(2, max_pending=2)
+    update = message_update(1, 42)
+    router.route(update)
+    assert router.can_accept(update)
+    router.route(update)
+    assert not router.can_accept(update)
+    other = next(message_update(2, user_id) for user_id in range(100) if shard_for(user_id, 2) != shard_for(42, 2))
+    assert router.can_accept(other)
+    router.queues[shard_for(42, 2)].get()
+    assert router.can_accept(update)
+
+
+def test_get_nowait_on_empty_queue():
+    shard = ShardQueue(multiprocessing.get_context('spawn'))
+    with pytest.raises(queue.Empty):
+        shard.get_nowait()
+    assert shard.qsize() == 0
+
+
+def test_shard_takes_updates_only_for_free_workers(monkeypatch):
+    import bot
+
+    started = []
+    release = None
+
+    async def feed_raw_update(bot, update):
+        started.append(update['update_id'])
+        await release.wait()
+
+    monkeypatch.setattr(bot, 'WEBHOOK_WORKERS', 2)
+    monkeypatch.setattr(bot.dp, 'feed_raw_update', feed_raw_update)
+    shard = ShardQueue(multiprocessing.get_context('spawn'))
+    for update_id in range(5):
+        shard.put(message_update(update_id, 42))
+    shard.put(None)
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        task = asyncio.create_task(bot.run_update_queue(bot.bot, shard))
+        await asyncio.sleep(0.5)
+        pending = len(started), shard.qsize()
+        release.set()
+        await asyncio.wait_for(task, 5)
+        return pending
+
+    assert asyncio.run(scenario()) == (2, 4)
+    assert started == list(range(5))
+    assert shard.qsize() == 0
+
+
+def test_front_webhook_checks_secret_and_backpressure():
+    from aiohttp.test_utils import TestClient, TestServer
+    from utils.sharding import create_front_webhook_app
+
+    router = make_router(1, max_pending=1)
+    update = message_update(1, 42)
+
+    async def scenario():
+        async with TestClient(TestServer(create_front_webhook_app(router, '/hook', secret_token='s3cret'))) as client:
+            statuses = []
+            for headers in ({}, {'X-Telegram-Bot-Api-Secret-Token': 'wrong'}, {'X-Telegram-Bot-Api-Secret-Token': 's3cret'},
+                            {'X-Telegram-Bot-Api-Secret-Token': 's3cret'}):
+                response = await client.post('/hook', json=update, headers=headers)
+                statuses.append(response.status)
+            return statuses
+
+    assert asyncio.run(scenario()) == [401, 401, 200, 503]
+    assert router.queues[0].qsize() == 1
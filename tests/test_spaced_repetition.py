@@ -0,0 +1,44 @@
+import pytest
+from utils.spaced_repetition import ReviewQueue, ReviewItem, INITIAL_EASE, MIN_EASE
+
+FIRST, SECOND = 600, 86400
+
+
+def test_wrong_answer_schedules_first_interval():
+    queue = ReviewQueue(FIRST, SECOND)
+    item = queue.record(1, False, now=1000)
+    assert (item.due_at, item.interval, item.repetitions) == (1000 + FIRST, FIRST, 0)
+    assert item.ease == pytest.approx(INITIAL_EASE - 0.54)
+    assert queue.due(1000 + FIRST - 1) is None
+    assert queue.due(1000 + FIRST) is item
+
+
+def test_correct_answers_grow_interval():
+    queue = ReviewQueue(FIRST, SECOND)
+    queue.load(ReviewItem(1, 0, FIRST))
+    intervals = [queue.record(1, True, now=0).interval for _ in range(4)]
+    assert intervals[:2] == [SECOND, SECOND * 6]
+    assert intervals[2] == pytest.approx(SECOND * 6 * INITIAL_EASE)
+    assert intervals[3] == pytest.approx(intervals[2] * INITIAL_EASE)
+
+
+def test_wrong_answer_resets_interval_and_ease_has_floor():
+    queue = ReviewQueue(FIRST, SECOND)
+    for _ in range(3):
+        queue.record(1, True, now=0)
+    for _ in range(10):
+        item = queue.record(1, False, now=0)
+    assert (item.interval, item.repetitions) == (FIRST, 0)
+    assert item.ease == MIN_EASE
+
+
+def test_nearest_review_comes_first_after_rescheduling():
+    queue = ReviewQueue(FIRST, SECOND)
+    queue.record(1, False, now=0)
+    queue.record(2, False, now=10)
+    assert queue.peek().question_id == 1
+    queue.record(1, True, now=20)
+    assert queue.peek().question_id == 2
+    queue.remove(2)
+    assert queue.peek().question_id == 1
+    assert queue.take_changes() == {1: queue.items[1], 2: None}
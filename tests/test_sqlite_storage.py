@@ -0,0 +1,119 @@
+import asyncio
+import os
+import sqlite3
+from array import array
+from utils.questions_loader import QuestionBank
+from utils.session_cache import Session
+from utils.sqlite_storage import SqliteStorage
+
+BANK = QuestionBank.from_file(os.environ['QUESTIONS_FILE'])
+
+
+def run_storage(path, progress_storage, scenario):
+    async def main():
+        storage = SqliteStorage(str(path), readers=1, progress_storage=progress_storage)
+        await storage.open()
+        try:
+            await storage.init(BANK)
+            return await scenario(storage)
+        finally:
+            await storage.close()
+    return asyncio.run(main())
+
+
+def answered_session(user_id, outcomes):
+    session = Session(user_id, bank_version=BANK.version, order_seed=42)
+    for question_id, outcome in outcomes.items():
+        session.record(question_id, BANK.index_of(question_id), outcome)
+    session.set_current(BANK.ids[len(outcomes)])
+    return session
+
+
+def test_bitset_round_trip(tmp_path):
+    ids = list(BANK.ids)
+    outcomes = {ids[0]: 'correct', ids[1]: 'wrong', ids[2]: None, ids[5]: 'correct'}
+
+    async def scenario(storage):
+        session = answered_session(7, outcomes)
+        await storage.write_changes([session.take_changes()])
+        return session, await storage.load_session(7)
+
+    session, stored = run_storage(tmp_path / 'bits.db', 'bitset', scenario)
+    assert stored.exists
+    assert dict(stored.answers) == outcomes
+    assert stored.current_question_id == session.current_question_id
+    assert stored.bank_version == BANK.version
+    assert not stored.outdated
+
+    loaded = Session(7)
+    for question_id, outcome in stored.answers:
+        loaded.load_answer(question_id, BANK.index_of(question_id), outcome)
+    assert (loaded.answered_bits, loaded.correct_bits, loaded.wrong_bits) == \
+        (session.answered_bits, session.correct_bits, session.wrong_bits)
+
+
+def test_bitset_and_table_modes_store_the_same_progress(tmp_path):
+    ids = list(BANK.ids)
+    outcomes = {ids[3]: 'wrong', ids[4]: 'correct'}
+
+    async def scenario(storage):
+        await storage.write_changes([answered_session(1, outcomes).take_changes()])
+        return dict((await storage.load_session(1)).answers), await storage.count_ahead(0)
+
+    assert run_storage(tmp_path / 'bits.db', 'bitset', scenario) == run_storage(tmp_path / 'table.db', 'table', scenario)
+
+
+def test_legacy_text_columns_migrate_to_bitmaps(tmp_path):
+    path = tmp_path / 'legacy.db'
+    ids = list(BANK.ids)
+    with sqlite3.connect(path) as db:
+        db.execute('''CREATE TABLE quiz_state (user_id INTEGER PRIMARY KEY, current_question_id INTEGER,
+                      answered_questions TEXT, correct_questions TEXT, wrong_questions TEXT)''')
+        db.execute('INSERT INTO quiz_state VALUES (?, ?, ?, ?, ?)',
+                   (5, ids[4], f"{ids[0]},{ids[1]},{ids[2]},{ids[3]}", f"{ids[0]},{ids[1]}", f"{ids[2]}"))
+    db.close()
+
+    async def scenario(storage):
+        return await storage.load_session(5), await storage.load_stats()
+
+    stored, (users, answers, correct, _) = run_storage(path, 'bitset', scenario)
+    assert stored.exists and stored.current_question_id == ids[4]
+    assert dict(stored.answers) == {ids[0]: 'correct', ids[1]: 'correct', ids[2]: 'wrong', ids[3]: None}
+    assert (users, answers, correct) == (1, 4, 2)
+
+
+def test_reset_removes_user_from_rank_histogram(tmp_path):
+    ids = list(BANK.ids)
+
+    async def scenario(storage):
+        await storage.write_changes([answered_session(1, {ids[0]: 'correct', ids[1]: 'correct'}).take_changes(),
+                                     answered_session(2, {ids[0]: 'correct'}).take_changes()])
+        before = await storage.count_ahead(1), await storage.count_ahead(0)
+        session = answered_session(1, {})
+        session.clear()
+        await storage.write_changes([session.take_changes()])
+        return before, (await storage.count_ahead(1), await storage.count_ahead(0))
+
+    assert run_storage(tmp_path / 'rank.db', 'table', scenario) == ((1, 2), (0, 1))
+
+
+def test_bitmaps_of_file_ordered_bank_are_remapped(tmp_path):
+    # Прежний банк в памяти нумеровал вопросы в порядке файла, а версией была CRC32 файла
+    file_order = array('q', reversed(BANK.ids))
+    old_version = BANK.version ^ 1
+
+    async def prepare(storage):
+        async with storage.pool.writer() as db:
+            await db.execute('INSERT INTO bank_versions (version, question_ids, created_at) VALUES (?, ?, 0)',
+                             (old_version, file_order.tobytes()))
+            await db.execute('''INSERT INTO quiz_state (user_id, current_question_id, answered_bits, correct_bits, wrong_bits, bank_version)
+                                VALUES (1, ?, ?, ?, ?, ?)''', (file_order[2], bytes([0b11]), bytes([0b01]), bytes([0b10]), old_version))
+
+    async def load(storage):
+        return await storage.load_session(1)
+
+    path = tmp_path / 'remap.db'
+    run_storage(path, 'bitset', prepare)
+    stored = run_storage(path, 'bitset', load)
+    assert dict(stored.answers) == {file_order[0]: 'correct', file_order[1]: 'wrong'}
+    assert stored.outdated
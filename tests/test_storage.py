@@ -0,0 +1,59 @@
+import asyncio
+import os
+import pytest
+from utils.questions_loader import QuestionBank
+from utils.session_cache import Session
+from utils.sqlite_storage import SqliteStorage
+from utils.storage import MemoryStorage
+
+BANK = QuestionBank.from_file(os.environ['QUESTIONS_FILE'])
+
+
+def session_with(user_id, outcomes, reviews=()):
+    session = Session(user_id, bank_version=BANK.version, order_seed=user_id)
+    session.start_order(user_id, category='python')
+    for question_id, outcome in outcomes.items():
+        session.record(question_id, BANK.index_of(question_id), outcome)
+    for question_id, is_correct in reviews:
+        session.reviews.record(question_id, is_correct, now=1000)
+    session.set_current(BANK.ids[len(outcomes)])
+    return session
+
+
+async def run_scenario(storage):
+    ids = list(BANK.ids)
+    await storage.open()
+    try:
+        await storage.init(BANK)
+        first = session_with(1, {ids[0]: 'correct', ids[1]: 'wrong', ids[2]: None}, reviews=[(ids[1], False)])
+        second = session_with(2, {ids[0]: 'correct', ids[3]: 'correct'})
+        third = session_with(3, {ids[4]: 'wrong'})
+        await storage.write_changes([first.take_changes(), second.take_changes(), third.take_changes()])
+
+        # Повторный ответ не меняет статистику вопроса, сброс удаляет все данные пользователя
+        first.record(ids[1], BANK.index_of(ids[1]), 'correct')
+        first.reviews.remove(ids[1])
+        third.clear()
+        await storage.write_changes([first.take_changes(), third.take_changes()])
+
+        sessions = {}
+        for user_id in (1, 2, 3, 4):
+            stored = await storage.load_session(user_id)
+            sessions[user_id] = stored._replace(answers=sorted(stored.answers),
+                                                reviews=[item.as_row() for item in stored.reviews])
+        return (sessions, await storage.get_leaderboard(10), [await storage.count_ahead(correct) for correct in range(3)],
+                await storage.load_stats())
+    finally:
+        await storage.close()
+
+
+@pytest.mark.parametrize('progress_storage', ['bitset', 'table'])
+def test_memory_storage_matches_sqlite_storage(tmp_path, progress_storage):
+    memory = asyncio.run(run_scenario(MemoryStorage()))
+    sqlite = asyncio.run(run_scenario(SqliteStorage(str(tmp_path / 'quiz.db'), readers=1, progress_storage=progress_storage)))
+    assert memory == sqlite
+    sessions, leaderboard, ahead, (users, answers, correct, question_stats) = memory
+    assert not sessions[3].exists and not sessions[4].exists
+    assert dict(sessions[1].answers)[BANK.ids[0]] == 'correct'
+    assert leaderboard == [(2, 2, 2), (1, 2, 3)]
+    assert (users, answers, correct) == (2, 5, 4)
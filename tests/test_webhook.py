@@ -0,0 +1,46 @@
+import asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot, Dispatcher
+from utils.webhook import BoundedRequestHandler
+
+
+def message_update(update_id):
+    return {'update_id': update_id, 'message': {'message_id': update_id, 'date': 0, 'text': 'привет',
+                                                 'chat': {'id': 1, 'type': 'private'}}}
+
+
+def test_handler_limits_workers_and_rejects_overflow():
+    dispatcher = Dispatcher()
+    release = asyncio.Event()
+    state = {'running': 0, 'peak': 0, 'done': 0}
+
+    @dispatcher.message()
+    async def slow(message):
+        state['running'] += 1
+        state['peak'] = max(state['peak'], state['running'])
+        await release.wait()
+        state['running'] -= 1
+        state['done'] += 1
+
+    async def scenario():
+        bot = Bot('123456:TESTS')
+        handler = BoundedRequestHandler(dispatcher, bot, workers=2, max_pending=3, secret_token='s3cret')
+        app = web.Application()
+        handler.register(app, path='/hook')
+        async with TestClient(TestServer(app)) as client:
+            headers = {'X-Telegram-Bot-Api-Secret-Token': 's3cret'}
+            statuses = [(await client.post('/hook', json=message_update(0))).status]
+            for update_id in range(1, 5):
+                statuses.append((await client.post('/hook', json=message_update(update_id), headers=headers)).status)
+            await asyncio.sleep(0.05)
+            pending = handler.pending()
+            release.set()
+            while handler.pending():
+                await asyncio.sleep(0.01)
+        return statuses, pending
+
+    statuses, pending = asyncio.run(scenario())
+    assert statuses == [401, 200, 200, 200, 503]
+    assert pending == 3
+    assert state == {'running': 0, 'peak': 2, 'done': 3}
@@ -0,0 +1,102 @@
+import random
+
+WORD_BYTES = 8
+
+
+#####################################################################################
+# Битовые карты прогресса
+#
+# Битовая карта хранится как целое число Python: бит i соответствует вопросу
+# с плотным индексом i в банке вопросов. В базе данных она лежит в виде BLOB
+# в порядке little-endian, поэтому длина BLOB равна ceil(количество вопросов / 8).
+
+
+def from_blob(blob):
+    """ Преобразует BLOB из базы данных в битовую карту. Пустое значение дает пустую карту. """
+    return int.from_bytes(blob, 'little') if blob else 0
+
+
+def to_blob(bits):
+    """ Преобразует битовую карту в компактный BLOB для записи в базу данных. """
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def set_bit(bits, index):
+    """ Возвращает битовую карту с установленным битом index. """
+    return bits | (1 << index)
+
+
+def has_bit(bits, index):
+    """ Проверяет, установлен ли бит index. """
+    return (bits >> index) & 1 == 1
+
+
+def count(bits):
+    """ Возвращает количество установленных битов. """
+    return bits.bit_count()
+
+
+def from_indexes(indexes, size):
+    """ Строит битовую карту с установленными битами indexes (все меньше size). """
+    data = bytearray((size + 7) // 8)
+    for index in indexes:
+        data[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(data, 'little')
+
+
+def iter_bits(bits):
+    """ Перебирает индексы установленных битов по возрастанию, пропуская пустые 64-битные слова. """
+    data = to_blob(bits)
+    for offset in range(0, len(data), WORD_BYTES):
+        word = int.from_bytes(data[offset:offset + WORD_BYTES], 'little')
+        base = offset * 8
+        while word:
+            low = word & -word
+            yield base + low.bit_length() - 1
+            word ^= low
+
+
+def random_unset(bits, size):
+    """
+    Случайно выбирает индекс неустановленного бита среди первых size битов.
+
+    Args:
+        bits (int): Битовая карта.
+        size (int): Количество значимых битов (размер банка вопросов).
+
+    Returns:
+        int: Индекс выбранного бита.
+        None: Если все биты установлены.
+    """
+    return random_set(~bits & ((1 << size) - 1))
+
+
+def random_set(bits):
+    """
+    Случайно выбирает индекс установленного бита.
+
+    Сначала считает установленные биты целиком, затем находит нужное 64-битное слово
+    по количеству единиц в словах и только внутри него ищет конкретный бит.
+
+    Args:
+        bits (int): Битовая карта.
+
+    Returns:
+        int: Индекс выбранного бита.
+        None: Если установленных битов нет.
+    """
+    total = bits.bit_count()
+    if total == 0:
+        return None
+
+    target = random.randrange(total)
+    data = to_blob(bits)
+    for offset in range(0, len(data), WORD_BYTES):
+        word = int.from_bytes(data[offset:offset + WORD_BYTES], 'little')
+        word_count = word.bit_count()
+        if target >= word_count:
+            target -= word_count
+            continue
+        for _ in range(target):
+            word &= word - 1
+        return offset * 8 + (word & -word).bit_length() - 1
@@ -1,6 +1,112 @@
-from aiogram.filters.callback_data import CallbackData
+import base64
+import hashlib
+import hmac
+from typing import NamedTuple
+from config import CALLBACK_SECRET
 
-class CallbackAnswers(CallbackData, prefix="callback_answers"):
-    is_correct: str
-    id: int
-    option_index: int
\ No newline at end of file
+# Префикс данных кнопок ответа на вопрос
+ANSWER_PREFIX = "a"
+# Длина подписи в байтах (в callback_data - 12 символов base64)
+SIGNATURE_BYTES = 9
+# Ограничение Telegram на длину callback_data в байтах
+CALLBACK_DATA_LIMIT = 64
+NONCE_MASK = 0xFFFFFFFF
+
+
+#####################################################################################
+# to_base36
+
+
+def to_base36(number):
+    """ Записывает целое число в системе счисления по основанию 36 (обратно - int(text, 36)). """
+    if number < 0:
+        return '-' + to_base36(-number)
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    text = ''
+    while True:
+        number, digit = divmod(number, 36)
+        text = digits[digit] + text
+        if not number:
+            return text
+
+
+class AnswerData(NamedTuple):
+    """ Данные кнопки ответа: вопрос, выбранный вариант и номер квиза пользователя. """
+    question_id: int
+    option_index: int
+    nonce: int
+
+
+class AnswerSigner:
+    """
+    Упаковка данных кнопок ответа в компактную строку callback_data с подписью HMAC-SHA256.
+
+    Формат: "a:<id вопроса>:<индекс варианта>:<номер квиза>:<подпись>", числа - по основанию 36.
+    Подпись вычисляется и по идентификатору пользователя, которому отправлена кнопка, поэтому клиент
+    не может подделать вариант ответа или вопрос, а также использовать кнопки другого пользователя.
+    Правильность ответа в данных кнопки не передается: она определяется по банку вопросов.
+
+    Args:
+        secret (bytes): Секретный ключ подписи.
+    """
+
+    def __init__(self, secret):
+        self.key = secret
+        # Состояние HMAC после обработки ключа: копируется для каждой подписи вместо повторной обработки ключа
+        self._keyed = hmac.new(secret, digestmod=hashlib.sha256)
+
+    def _sign(self, user_id, payload):
+        mac = self._keyed.copy()
+        mac.update(f"{user_id}:{payload}".encode())
+        return base64.urlsafe_b64encode(mac.digest()[:SIGNATURE_BYTES]).decode()
+
+    def pack(self, user_id, question_id, option_index, nonce):
+        """
+        Упаковывает и подписывает данные кнопки ответа.
+
+        Args:
+            user_id (int): Пользователь, которому отправляется кнопка.
+            question_id (int): Идентификатор вопроса.
+            option_index (int): Индекс варианта ответа в question.options.
+            nonce (int): Номер квиза пользователя (см. Session.nonce).
+
+        Returns:
+            str: Строка callback_data.
+        """
+        payload = f"{ANSWER_PREFIX}:{to_base36(question_id)}:{to_base36(option_index)}:{to_base36(nonce & NONCE_MASK)}"
+        data = f"{payload}:{self._sign(user_id, payload)}"
+        if len(data) > CALLBACK_DATA_LIMIT:
+            raise ValueError(f"Данные кнопки длиннее {CALLBACK_DATA_LIMIT} байт: {data}")
+        return data
+
+    def unpack(self, user_id, data):
+        """
+        Проверяет подпись и распаковывает данные кнопки ответа.
+
+        Args:
+            user_id (int): Пользователь, нажавший кнопку.
+            data (str): Строка callback_data.
+
+        Returns:
+            AnswerData: Данные кнопки или None, если формат или подпись неверны.
+        """
+        payload, _, signature = data.rpartition(':')
+        if not hmac.compare_digest(signature.encode(), self._sign(user_id, payload).encode()):
+            return None
+        try:
+            prefix, question_id, option_index, nonce = payload.split(':')
+            return AnswerData(int(question_id, 36), int(option_index, 36), int(nonce, 36))
+        except ValueError:
+            return None
+
+
+#####################################################################################
+# is_answer_data
+
+
+def is_answer_data(data):
+    """ Проверяет, что callback_data относится к кнопке ответа (без проверки подписи). """
+    return data is not None and data.startswith(f"{ANSWER_PREFIX}:")
+
+
+answer_signer = AnswerSigner(hashlib.sha256(CALLBACK_SECRET.encode()).digest())
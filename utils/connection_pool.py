@@ -0,0 +1,224 @@
+import asyncio
+import aiosqlite
+from collections import Counter
+from contextlib import asynccontextmanager
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",
+    "PRAGMA mmap_size = 67108864",
+    "PRAGMA foreign_keys = ON",
+)
+
+
+class ConnectionPool:
+    """
+    Пул долгоживущих соединений с базой данных SQLite.
+
+    Держит ограниченный набор соединений для чтения и одно соединение для записи,
+    доступ к которому сериализуется блокировкой. Все соединения открываются один раз
+    при старте бота и закрываются при его остановке.
+
+    Операции записи, переданные в submit, собираются фоновой задачей в очередь и выполняются
+    группами в одной транзакции: группа фиксируется через batch_delay секунд после первой
+    операции или сразу, как только в очереди набирается batch_size операций.
+
+    Счетчик stats считает выданные соединения для чтения ('reads'), операции записи ('writes')
+    и зафиксированные транзакции ('commits').
+    """
+
+    def __init__(self, db_name, readers=4, busy_timeout=5000, statement_cache=256, batch_delay=0.002, batch_size=200):
+        self.db_name = db_name
+        self.readers_count = readers
+        self.busy_timeout = busy_timeout
+        self.statement_cache = statement_cache
+        self.batch_delay = batch_delay
+        self.batch_size = batch_size
+        self._readers = None
+        self._all_readers = []
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+        self._write_queue = None
+        self._batch_full = None
+        self._write_task = None
+        self.stats = Counter()
+
+    async def _connect(self):
+        db = await aiosqlite.connect(self.db_name, cached_statements=self.statement_cache)
+        await db.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        for pragma in PRAGMAS:
+            await db.execute(pragma)
+        return db
+
+    async def open(self):
+        """
+        Открывает соединение для записи и соединения для чтения.
+
+        Соединение для записи открывается первым, чтобы включить режим WAL
+        до того, как к файлу базы подключатся читатели.
+        """
+        if self._writer is not None:
+            return
+        self._writer = await self._connect()
+        self._readers = asyncio.Queue()
+        for _ in range(self.readers_count):
+            db = await self._connect()
+            await db.execute("PRAGMA query_only = ON")
+            self._all_readers.append(db)
+            self._readers.put_nowait(db)
+        self._write_queue = asyncio.Queue()
+        self._batch_full = asyncio.Event()
+        self._write_task = asyncio.create_task(self._write_loop())
+
+    async def close(self):
+        """ Дожидается выполнения всех операций из очереди записи и закрывает все соединения. """
+        if self._writer is None:
+            return
+        await self._write_queue.join()
+        self._write_task.cancel()
+        try:
+            await self._write_task
+        except asyncio.CancelledError:
+            pass
+        self._write_task = None
+        async with self._write_lock:
+            for db in self._all_readers:
+                await db.close()
+            await self._writer.close()
+            self._all_readers = []
+            self._readers = None
+            self._writer = None
+
+    @asynccontextmanager
+    async def reader(self):
+        """
+        Выдает свободное соединение для чтения и возвращает его в пул после использования.
+
+        Если все соединения заняты, ожидает освобождения одного из них.
+        """
+        if self._readers is None:
+            raise RuntimeError("Пул соединений не открыт")
+        db = await self._readers.get()
+        self.stats['reads'] += 1
+        try:
+            yield db
+        finally:
+            self._readers.put_nowait(db)
+
+    @asynccontextmanager
+    async def writer(self):
+        """
+        Выдает единственное соединение для записи.
+
+        Блок выполняется в транзакции: при успешном завершении изменения фиксируются,
+        при исключении откатываются.
+        """
+        if self._writer is None:
+            raise RuntimeError("Пул соединений не открыт")
+        async with self._write_lock:
+            try:
+                yield self._writer
+                await self._writer.commit()
+                self.stats['commits'] += 1
+            except BaseException:
+                await self._writer.rollback()
+                raise
+
+    async def submit(self, operation, *args):
+        """
+        Ставит операцию записи в очередь и ожидает ее фиксации.
+
+        Операция выполняется внутри общей транзакции группы под собственной точкой сохранения,
+        поэтому ошибка одной операции откатывает только ее изменения.
+
+        Args:
+            operation (callable): Корутина operation(db, *args), выполняющая запись.
+            *args: Аргументы операции.
+
+        Returns:
+            Результат операции после фиксации транзакции.
+        """
+        if self._writer is None:
+            raise RuntimeError("Пул соединений не открыт")
+        future = asyncio.get_running_loop().create_future()
+        self.stats['writes'] += 1
+        self._write_queue.put_nowait((operation, args, future))
+        if self._write_queue.qsize() >= self.batch_size:
+            self._batch_full.set()
+        return await future
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._write_queue.get()]
+            if self._write_queue.qsize() + 1 < self.batch_size:
+                self._batch_full.clear()
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.batch_delay)
+                except asyncio.TimeoutError:
+                    pass
+            while len(batch) < self.batch_size and not self._write_queue.empty():
+                batch.append(self._write_queue.get_nowait())
+            try:
+                await self._write_batch(batch)
+            except Exception:
+                # Ошибка уже передана ожидающим операциям группы, цикл записи продолжает работу
+                pass
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+
+    async def _write_batch(self, batch):
+        """
+        Выполняет группу операций записи в одной транзакции и передает результаты ожидающим.
+
+        Если транзакция не удалась, она откатывается, а все операции группы получают исключение.
+        Ошибка самого отката не прерывает цикл записи: незавершенная транзакция откатывается
+        перед следующей группой. Операции группы завершаются в любом случае, в том числе при отмене.
+        """
+        results = []
+        error = None
+        async with self._write_lock:
+            db = self._writer
+            try:
+                if db.in_transaction:
+                    await db.rollback()
+                await db.execute("BEGIN")
+                for operation, args, future in batch:
+                    await db.execute("SAVEPOINT write_operation")
+                    try:
+                        result = await operation(db, *args)
+                    except Exception as e:
+                        await db.execute("ROLLBACK TO write_operation")
+                        await db.execute("RELEASE write_operation")
+                        results.append((future, e, None))
+                    else:
+                        await db.execute("RELEASE write_operation")
+                        results.append((future, None, result))
+                await db.commit()
+                self.stats['commits'] += 1
+            except BaseException as e:
+                error = e
+                try:
+                    await db.rollback()
+                except Exception:
+                    pass
+                raise
+            finally:
+                if error is not None:
+                    for _, _, future in batch:
+                        if future.done():
+                            continue
+                        if isinstance(error, Exception):
+                            future.set_exception(error)
+                        else:
+                            future.cancel()
+
+        for future, operation_error, result in results:
+            if future.done():
+                continue
+            if operation_error is not None:
+                future.set_exception(operation_error)
+            else:
+                future.set_result(result)
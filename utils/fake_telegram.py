@@ -0,0 +1,119 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, defaultdict, deque
+from aiogram.client.session.base import BaseSession
+from aiogram.types import InlineKeyboardMarkup
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "QuizBot", "username": "quiz_bot"}
+
+
+class FakeSession(BaseSession):
+    """
+    Сессия Bot API, которая не ходит в сеть.
+
+    Отвечает на запросы бота правдоподобными результатами (отправленное сообщение, True и т.п.),
+    пропуская их через обычную проверку ответа aiogram, считает вызванные методы и запоминает
+    последнюю inline-клавиатуру и последние тексты в каждом чате, чтобы синтетический пользователь
+    мог нажать кнопку и понять, что квиз завершен.
+
+    Args:
+        delay (float): Искусственная задержка каждого запроса в секундах.
+    """
+
+    def __init__(self, delay=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+        self.calls = Counter()
+        self.last_markup = {}
+        self.texts = defaultdict(lambda: deque(maxlen=20))
+        self._message_ids = itertools.count(1)
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    def build_result(self, method):
+        name = method.__api_method__
+        if name == "getMe":
+            return BOT_USER
+        if name in ("sendMessage", "editMessageText"):
+            message = {
+                "message_id": getattr(method, "message_id", None) or next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": method.chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": method.text,
+            }
+            self.texts[method.chat_id].append(method.text)
+            if isinstance(method.reply_markup, InlineKeyboardMarkup):
+                message["reply_markup"] = method.reply_markup.model_dump(mode="json", exclude_none=True)
+                self.last_markup[method.chat_id] = message
+            return message
+        return True
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[method.__api_method__] += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        content = json.dumps({"ok": True, "result": self.build_result(method)})
+        response = self.check_response(bot=bot, method=method, status_code=200, content=content)
+        return response.result
+
+
+#####################################################################################
+# Синтетические обновления Telegram
+
+_update_ids = itertools.count(1)
+
+
+def make_user(user_id):
+    """ Возвращает данные пользователя Telegram для синтетического обновления. """
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+
+def make_message_update(user_id, text):
+    """ Возвращает обновление с текстовым сообщением пользователя. """
+    return {
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": next(_update_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": make_user(user_id),
+            "text": text,
+        },
+    }
+
+
+def make_callback_update(user_id, message, data):
+    """
+    Возвращает обновление с нажатием inline-кнопки.
+
+    Args:
+        user_id (int): Идентификатор пользователя.
+        message (dict): Сообщение бота с клавиатурой, как его вернула FakeSession.
+        data (str): callback_data нажатой кнопки.
+    """
+    update_id = next(_update_ids)
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": make_user(user_id),
+            "chat_instance": str(user_id),
+            "message": message,
+            "data": data,
+        },
+    }
+
+
+def iter_buttons(message):
+    """ Перебирает callback_data кнопок inline-клавиатуры сообщения. """
+    for row in message.get("reply_markup", {}).get("inline_keyboard", []):
+        for button in row:
+            if "callback_data" in button:
+                yield button["callback_data"]
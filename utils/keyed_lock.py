@@ -0,0 +1,71 @@
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+
+class KeyedLock:
+    """
+    Набор асинхронных блокировок по ключу (например, по идентификатору пользователя).
+
+    Блокировка создается при первом обращении по ключу и удаляется, как только ее никто
+    не держит и не ждет, поэтому в памяти лежат блокировки только тех ключей, по которым
+    сейчас идет работа. Ожидающие получают блокировку в порядке очереди.
+    """
+
+    def __init__(self):
+        self._locks = {}
+
+    def __len__(self):
+        return len(self._locks)
+
+    def pending(self, key):
+        """ Возвращает, сколько задач держат или ждут блокировку ключа. """
+        entry = self._locks.get(key)
+        return entry[1] if entry is not None else 0
+
+    @asynccontextmanager
+    async def hold(self, key):
+        """ Захватывает блокировку ключа на время блока async with. """
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+
+class RecentKeys:
+    """
+    LRU-набор недавно обработанных ключей со значениями, ограниченный max_size записями.
+
+    Args:
+        max_size (int): Максимальное количество ключей в памяти.
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def check_and_add(self, key, value):
+        """
+        Запоминает значение ключа.
+
+        Returns:
+            bool: True, если ключ уже был запомнен с тем же значением (повтор), иначе False.
+        """
+        if self._items.get(key) == value:
+            self._items.move_to_end(key)
+            return True
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+        return False
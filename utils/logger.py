@@ -1,6 +1,135 @@
 import os
+import json
+import queue
+import atexit
 import logging
-from datetime import datetime
+import contextvars
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+# Контекст текущего обновления Telegram (user_id, update_id, handler), который добавляется к записям лога
+log_context = contextvars.ContextVar('log_context', default=None)
+
+# Дополнительные поля записи, которые передаются через extra и попадают в структурированный лог
+EXTRA_FIELDS = ('latency_ms',)
+
+_settings = {
+    'log_format': 'json',
+    'rotation': 'size',
+    'max_bytes': 10 * 1024 * 1024,
+    'backup_count': 5,
+    'when': 'midnight',
+    'level': logging.INFO,
+    'file_suffix': '',
+    'logs_dir': os.path.abspath(os.path.join(os.path.dirname(__file__), "../logs")),
+}
+_queue = queue.SimpleQueue()
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """ Форматирует запись лога как одну строку JSON с контекстом обновления. """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        context = getattr(record, 'context', None)
+        if context:
+            entry.update(context)
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """ Форматирует запись лога строкой вида "время - уровень - сообщение [контекст]". """
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(levelname)s - %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = dict(getattr(record, 'context', None) or {})
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                fields[field] = value
+        if fields:
+            line += " [" + " ".join(f"{key}={value}" for key, value in fields.items()) + "]"
+        return line
+
+
+class ContextQueueHandler(QueueHandler):
+    """
+    Кладет запись лога в очередь, не выполняя ввод-вывод в вызывающем потоке.
+
+    В очередь попадает запись с уже подставленными аргументами сообщения, текстом исключения
+    и снимком контекста обновления (contextvars недоступны потоку записи). Запись не копируется:
+    остальные обработчики логгеров только читают ее поля. Форматирование в JSON и запись в файл выполняет поток QueueListener.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.stack_info = None
+        context = log_context.get()
+        if context:
+            record.context = dict(context)
+        return record
+
+
+#####################################################################################
+# configure_logging
+
+
+def configure_logging(log_format='json', rotation='size', max_bytes=10 * 1024 * 1024, backup_count=5, when='midnight',
+                      level='INFO', file_suffix='', logs_dir=None):
+    """
+    Задает параметры логов для всех логгеров, которые будут настроены через setup_logger.
+
+    Args:
+        log_format (str): Формат записей: json или text.
+        rotation (str): Ротация файлов: size - по размеру max_bytes, time - по времени when.
+        max_bytes (int): Размер файла лога в байтах, после которого он ротируется.
+        backup_count (int): Количество хранимых старых файлов лога.
+        when (str): Период ротации по времени (см. TimedRotatingFileHandler).
+        level (str): Минимальный уровень записей.
+        file_suffix (str): Суффикс имен файлов логов (например, номер шарда), чтобы процессы не писали в один файл.
+        logs_dir (str, optional): Директория файлов логов. По умолчанию - logs в корне проекта.
+    """
+    _settings.update(log_format=log_format, rotation=rotation, max_bytes=max_bytes, backup_count=backup_count,
+                     when=when, file_suffix=file_suffix, level=logging.getLevelName(level.upper()) if isinstance(level, str) else level)
+    if logs_dir:
+        _settings['logs_dir'] = os.path.abspath(logs_dir)
+
+
+#####################################################################################
+# _file_handler
+
+
+def _file_handler(logger_name, logs_dir):
+    log_file_path = os.path.join(logs_dir, f"{logger_name}{_settings['file_suffix']}.log")
+    if _settings['rotation'] == 'time':
+        handler = TimedRotatingFileHandler(log_file_path, when=_settings['when'], backupCount=_settings['backup_count'],
+                                           encoding='utf-8', delay=True)
+    else:
+        handler = RotatingFileHandler(log_file_path, maxBytes=_settings['max_bytes'], backupCount=_settings['backup_count'],
+                                      encoding='utf-8', delay=True)
+    handler.setFormatter(JsonFormatter() if _settings['log_format'] == 'json' else TextFormatter())
+    handler.addFilter(logging.Filter(logger_name))
+    return handler
+
 
 #####################################################################################
 # setup_logger
@@ -8,8 +137,11 @@ def setup_logger(logger_name):
     """
     Настраивает логгер с указанным именем.
 
-    Создает директорию для логов, если она не существует, и настраивает логгер
-    для записи логов в файл с именем, включающим текущую дату.
+    Создает директорию для логов, если она не существует. Логгер только кладет записи в общую
+    очередь, поэтому вызов логгера не блокирует цикл событий дисковым вводом-выводом.
+    Записи из очереди форматирует и пишет в файл logs/<имя логгера>.log фоновый поток
+    QueueListener, ротируя файлы по размеру или по времени (см. configure_logging).
+    Директорию логов можно изменить параметром logs_dir функции configure_logging.
 
     Args:
         logger_name (str): Имя логгера.
@@ -17,18 +149,39 @@ def setup_logger(logger_name):
     Returns:
         logging.Logger: Настроенный логгер.
     """
-    logs_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../logs"))
+    global _listener
+    logs_dir = _settings['logs_dir']
 
     if not os.path.exists(logs_dir):
         os.makedirs(logs_dir)
-    
-    current_time = datetime.now()
 
     logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.INFO)
-    log_file_path = os.path.join(logs_dir, f"{logger_name}_{current_time.strftime('%Y_%m')}.log")
-    handler = logging.FileHandler(log_file_path)
-    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    logger.addHandler(handler)
+    logger.setLevel(_settings['level'])
+    logger.propagate = False
+    if any(isinstance(handler, ContextQueueHandler) for handler in logger.handlers):
+        return logger
+
+    file_handler = _file_handler(logger_name, logs_dir)
+    if _listener is None:
+        _listener = QueueListener(_queue, file_handler)
+        _listener.start()
+        atexit.register(stop_logging)
+    else:
+        _listener.handlers = (*_listener.handlers, file_handler)
+    logger.addHandler(ContextQueueHandler(_queue))
 
     return logger
+
+
+#####################################################################################
+# stop_logging
+
+
+def stop_logging():
+    """ Дописывает в файлы все записи из очереди и останавливает поток записи логов. """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,290 @@
+import functools
+import inspect
+import logging
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from aiohttp import web
+
+# Границы корзин гистограмм задержек в секундах
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+#####################################################################################
+# format_labels
+
+
+def format_labels(names, values, extra=()):
+    """ Форматирует метки в виде {name="value",...} с экранированием по формату Prometheus. """
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+#####################################################################################
+# format_value
+
+
+def format_value(value):
+    """ Форматирует значение метрики: целые без дробной части, бесконечность как +Inf. """
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+class Counter:
+    """
+    Монотонно растущий счетчик с метками.
+
+    Args:
+        name (str): Имя метрики.
+        help (str): Описание метрики.
+        labels (tuple): Имена меток.
+    """
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        """ Увеличивает счетчик с указанными значениями меток. """
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self):
+        for label_values, value in sorted(self.values.items()):
+            yield self.name, format_labels(self.labels, label_values), value
+
+
+class Histogram:
+    """
+    Гистограмма наблюдаемых значений (например, задержек в секундах) с метками.
+
+    Для каждого набора значений меток хранит количество наблюдений по корзинам, их сумму
+    и количество. Наблюдение - один бинарный поиск по границам корзин.
+
+    Args:
+        name (str): Имя метрики.
+        help (str): Описание метрики.
+        labels (tuple): Имена меток.
+        buckets (tuple): Верхние границы корзин по возрастанию.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value, *label_values):
+        """ Добавляет наблюдение value для указанных значений меток. """
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        """ Измеряет время выполнения блока with и добавляет его в гистограмму. """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def samples(self):
+        for label_values, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, math.inf), counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', format_labels(self.labels, label_values, (('le', format_value(float(bound))),)), cumulative
+            labels = format_labels(self.labels, label_values)
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+class CallbackMetric:
+    """
+    Метрика, значение которой вычисляется при каждом запросе /metrics.
+
+    Args:
+        name (str): Имя метрики.
+        help (str): Описание метрики.
+        callback (callable): Функция без аргументов, возвращающая значение или словарь
+            {кортеж значений меток: значение}.
+        labels (tuple): Имена меток, если callback возвращает словарь.
+        type (str): Тип метрики: gauge или counter.
+    """
+
+    def __init__(self, name, help, callback, labels=(), type='gauge'):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.labels = labels
+        self.type = type
+
+    def samples(self):
+        value = self.callback()
+        if not isinstance(value, dict):
+            value = {(): value}
+        for label_values, sample in sorted(value.items()):
+            yield self.name, format_labels(self.labels, label_values), sample
+
+
+class MetricsRegistry:
+    """ Набор метрик бота, который отдается в текстовом формате Prometheus. """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        """ Добавляет метрику в набор и возвращает ее. """
+        if metric.name in self.metrics:
+            raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name, help, callback, labels=(), type='gauge'):
+        return self.register(CallbackMetric(name, help, callback, labels, type))
+
+    def render(self):
+        """ Возвращает все метрики в текстовом формате Prometheus (version 0.0.4). """
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {format_value(value)}')
+        lines.append('')
+        return '\n'.join(lines)
+
+
+registry = MetricsRegistry()
+
+updates_total = registry.counter('quiz_updates_total', 'Обработанные обновления Telegram по типу.', ('type',))
+updates_dropped_total = registry.counter('quiz_updates_dropped_total', 'Отброшенные обновления по причине.', ('reason',))
+handler_seconds = registry.histogram('quiz_handler_seconds', 'Время работы обработчиков в секундах.', ('handler',))
+handler_errors_total = registry.counter('quiz_handler_errors_total', 'Исключения, вышедшие из обработчиков.', ('handler',))
+log_errors_total = registry.counter('quiz_log_errors_total', 'Записи лога уровня ERROR и выше по логгеру.', ('logger',))
+db_call_seconds = registry.histogram('quiz_db_call_seconds', 'Время вызовов функций db.py и методов хранилища в секундах.', ('function',))
+db_errors_total = registry.counter('quiz_db_errors_total', 'Ошибки функций db.py (в том числе перехваченные) и методов хранилища.', ('function',))
+answer_step_seconds = registry.histogram('quiz_answer_step_seconds', 'Время шагов обработки ответа в секундах.', ('step',))
+bot_api_seconds = registry.histogram('quiz_bot_api_seconds', 'Время запросов к Bot API в секундах.', ('method',))
+
+
+#####################################################################################
+# timed
+
+
+def timed(histogram, errors=None):
+    """
+    Декоратор, измеряющий время вызовов функции в гистограмме histogram с меткой - полным именем
+    функции (__qualname__, для методов - вместе с именем класса).
+
+    Поддерживает обычные функции и корутины. Исключения, вышедшие из функции, считаются
+    в счетчике errors с той же меткой; отмена (asyncio.CancelledError) и прерывание
+    (KeyboardInterrupt) ошибками не считаются, но время вызова записывается. Функции, которые перехватывают свои ошибки,
+    должны сами увеличивать errors в месте перехвата.
+    """
+    def decorator(func):
+        name = func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    if errors is not None:
+                        errors.inc(name)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - started, name)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    if errors is not None:
+                        errors.inc(name)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - started, name)
+        return wrapper
+    return decorator
+
+
+# Декоратор для функций db.py и методов хранилища
+db_timed = timed(db_call_seconds, db_errors_total)
+
+
+class ErrorCountHandler(logging.Handler):
+    """ Обработчик логов, который считает записи уровня ERROR и выше в log_errors_total. """
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+
+    def emit(self, record):
+        log_errors_total.inc(record.name)
+
+
+#####################################################################################
+# create_metrics_app
+
+
+def create_metrics_app(path='/metrics'):
+    """
+    Создает aiohttp-приложение, отдающее метрики по GET path в текстовом формате Prometheus.
+
+    Returns:
+        web.Application: Приложение с обработчиком метрик.
+    """
+    async def handle_metrics(request):
+        return web.Response(body=registry.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get(path, handle_metrics)
+    return app
+
+
+#####################################################################################
+# start_metrics_server
+
+
+async def start_metrics_server(host, port):
+    """
+    Запускает HTTP-сервер метрик на host:port.
+
+    Returns:
+        web.AppRunner: Запущенный сервер; остановка - await runner.cleanup().
+    """
+    runner = web.AppRunner(create_metrics_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner
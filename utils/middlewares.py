@@ -0,0 +1,151 @@
+import time
+from aiogram import BaseMiddleware
+from utils.logger import log_context
+from utils.metrics import updates_total, updates_dropped_total, handler_seconds, handler_errors_total
+from utils.callback_data import answer_signer, is_answer_data
+from utils.keyed_lock import KeyedLock, RecentKeys
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений, задающий контекст логов на время обработки обновления.
+
+    В контекст (utils.logger.log_context) попадают идентификаторы обновления и пользователя,
+    поэтому все записи логов, сделанные при обработке, в том числе из задач, запущенных
+    обработчиком, содержат эти поля. После обработки, если задан logger, записывается
+    время обработки обновления в миллисекундах (поле latency_ms).
+
+    Регистрируется как dp.update.outer_middleware.
+
+    Args:
+        logger (logging.Logger, optional): Логгер для записи обработанных обновлений.
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger
+
+    async def __call__(self, handler, event, data):
+        user = data.get('event_from_user')
+        context = {'update_id': event.update_id}
+        if user is not None:
+            context['user_id'] = user.id
+        token = log_context.set(context)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            if self.logger is not None:
+                self.logger.info(f"Обновление {event.event_type} обработано",
+                                 extra={'latency_ms': round((time.perf_counter() - started) * 1000, 2)})
+            log_context.reset(token)
+
+
+class HandlerContextMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware, добавляющий в контекст логов имя выбранного обработчика.
+
+    Регистрируется как inner middleware наблюдателей message и callback_query.
+    """
+
+    async def __call__(self, handler, event, data):
+        context = log_context.get()
+        handler_object = data.get('handler')
+        if context is not None and handler_object is not None:
+            context['handler'] = handler_object.callback.__name__
+        return await handler(event, data)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений, считающий обновления по типу (quiz_updates_total).
+
+    Регистрируется как dp.update.outer_middleware.
+    """
+
+    async def __call__(self, handler, event, data):
+        updates_total.inc(event.event_type)
+        return await handler(event, data)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware, измеряющий время работы обработчика (quiz_handler_seconds)
+    и считающий исключения, вышедшие из него (quiz_handler_errors_total).
+
+    Регистрируется как inner middleware наблюдателей message и callback_query.
+    """
+
+    async def __call__(self, handler, event, data):
+        handler_object = data.get('handler')
+        name = handler_object.callback.__name__ if handler_object is not None else 'unknown'
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors_total.inc(name)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, name)
+
+
+class UserLockMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений, обрабатывающий обновления одного пользователя строго по очереди.
+
+    Обновления разных пользователей обрабатываются параллельно. Если у пользователя уже
+    max_pending обновлений в работе и в очереди, новое обновление отбрасывается.
+    Блокировки пользователей удаляются сразу после обработки их последнего обновления.
+
+    Регистрируется как dp.update.outer_middleware.
+
+    Args:
+        max_pending (int): Максимальное количество обновлений пользователя в работе и в очереди.
+        logger (logging.Logger, optional): Логгер для записи отброшенных обновлений.
+    """
+
+    def __init__(self, max_pending=10, logger=None):
+        self.max_pending = max_pending
+        self.logger = logger
+        self.locks = KeyedLock()
+
+    async def __call__(self, handler, event, data):
+        user = data.get('event_from_user')
+        if user is None:
+            return await handler(event, data)
+        if self.locks.pending(user.id) >= self.max_pending:
+            updates_dropped_total.inc('overload')
+            if self.logger is not None:
+                self.logger.warning(f"Пользователь: {user.id} - слишком много обновлений в очереди, обновление отброшено")
+            return None
+        async with self.locks.hold(user.id):
+            return await handler(event, data)
+
+
+class AnswerDedupMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений, отбрасывающий повторные ответы на тот же вопрос.
+
+    Ключ - пара (пользователь, вопрос), значение - сообщение с вопросом, поэтому второе нажатие
+    на кнопку того же сообщения отбрасывается без обращения к базе данных, а ответ на тот же вопрос
+    в новом сообщении (например, при повторении) обрабатывается. Ключи хранятся в LRU
+    из max_size записей. Запоминаются только кнопки с верной подписью, чтобы поддельное
+    нажатие не заблокировало настоящий ответ.
+
+    Регистрируется как dp.update.outer_middleware до UserLockMiddleware, чтобы повтор
+    не ждал окончания обработки первого ответа.
+
+    Args:
+        max_size (int): Количество запоминаемых ответов.
+    """
+
+    def __init__(self, max_size=10000):
+        self.answers = RecentKeys(max_size)
+
+    async def __call__(self, handler, event, data):
+        callback = event.callback_query
+        if callback is not None and is_answer_data(callback.data) and callback.message is not None:
+            answer = answer_signer.unpack(callback.from_user.id, callback.data)
+            if answer is not None and self.answers.check_and_add((callback.from_user.id, answer.question_id), callback.message.message_id):
+                updates_dropped_total.inc('duplicate')
+                return None
+        return await handler(event, data)
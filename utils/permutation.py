@@ -0,0 +1,68 @@
+import random
+
+MASK64 = (1 << 64) - 1
+ROUNDS = 4
+
+
+#####################################################################################
+# Псевдослучайные перестановки
+#
+# Порядок вопросов пользователя задается перестановкой плотных индексов банка [0, size),
+# которая полностью определяется зерном. Перестановка не хранится: элемент на позиции
+# вычисляется сетью Фейстеля на 2k битах с "прогулкой по циклу" (значения за пределами
+# size шифруются повторно, пока не попадут в диапазон). Так как 4^k < 4 * size,
+# в среднем нужно меньше четырех шифрований на позицию.
+
+
+def mix64(value):
+    """ Перемешивает биты 64-битного числа (финализатор splitmix64). """
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+def new_seed():
+    """ Возвращает случайное зерно, которое помещается в INTEGER SQLite. """
+    return random.getrandbits(62)
+
+
+class Permutation:
+    """
+    Перестановка чисел [0, size), заданная зерном.
+
+    Args:
+        size (int): Количество элементов.
+        seed (int): Зерно перестановки.
+
+    Использование:
+        order = Permutation(len(ids), seed)
+        first_index = order[0]
+    """
+
+    __slots__ = ('size', 'half_bits', 'half_mask', 'keys')
+
+    def __init__(self, size, seed):
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        self.half_bits = (bits + 1) // 2
+        self.half_mask = (1 << self.half_bits) - 1
+        self.keys = tuple(mix64(seed ^ (round_number * 0x632BE59BD9B4E019)) for round_number in range(ROUNDS))
+
+    def _encrypt(self, value):
+        left = value >> self.half_bits
+        right = value & self.half_mask
+        for key in self.keys:
+            left, right = right, left ^ (mix64(right ^ key) & self.half_mask)
+        return (left << self.half_bits) | right
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.size:
+            raise IndexError(position)
+        value = self._encrypt(position)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+    def __len__(self):
+        return self.size
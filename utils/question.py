@@ -0,0 +1,144 @@
+import sys
+from array import array
+from typing import NamedTuple
+from utils import bitset
+
+# Допустимые уровни сложности вопросов
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+
+class Question(NamedTuple):
+    """
+    Вопрос квиза.
+
+    Неизменяемый кортеж с именованными полями: занимает меньше памяти, чем словарь из JSON,
+    а поля читаются как атрибуты. Строки вариантов ответа интернируются, поэтому одинаковые
+    варианты разных вопросов хранятся в памяти один раз. Текст правильного ответа
+    вычисляется при загрузке. Категория и сложность (одна из DIFFICULTIES) необязательны.
+    """
+    id: int
+    text: str
+    options: tuple
+    correct_option: int
+    category: str
+    difficulty: str
+    correct_text: str
+
+    @classmethod
+    def from_dict(cls, raw):
+        """
+        Создает вопрос из словаря в формате questions.json и проверяет его.
+
+        Args:
+            raw (dict): Вопрос с полями id, question, options, correct_option
+                и необязательными category и difficulty.
+
+        Returns:
+            Question: Проверенный вопрос.
+
+        Raises:
+            ValueError: Если поля вопроса отсутствуют или заполнены неверно.
+        """
+        try:
+            question_id = raw['id']
+            text = raw['question']
+            options = raw['options']
+            correct_option = raw['correct_option']
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Вопрос {raw!r:.80}: нет обязательного поля {e}") from None
+        if not isinstance(question_id, int) or isinstance(question_id, bool):
+            raise ValueError(f"Вопрос {question_id!r}: идентификатор должен быть целым числом")
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError(f"Вопрос {question_id}: question должен быть непустой строкой")
+        if not isinstance(options, list) or not options or not all(isinstance(option, str) for option in options):
+            raise ValueError(f"Вопрос {question_id}: options должен быть непустым списком строк")
+        if not isinstance(correct_option, int) or not 0 <= correct_option < len(options):
+            raise ValueError(f"Вопрос {question_id}: correct_option {correct_option!r} вне диапазона 0..{len(options) - 1}")
+        category = raw.get('category')
+        difficulty = raw.get('difficulty')
+        if category is not None and (not isinstance(category, str) or not category.strip()):
+            raise ValueError(f"Вопрос {question_id}: category должна быть непустой строкой")
+        if difficulty is not None and difficulty not in DIFFICULTIES:
+            raise ValueError(f"Вопрос {question_id}: difficulty {difficulty!r} не из {', '.join(DIFFICULTIES)}")
+        return cls.build(question_id, text, options, correct_option, category, difficulty)
+
+    @classmethod
+    def build(cls, question_id, text, options, correct_option, category=None, difficulty=None):
+        """ Создает вопрос из уже проверенных полей, интернируя повторяющиеся строки. """
+        options = tuple(sys.intern(option) for option in options)
+        category = sys.intern(category) if category is not None else None
+        difficulty = sys.intern(difficulty) if difficulty is not None else None
+        return cls(question_id, text, options, correct_option, category, difficulty, options[correct_option])
+
+
+#####################################################################################
+# parse_questions
+
+
+def parse_questions(items):
+    """
+    Проверяет вопросы из файла банка и превращает их в объекты Question.
+
+    Args:
+        items (iterable): Вопросы в виде словарей.
+
+    Returns:
+        list: Список объектов Question в исходном порядке.
+
+    Raises:
+        ValueError: Если вопрос заполнен неверно или идентификатор повторяется.
+    """
+    questions = []
+    seen = set()
+    for raw in items:
+        question = Question.from_dict(raw)
+        if question.id in seen:
+            raise ValueError(f"Повторяющийся идентификатор вопроса: {question.id}")
+        seen.add(question.id)
+        questions.append(question)
+    return questions
+
+
+class CategoryIndex:
+    """
+    Индексы вопросов по категориям и сложности.
+
+    Для каждой категории и для каждой пары (категория, сложность) хранится массив плотных
+    индексов вопросов по возрастанию, поэтому выбор вопроса из категории не просматривает
+    весь банк. Категории сравниваются без учета регистра. Битовые карты вопросов категорий
+    (mask) строятся при первом обращении.
+    """
+
+    def __init__(self):
+        self.slices = {}
+        self.names = {}
+        self.masks = {}
+
+    def add(self, position, category, difficulty):
+        """ Добавляет вопрос с плотным индексом position в индексы его категории. """
+        if category is None:
+            return
+        key = category.casefold()
+        self.names.setdefault(key, category)
+        self.slices.setdefault((key, None), array('l')).append(position)
+        if difficulty is not None:
+            self.slices.setdefault((key, difficulty), array('l')).append(position)
+
+    def get(self, category, difficulty=None):
+        """ Возвращает массив плотных индексов вопросов категории или None, если категории нет. """
+        return self.slices.get((category.casefold(), difficulty))
+
+    def mask(self, category, difficulty=None):
+        """ Возвращает битовую карту плотных индексов вопросов категории или None, если категории нет. """
+        key = (category.casefold(), difficulty)
+        mask = self.masks.get(key)
+        if mask is None:
+            positions = self.slices.get(key)
+            if positions is None:
+                return None
+            mask = self.masks[key] = bitset.from_indexes(positions, positions[-1] + 1)
+        return mask
+
+    def categories(self):
+        """ Возвращает список пар (название категории, количество вопросов) по алфавиту. """
+        return sorted((name, len(self.slices[(key, None)])) for key, name in self.names.items())
@@ -0,0 +1,195 @@
+import json
+import os
+import sqlite3
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from utils.question import Question, CategoryIndex
+
+READ_CHUNK = 1 << 20
+INSERT_BATCH = 5000
+# Формат хранения вопросов в файле базы; при его изменении файл строится заново
+STORE_FORMAT = 3
+# Порядок плотных индексов вопросов (по возрастанию идентификатора) входит в версию банка:
+# при смене порядка меняется версия, и битовые карты прогресса переводятся на новые индексы
+INDEX_ORDER = b"ids-ascending"
+
+
+#####################################################################################
+# file_crc32
+
+
+def file_crc32(file_path):
+    """ Считает CRC32 файла, читая его кусками, не загружая целиком в память. """
+    crc = 0
+    with open(file_path, 'rb') as file:
+        while chunk := file.read(READ_CHUNK):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+#####################################################################################
+# bank_version
+
+
+def bank_version(file_path):
+    """
+    Возвращает версию банка вопросов из файла: CRC32 содержимого файла вместе с порядком индексов INDEX_ORDER.
+
+    Версия одинакова для обоих хранилищ вопросов (QuestionBank и SqliteQuestionBank), так как
+    они назначают одинаковые плотные индексы.
+    """
+    return zlib.crc32(INDEX_ORDER, file_crc32(file_path))
+
+
+#####################################################################################
+# iter_source_questions
+
+
+def iter_source_questions(file_path):
+    """
+    Перебирает вопросы из файла банка.
+
+    Файл JSON Lines (.jsonl) читается построчно, по одному вопросу на строку. Обычный JSON-файл
+    с массивом вопросов читается целиком, поэтому для больших банков лучше использовать JSON Lines.
+    """
+    if file_path.endswith('.jsonl'):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            yield from json.load(file)
+
+
+class SqliteQuestionBank:
+    """
+    Снимок банка вопросов, хранящийся в отдельном файле SQLite.
+
+    Вопросы один раз переносятся из исходного файла в таблицу questions, после чего при запуске
+    файл базы открывается без повторного импорта, пока не изменится версия банка (CRC32 исходного файла).
+    В памяти держится только отсортированный массив идентификаторов (8 байт на вопрос),
+    индексы категорий и LRU-кеш из cache_size разобранных вопросов, поэтому потребление памяти не растет
+    вместе с банком. Вопросы хранятся уже проверенными, в виде полей Question.
+    Плотный индекс вопроса - его позиция в отсортированном массиве.
+
+    Интерфейс совпадает с QuestionBank: version, ids, categories, get, index_of.
+
+    Args:
+        db_path (str): Путь к файлу SQLite с вопросами.
+        version (int): Версия банка (см. bank_version).
+        cache_size (int): Количество разобранных вопросов в кеше.
+    """
+
+    # Вопросы не держатся в памяти целиком
+    data = None
+
+    def __init__(self, db_path, version, cache_size=10000):
+        self.db_path = db_path
+        self.version = version
+        self.cache_size = cache_size
+        self._db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self.ids = array('q')
+        self.categories = CategoryIndex()
+        for position, (question_id, category, difficulty) in enumerate(
+                self._db.execute('SELECT id, category, difficulty FROM questions ORDER BY id')):
+            self.ids.append(question_id)
+            self.categories.add(position, category, difficulty)
+        self._cache = OrderedDict()
+
+    @classmethod
+    def open(cls, source_path, db_path, cache_size=10000):
+        """
+        Открывает банк, при необходимости импортируя вопросы из исходного файла.
+
+        Импорт идет во временный файл процесса, который затем атомарно заменяет прежний, поэтому
+        открытые снимки старой версии продолжают читать свои данные, а несколько процессов
+        (шардов) могут перестраивать файл одновременно.
+        """
+        version = bank_version(source_path)
+        if cls.stored_version(db_path) != version:
+            cls.build(source_path, db_path, version)
+        return cls(db_path, version, cache_size)
+
+    @staticmethod
+    def stored_version(db_path):
+        """ Возвращает версию исходного файла, из которого построен файл базы, или None. """
+        if not os.path.exists(db_path):
+            return None
+        try:
+            db = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            try:
+                meta = dict(db.execute('SELECT key, value FROM meta'))
+            finally:
+                db.close()
+        except sqlite3.Error:
+            return None
+        if meta.get('format') != str(STORE_FORMAT) or 'version' not in meta:
+            return None
+        return int(meta['version'])
+
+    @staticmethod
+    def build(source_path, db_path, version):
+        """
+        Построчно переносит вопросы из исходного файла в новый файл SQLite.
+
+        Каждый вопрос проверяется при импорте. При ошибке (неверный вопрос или повторяющийся
+        идентификатор) выбрасывается ValueError, а прежний файл базы остается нетронутым.
+        """
+        temp_path = f"{db_path}.{os.getpid()}.tmp"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        db = sqlite3.connect(temp_path)
+        try:
+            db.execute('PRAGMA journal_mode = OFF')
+            db.execute('PRAGMA synchronous = OFF')
+            db.execute('CREATE TABLE questions (id INTEGER PRIMARY KEY, category TEXT, difficulty TEXT, body TEXT NOT NULL)')
+            db.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            rows = []
+            try:
+                for raw in iter_source_questions(source_path):
+                    question = Question.from_dict(raw)
+                    rows.append((question.id, question.category, question.difficulty, json.dumps(question[:-1], ensure_ascii=False)))
+                    if len(rows) >= INSERT_BATCH:
+                        db.executemany('INSERT INTO questions (id, category, difficulty, body) VALUES (?, ?, ?, ?)', rows)
+                        rows = []
+                db.executemany('INSERT INTO questions (id, category, difficulty, body) VALUES (?, ?, ?, ?)', rows)
+            except sqlite3.IntegrityError:
+                raise ValueError("Повторяющийся идентификатор вопроса") from None
+            db.executemany('INSERT INTO meta (key, value) VALUES (?, ?)',
+                           (('version', str(version)), ('format', str(STORE_FORMAT))))
+            db.commit()
+        except BaseException:
+            db.close()
+            os.remove(temp_path)
+            raise
+        db.close()
+        os.replace(temp_path, db_path)
+
+    def get(self, question_id):
+        """ Возвращает вопрос по идентификатору или None, если такого вопроса нет. """
+        question = self._cache.get(question_id)
+        if question is not None:
+            self._cache.move_to_end(question_id)
+            return question
+        row = self._db.execute('SELECT body FROM questions WHERE id = ?', (question_id,)).fetchone()
+        if row is None:
+            return None
+        question = Question.build(*json.loads(row[0]))
+        self._cache[question_id] = question
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return question
+
+    def index_of(self, question_id):
+        """ Возвращает плотный индекс вопроса или None, если такого вопроса нет. """
+        position = bisect_left(self.ids, question_id)
+        if position < len(self.ids) and self.ids[position] == question_id:
+            return position
+        return None
+
+    def close(self):
+        """ Закрывает соединение с файлом банка; после замены файла это освобождает место на диске. """
+        self._db.close()
@@ -1,22 +1,211 @@
-import json
+import asyncio
+import os
+from array import array
+from config import QUESTIONS_FILE, QUESTIONS_BACKEND, QUESTIONS_DB, QUESTIONS_CACHE_SIZE, main_logger
+from utils.question import parse_questions, CategoryIndex
+from utils.question_store import SqliteQuestionBank, bank_version, iter_source_questions
+
+
+class QuestionBank:
+    """
+    Неизменяемый снимок банка вопросов.
+
+    Хранит вопросы (объекты Question), индекс вопросов по идентификатору, плотный массив идентификаторов
+    по возрастанию (как в SqliteQuestionBank) и их строковые представления, чтобы поиск вопроса
+    выполнялся за постоянное время, а также индексы по категориям и сложности (categories).
+    Версия банка - контрольная сумма CRC32 содержимого файла (см. bank_version).
+    """
+
+    def __init__(self, data, version=0):
+        self.data = data
+        self.version = version
+        self.by_id = {question.id: question for question in data}
+        self.ids = array('q', sorted(self.by_id))
+        self.str_ids = tuple(str(question_id) for question_id in self.ids)
+        self.index = {question_id: position for position, question_id in enumerate(self.ids)}
+        self.categories = CategoryIndex()
+        for position, question_id in enumerate(self.ids):
+            question = self.by_id[question_id]
+            self.categories.add(position, question.category, question.difficulty)
+
+    @classmethod
+    def from_file(cls, file_path):
+        """
+        Читает файл с вопросами и строит по нему банк.
+
+        Принимает те же форматы, что и SqliteQuestionBank: JSON-массив или JSON Lines (.jsonl).
+        """
+        return cls(parse_questions(iter_source_questions(file_path)), bank_version(file_path))
+
+    def get(self, question_id):
+        """ Возвращает вопрос по идентификатору или None, если такого вопроса нет. """
+        return self.by_id.get(question_id)
+
+    def index_of(self, question_id):
+        """ Возвращает плотный индекс вопроса (позицию в ids) или None, если такого вопроса нет. """
+        return self.index.get(question_id)
+
+    def close(self):
+        """ Банк в памяти не держит открытых ресурсов (метод для совместимости с SqliteQuestionBank). """
+
 
 class DataLoader:
-    def __init__(self, file_path):
+    """
+    Банк вопросов, загружаемый из JSON-файла, с горячей перезагрузкой.
+
+    Все данные банка лежат в одном снимке QuestionBank. Перезагрузка читает и индексирует файл
+    в отдельном потоке, не блокируя цикл событий, а затем одной операцией подменяет снимок,
+    поэтому обработчики никогда не видят наполовину обновленный банк. Перезагрузку запускает
+    команда администратора или фоновое слежение за файлом.
+
+    Банк хранится целиком в памяти (backend 'memory') или в отдельном файле SQLite
+    с LRU-кешем вопросов (backend 'sqlite', см. SqliteQuestionBank) для больших банков.
+
+    Поколение generation увеличивается при каждой загрузке, чтобы зависящие от банка кеши
+    могли понять, что их содержимое устарело. После перезагрузки вызываются корутины
+    из listeners с новым снимком банка.
+    """
+
+    def __init__(self, file_path, backend='memory', db_path=None, cache_size=10000):
         self.file_path = file_path
-        self.data = None
+        self.backend = backend
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self.bank = QuestionBank([])
+        self.generation = 0
+        self.listeners = []
+        self._loaded = False
+        self._file_stamp = None
+        self._reload_lock = asyncio.Lock()
+        self._watch_task = None
+
+    @property
+    def data(self):
+        return self.bank.data
+
+    @property
+    def version(self):
+        """ Версия текущего банка вопросов (CRC32 файла, см. bank_version). """
+        return self.bank.version
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _build(self):
+        if self.backend == 'sqlite':
+            return SqliteQuestionBank.open(self.file_path, self.db_path, self.cache_size)
+        return QuestionBank.from_file(self.file_path)
+
+    def _swap(self, bank, file_stamp):
+        self.bank = bank
+        self._file_stamp = file_stamp
+        self._loaded = True
+        self.generation += 1
 
     def load_data(self):
+        file_stamp = self._stat()
         try:
-            with open(self.file_path, 'r') as file:
-                self.data = json.load(file)
+            bank = self._build()
         except FileNotFoundError:
             print(f"File {self.file_path} not found")
-            self.data = []
+            bank = QuestionBank([])
+        self._swap(bank, file_stamp)
+
+    async def reload(self):
+        """
+        Перечитывает файл с вопросами и подменяет банк, если содержимое изменилось.
+
+        Чтение и построение индексов выполняются в отдельном потоке. Если файл не удалось
+        прочитать или разобрать, остается прежний банк. Замененный банк закрывается после того,
+        как отработают listeners, а банк с той же версией, что и текущий, закрывается сразу,
+        чтобы не держать открытыми файлы SQLite прежних версий.
+
+        Returns:
+            bool: True, если банк был заменен новой версией.
+        """
+        async with self._reload_lock:
+            file_stamp = self._stat()
+            try:
+                bank = await asyncio.to_thread(self._build)
+            except Exception as e:
+                main_logger.error(f"Ошибка при перезагрузке вопросов из {self.file_path}: {e}")
+                return False
+            if bank.version == self.bank.version:
+                self._file_stamp = file_stamp
+                bank.close()
+                return False
+
+            previous = self.bank
+            self._swap(bank, file_stamp)
+            main_logger.info(f"Банк вопросов обновлен: версия {previous.version} -> {bank.version}, вопросов: {len(bank.ids)}")
+            try:
+                for listener in self.listeners:
+                    try:
+                        await listener(bank)
+                    except Exception as e:
+                        main_logger.error(f"Ошибка в обработчике перезагрузки вопросов: {e}")
+            finally:
+                previous.close()
+            return True
+
+    async def _watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            if self._stat() != self._file_stamp:
+                await self.reload()
+
+    def start_watching(self, interval):
+        """ Запускает фоновую проверку файла с вопросами раз в interval секунд. """
+        if self._watch_task is None and interval > 0:
+            self._watch_task = asyncio.create_task(self._watch(interval))
+
+    async def stop_watching(self):
+        """ Останавливает фоновую проверку файла с вопросами. """
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
 
     def get_data(self):
-        if self.data is None:
+        if not self._loaded:
             self.load_data()
-        return self.data
+        return self.bank.data
+
+    def get(self, question_id):
+        """ Возвращает вопрос по идентификатору или None, если такого вопроса нет. """
+        return self.bank.get(question_id)
+
+    def index_of(self, question_id):
+        """ Возвращает плотный индекс вопроса (позицию в all_ids) или None, если такого вопроса нет. """
+        return self.bank.index_of(question_id)
+
+    def slice(self, category, difficulty=None):
+        """ Возвращает плотные индексы вопросов категории (и сложности) или None, если категории нет. """
+        return self.bank.categories.get(category, difficulty)
+
+    def category_mask(self, category, difficulty=None):
+        """ Возвращает битовую карту плотных индексов вопросов категории (и сложности) или None, если категории нет. """
+        return self.bank.categories.mask(category, difficulty)
+
+    def categories(self):
+        """ Возвращает список пар (название категории, количество вопросов). """
+        return self.bank.categories.categories()
+
+    def all_ids(self):
+        """ Возвращает массив идентификаторов всех вопросов в порядке их плотных индексов. """
+        return self.bank.ids
+
+    def count(self):
+        """ Возвращает количество вопросов в банке. """
+        return len(self.bank.ids)
 
-questions_loader = DataLoader('questions.json')
-questions_loader.load_data()
\ No newline at end of file
+questions_loader = DataLoader(QUESTIONS_FILE, backend=QUESTIONS_BACKEND, db_path=QUESTIONS_DB,
+                              cache_size=QUESTIONS_CACHE_SIZE)
+questions_loader.load_data()
@@ -0,0 +1,250 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage, EditMessageText, EditMessageReplyMarkup
+from utils.metrics import registry, bot_api_seconds
+from config import (SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_GLOBAL_RATE, SEND_GLOBAL_BURST, SEND_MAX_RETRIES,
+                    bot_logger)
+
+# Приоритеты отправки: чем меньше число, тем раньше запрос получает токен глобального лимита.
+# Порядок запросов внутри одного чата приоритет не меняет
+PRIORITY_QUESTION = 0
+PRIORITY_NORMAL = 1
+PRIORITY_DECORATIVE = 2
+
+MESSAGE_LIMIT = 4096
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate запросов в секунду с допустимым всплеском до capacity запросов.
+
+    Если rate равен 0, ограничение отключено.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self):
+        """ Забирает токен, если он есть, не уходя в долг. """
+        if not self.rate:
+            return True
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def reserve(self):
+        """ Резервирует токен и возвращает, сколько секунд нужно подождать до его появления. """
+        if not self.rate:
+            return 0
+        self._refill()
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def time_to_full(self):
+        """ Возвращает, через сколько секунд ведро снова наполнится. """
+        if not self.rate:
+            return 0
+        self._refill()
+        return (self.capacity - self.tokens) / self.rate
+
+
+class PriorityLimiter:
+    """
+    Глобальный лимит запросов, который выдает токены в порядке приоритета.
+
+    Пока токенов хватает, запросы проходят сразу. Когда лимит исчерпан, ожидающие запросы
+    выстраиваются в кучу по приоритету, и следующий токен получает запрос с наименьшим приоритетом.
+    """
+
+    def __init__(self, rate, capacity):
+        self.bucket = TokenBucket(rate, capacity)
+        self._waiters = []
+        self._order = itertools.count()
+        self._task = None
+
+    async def acquire(self, priority):
+        if not self._waiters and self.bucket.try_take():
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        if self._task is None:
+            self._task = asyncio.create_task(self._grant())
+        await future
+
+    async def _grant(self):
+        try:
+            while self._waiters:
+                delay = self.bucket.reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+                _, _, future = heapq.heappop(self._waiters)
+                if not future.done():
+                    future.set_result(None)
+        finally:
+            self._task = None
+
+
+class OutgoingRequest:
+    """ Запрос к Bot API в очереди чата. """
+
+    __slots__ = ('bot', 'method', 'priority', 'merge', 'future')
+
+    def __init__(self, bot, method, priority, merge, future):
+        self.bot = bot
+        self.method = method
+        self.priority = priority
+        self.merge = merge
+        self.future = future
+
+
+class SendScheduler:
+    """
+    Планировщик исходящих запросов к Bot API.
+
+    Запросы в каждый чат выполняются строго в порядке постановки, независимо от приоритета:
+    иначе следующий вопрос мог бы обогнать в чате результат ответа на предыдущий. Идущие подряд
+    текстовые сообщения без клавиатуры, помеченные как объединяемые, отправляются одним сообщением.
+    Частота запросов ограничивается ведром токенов на каждый чат и общим лимитом на бота.
+    Приоритет влияет только на общий лимит: когда он исчерпан, очередь чата, в голове которой
+    вопрос квиза, получает токен раньше чатов, ожидающих отправки декоративных сообщений.
+    Ответ 429 повторяется после retry_after.
+
+    Ошибки отправки записываются в лог, а ожидающий запроса получает None.
+    """
+
+    def __init__(self, chat_rate=1.0, chat_burst=5, global_rate=30.0, global_burst=30, max_retries=3):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.limiter = PriorityLimiter(global_rate, global_burst)
+        self._queues = {}
+        self._buckets = {}
+        self._tasks = set()
+
+    def submit(self, bot, method, priority=PRIORITY_NORMAL, merge=False):
+        """
+        Ставит запрос к Bot API в очередь чата.
+
+        Args:
+            bot (Bot): Бот, от имени которого выполняется запрос.
+            method (TelegramMethod): Метод Bot API с заполненным chat_id.
+            priority (int): Приоритет запроса (PRIORITY_QUESTION, PRIORITY_NORMAL, PRIORITY_DECORATIVE).
+            merge (bool): Можно ли объединить сообщение с соседними текстовыми сообщениями.
+
+        Returns:
+            asyncio.Future: Результат запроса (например, отправленное сообщение) или None при ошибке.
+        """
+        future = asyncio.get_running_loop().create_future()
+        chat_id = method.chat_id
+        queue = self._queues.get(chat_id)
+        if queue is None:
+            queue = self._queues[chat_id] = deque()
+            task = asyncio.create_task(self._drain(chat_id, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        queue.append(OutgoingRequest(bot, method, priority, merge, future))
+        return future
+
+    def answer(self, message, text, reply_markup=None, priority=PRIORITY_NORMAL, merge=None):
+        """
+        Отправляет текстовое сообщение в чат сообщения message.
+
+        По умолчанию сообщения без клавиатуры объединяются с соседними.
+        """
+        if merge is None:
+            merge = reply_markup is None
+        method = SendMessage(chat_id=message.chat.id, text=text, reply_markup=reply_markup)
+        return self.submit(message.bot, method, priority=priority, merge=merge)
+
+    def edit_text(self, message, text, priority=PRIORITY_DECORATIVE):
+        """ Заменяет текст ранее отправленного сообщения. """
+        method = EditMessageText(chat_id=message.chat.id, message_id=message.message_id, text=text)
+        return self.submit(message.bot, method, priority=priority)
+
+    def remove_reply_markup(self, message, priority=PRIORITY_QUESTION):
+        """ Убирает inline-клавиатуру у сообщения. """
+        method = EditMessageReplyMarkup(chat_id=message.chat.id, message_id=message.message_id, reply_markup=None)
+        return self.submit(message.bot, method, priority=priority)
+
+    async def _drain(self, chat_id, queue):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        try:
+            while queue:
+                batch = [queue.popleft()]
+                if batch[0].merge:
+                    length = len(batch[0].method.text)
+                    while (queue and queue[0].merge and queue[0].bot is batch[0].bot
+                           and length + 1 + len(queue[0].method.text) <= MESSAGE_LIMIT):
+                        length += 1 + len(queue[0].method.text)
+                        batch.append(queue.popleft())
+                if len(batch) == 1:
+                    method = batch[0].method
+                else:
+                    method = SendMessage(chat_id=chat_id, text="\n".join(request.method.text for request in batch))
+
+                delay = bucket.reserve()
+                if delay:
+                    await asyncio.sleep(delay)
+                await self.limiter.acquire(min(request.priority for request in batch))
+                result = await self._call(batch[0].bot, method)
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_result(result)
+        finally:
+            del self._queues[chat_id]
+            for request in queue:
+                if not request.future.done():
+                    request.future.set_result(None)
+            asyncio.get_running_loop().call_later(bucket.time_to_full(), self._drop_bucket, chat_id)
+
+    def _drop_bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if chat_id not in self._queues and bucket is not None and bucket.time_to_full() < 0.05:
+            del self._buckets[chat_id]
+
+    async def _call(self, bot, method):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with bot_api_seconds.time(method.__api_method__):
+                    return await bot(method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    bot_logger.error(f"Превышен лимит Bot API для {method.__api_method__}: {e}")
+                    return None
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                bot_logger.error(f"Ошибка отправки {method.__api_method__}: {e}")
+                return None
+
+    async def stop(self):
+        """ Дожидается отправки всех запросов из очередей. """
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+send_scheduler = SendScheduler(
+    chat_rate=SEND_CHAT_RATE,
+    chat_burst=SEND_CHAT_BURST,
+    global_rate=SEND_GLOBAL_RATE,
+    global_burst=SEND_GLOBAL_BURST,
+    max_retries=SEND_MAX_RETRIES
+)
+
+registry.callback('quiz_send_queued', 'Запросы к Bot API, ожидающие в очередях чатов.',
+                  lambda: sum(len(queue) for queue in send_scheduler._queues.values()))
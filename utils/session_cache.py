@@ -0,0 +1,354 @@
+import asyncio
+import time
+from collections import OrderedDict
+from utils.spaced_repetition import ReviewQueue
+
+
+class SessionChanges:
+    """
+    Изменения сессии, еще не записанные в базу данных.
+
+    Содержит только измененные ответы (answers); весь прогресс пользователя передается
+    счетчиками и битовыми картами сессии, поэтому запись не копирует все результаты ответов.
+    """
+
+    __slots__ = ('user_id', 'exists', 'reset', 'current_question_id', 'order_seed', 'order_cursor', 'category',
+                 'difficulty', 'state_changed', 'answers', 'reviews', 'first_answers', 'answered_count', 'correct_count', 'wrong_count',
+                 'bank_version', 'answered_bits', 'correct_bits', 'wrong_bits')
+
+    def __init__(self, session):
+        self.user_id = session.user_id
+        self.exists = session.exists
+        self.reset = session.reset
+        self.current_question_id = session.current_question_id
+        self.order_seed = session.order_seed
+        self.order_cursor = session.order_cursor
+        self.category = session.category
+        self.difficulty = session.difficulty
+        self.state_changed = session.state_changed
+        self.answers = session.changes
+        self.reviews = session.reviews.changes
+        self.first_answers = session.first_answers
+        self.answered_count = len(session.outcomes)
+        self.correct_count = session.correct_count
+        self.wrong_count = session.wrong_count
+        self.bank_version = session.bank_version
+        self.answered_bits = session.answered_bits
+        self.correct_bits = session.correct_bits
+        self.wrong_bits = session.wrong_bits
+
+
+class Session:
+    """
+    Состояние квиза одного пользователя в памяти.
+
+    Хранит текущий вопрос, результаты ответов и битовые карты отвеченных, правильно и неправильно
+    отвеченных вопросов (бит на плотный индекс вопроса в банке версии bank_version), порядок вопросов пользователя
+    (зерно перестановки order_seed и позиция order_cursor в ней), выбранные категорию и сложность
+    вопросов, очередь повторения неправильно отвеченных вопросов (reviews), а также изменения,
+    ожидающие записи в базу данных. Первые результаты ответов на вопросы (first_answers) копятся
+    отдельно: по ним обновляется статистика вопросов.
+    """
+
+    __slots__ = ('user_id', 'exists', 'current_question_id', 'order_seed', 'order_cursor', 'category', 'difficulty',
+                 'outcomes', 'answered_bits', 'correct_bits', 'wrong_bits', 'reviews', 'bank_version', 'correct_count', 'wrong_count', 'changes', 'first_answers', 'reset',
+                 'state_changed', 'dirty', 'touched_at')
+
+    def __init__(self, user_id, exists=False, current_question_id=None, bank_version=None, order_seed=None, order_cursor=0,
+                 reviews=None):
+        self.user_id = user_id
+        self.bank_version = bank_version
+        self.order_seed = order_seed
+        self.order_cursor = order_cursor
+        self.category = None
+        self.difficulty = None
+        self.exists = exists
+        self.current_question_id = current_question_id
+        self.outcomes = {}
+        self.answered_bits = 0
+        self.correct_bits = 0
+        self.wrong_bits = 0
+        self.reviews = reviews if reviews is not None else ReviewQueue()
+        self.correct_count = 0
+        self.wrong_count = 0
+        self.changes = {}
+        self.first_answers = {}
+        self.reset = False
+        self.state_changed = False
+        self.dirty = False
+        self.touched_at = time.monotonic()
+
+    def load_answer(self, question_id, index, outcome):
+        """ Добавляет ответ, прочитанный из базы данных, не помечая его как изменение. """
+        previous = self.outcomes.get(question_id)
+        self.outcomes[question_id] = outcome
+        mask = 1 << index if index is not None else 0
+        self.answered_bits |= mask
+        if previous == 'correct':
+            self.correct_count -= 1
+            self.correct_bits &= ~mask
+        elif previous == 'wrong':
+            self.wrong_count -= 1
+            self.wrong_bits &= ~mask
+        if outcome == 'correct':
+            self.correct_count += 1
+            self.correct_bits |= mask
+        elif outcome == 'wrong':
+            self.wrong_count += 1
+            self.wrong_bits |= mask
+
+    def record(self, question_id, index, outcome):
+        """ Записывает ответ пользователя и помечает его для сохранения в базу данных. """
+        if outcome is not None and self.outcomes.get(question_id) is None:
+            self.first_answers[question_id] = outcome
+        self.load_answer(question_id, index, outcome)
+        self.changes[question_id] = outcome
+        self.exists = True
+
+    @property
+    def nonce(self):
+        """ Номер текущего квиза пользователя для подписи кнопок ответа: младшие 32 бита зерна порядка вопросов. """
+        return (self.order_seed or 0) & 0xFFFFFFFF
+
+    def has_outcome(self, question_id):
+        """ Проверяет, записан ли результат ответа на вопрос. """
+        return self.outcomes.get(question_id) is not None
+
+    def set_current(self, question_id):
+        """ Делает вопрос текущим для пользователя. """
+        self.current_question_id = question_id
+        self.state_changed = True
+        self.exists = True
+
+    def rebase(self, index_of, bank_version):
+        """
+        Перестраивает битовые карты ответов под другую версию банка вопросов.
+
+        Порядок вопросов начинается сначала: перестановка строится по размеру банка,
+        а уже отвеченные вопросы при выборе пропускаются.
+
+        Args:
+            index_of (callable): Функция, возвращающая плотный индекс вопроса в новом банке или None.
+            bank_version (int): Версия нового банка.
+        """
+        answered_bits = correct_bits = wrong_bits = 0
+        for question_id, outcome in self.outcomes.items():
+            index = index_of(question_id)
+            if index is None:
+                continue
+            mask = 1 << index
+            answered_bits |= mask
+            if outcome == 'correct':
+                correct_bits |= mask
+            elif outcome == 'wrong':
+                wrong_bits |= mask
+        self.answered_bits = answered_bits
+        self.correct_bits = correct_bits
+        self.wrong_bits = wrong_bits
+        self.bank_version = bank_version
+        self.order_cursor = 0
+        if self.exists:
+            self.state_changed = True
+
+    def start_order(self, seed, category=None, difficulty=None):
+        """ Начинает новый порядок вопросов с заданным зерном по категории и сложности (None - все вопросы). """
+        self.order_seed = seed
+        self.order_cursor = 0
+        self.category = category
+        self.difficulty = difficulty
+        self.state_changed = True
+
+    def clear(self):
+        """ Удаляет весь прогресс пользователя. """
+        self.exists = False
+        self.current_question_id = None
+        self.order_seed = None
+        self.order_cursor = 0
+        self.category = None
+        self.difficulty = None
+        self.outcomes = {}
+        self.answered_bits = 0
+        self.correct_bits = 0
+        self.wrong_bits = 0
+        self.reviews.clear()
+        self.correct_count = 0
+        self.wrong_count = 0
+        self.changes = {}
+        self.first_answers = {}
+        self.reset = True
+        self.state_changed = False
+
+    def take_changes(self):
+        """ Забирает накопленные изменения для записи в базу данных. """
+        changes = SessionChanges(self)
+        self.changes = {}
+        self.first_answers = {}
+        self.reviews.take_changes()
+        self.reset = False
+        self.state_changed = False
+        self.dirty = False
+        return changes
+
+    def restore_changes(self, changes):
+        """ Возвращает изменения, которые не удалось записать, чтобы повторить запись позже. """
+        if not self.reset:
+            self.reset = changes.reset
+            self.changes = {**changes.answers, **self.changes}
+            self.reviews.restore_changes(changes.reviews)
+            self.first_answers = {**changes.first_answers, **self.first_answers}
+        self.state_changed = self.state_changed or changes.state_changed
+        self.dirty = True
+
+
+class SessionCache:
+    """
+    LRU-кеш сессий активных пользователей с вытеснением по времени простоя.
+
+    Чтения обслуживаются из памяти, сессия загружается из базы данных только при промахе.
+    Изменения записываются функцией flusher: сразу при каждом изменении (режим write-through)
+    или пачками раз в flush_interval секунд и при остановке (режим write-behind).
+
+    Args:
+        loader (callable): Корутина loader(user_id), загружающая Session из базы данных.
+        flusher (callable): Корутина flusher(changes), записывающая список SessionChanges в одной транзакции.
+        max_size (int): Максимальное количество сессий в памяти.
+        ttl (float): Время простоя в секундах, после которого сессия вытесняется.
+        flush_interval (float): Интервал фоновой записи в секундах.
+        flush_batch (int): Максимальное количество сессий в одной транзакции записи.
+        write_behind (bool): Откладывать ли запись изменений до фоновой записи.
+        logger (logging.Logger): Логгер для ошибок фоновой записи.
+    """
+
+    def __init__(self, loader, flusher, max_size=10000, ttl=1800, flush_interval=1.0, flush_batch=500,
+                 write_behind=False, logger=None):
+        self.loader = loader
+        self.flusher = flusher
+        self.max_size = max_size
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.write_behind = write_behind
+        self.logger = logger
+        self._sessions = OrderedDict()
+        self._evicted = {}
+        self._loading = {}
+        self._task = None
+
+    async def get(self, user_id):
+        """ Возвращает сессию пользователя, загружая ее из базы данных при необходимости. """
+        session = self._sessions.get(user_id)
+        if session is not None:
+            self._sessions.move_to_end(user_id)
+            session.touched_at = time.monotonic()
+            return session
+
+        session = self._evicted.pop(user_id, None)
+        if session is None:
+            loading = self._loading.get(user_id)
+            if loading is not None:
+                return await asyncio.shield(loading)
+            loading = asyncio.get_running_loop().create_future()
+            self._loading[user_id] = loading
+            try:
+                session = await self.loader(user_id)
+            except BaseException as e:
+                loading.set_exception(e)
+                loading.exception()
+                raise
+            finally:
+                del self._loading[user_id]
+            loading.set_result(session)
+
+        session.touched_at = time.monotonic()
+        self._sessions[user_id] = session
+        self._evict_overflow()
+        return session
+
+    async def commit(self, session):
+        """
+        Помечает сессию измененной.
+
+        В режиме write-through сразу записывает изменения в базу данных,
+        в режиме write-behind оставляет их фоновой записи. Если записать изменения
+        в режиме write-through не удалось, сессия удаляется из кеша: незаписанные изменения
+        в памяти отменяются, и следующее обращение перечитает сессию из базы данных.
+        """
+        session.dirty = True
+        if not self.write_behind:
+            try:
+                await self.flush_sessions([session], raise_errors=True)
+            except Exception:
+                self.discard(session)
+                raise
+
+    def discard(self, session):
+        """ Удаляет сессию из кеша вместе с ее незаписанными изменениями. """
+        for sessions in (self._sessions, self._evicted):
+            if sessions.get(session.user_id) is session:
+                del sessions[session.user_id]
+
+    def _evict_overflow(self):
+        while len(self._sessions) > self.max_size:
+            user_id, session = self._sessions.popitem(last=False)
+            if session.dirty:
+                self._evicted[user_id] = session
+
+    def evict_idle(self):
+        """ Вытесняет сессии, простаивающие дольше ttl. Измененные сессии дожидаются записи. """
+        deadline = time.monotonic() - self.ttl
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.touched_at > deadline:
+                break
+            del self._sessions[user_id]
+            if session.dirty:
+                self._evicted[user_id] = session
+
+    async def flush_sessions(self, sessions, raise_errors=False):
+        """ Записывает изменения переданных сессий в базу данных одной транзакцией. """
+        sessions = [session for session in sessions if session.dirty]
+        if not sessions:
+            return
+        changes = [session.take_changes() for session in sessions]
+        try:
+            await self.flusher(changes)
+        except Exception as e:
+            for session, session_changes in zip(sessions, changes):
+                session.restore_changes(session_changes)
+            if raise_errors:
+                raise
+            if self.logger:
+                self.logger.error(f"Ошибка при записи сессий: {e}")
+            return
+        for session in sessions:
+            if not session.dirty and self._evicted.get(session.user_id) is session:
+                del self._evicted[session.user_id]
+
+    async def flush(self):
+        """ Записывает все измененные сессии пачками по flush_batch штук. """
+        dirty = [session for session in self._sessions.values() if session.dirty]
+        dirty.extend(session for session in self._evicted.values() if session.dirty)
+        for start in range(0, len(dirty), self.flush_batch):
+            await self.flush_sessions(dirty[start:start + self.flush_batch])
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            self.evict_idle()
+
+    def start(self):
+        """ Запускает фоновую запись измененных сессий и вытеснение простаивающих. """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """ Останавливает фоновую задачу и записывает все оставшиеся изменения. """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
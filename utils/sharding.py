@@ -0,0 +1,234 @@
+import asyncio
+import hmac
+import multiprocessing
+import os
+import aiohttp
+from aiohttp import web
+from utils.permutation import mix64
+
+TELEGRAM_API = "https://api.telegram.org"
+
+
+#####################################################################################
+# extract_user_id
+
+
+def extract_user_id(update):
+    """
+    Возвращает идентификатор пользователя из необработанного обновления Telegram (словаря JSON).
+
+    Пользователь берется из поля from (или user) объекта обновления, а если его нет -
+    идентификатор чата. Для обновлений без пользователя и чата возвращается None.
+    """
+    for key, event in update.items():
+        if key == 'update_id' or not isinstance(event, dict):
+            continue
+        user = event.get('from') or event.get('user')
+        if user is not None:
+            return user.get('id')
+        chat = event.get('chat')
+        if chat is not None:
+            return chat.get('id')
+    return None
+
+
+#####################################################################################
+# shard_for
+
+
+def shard_for(user_id, shards):
+    """ Возвращает номер шарда пользователя. Обновления без пользователя попадают в шард 0. """
+    if user_id is None:
+        return 0
+    return mix64(user_id & 0xFFFFFFFFFFFFFFFF) % shards
+
+
+#####################################################################################
+# shard_db_name
+
+
+def shard_db_name(db_name, index):
+    """ Возвращает имя базы данных шарда index: quiz_bot.db -> quiz_bot.shard<index>.db. """
+    root, ext = os.path.splitext(db_name)
+    return f"{root}.shard{index}{ext}"
+
+
+class ShardQueue:
+    """
+    Очередь необработанных обновлений одного шарда со счетчиком ожидающих обновлений.
+
+    multiprocessing.Queue.qsize() не реализован в macOS (вызывает NotImplementedError),
+    поэтому количество обновлений в очереди считается отдельно в разделяемом счетчике:
+    put увеличивает его, get и get_nowait уменьшают.
+
+    Args:
+        context: Контекст multiprocessing, в котором создаются очередь и счетчик.
+    """
+
+    def __init__(self, context):
+        self._queue = context.Queue()
+        self._pending = context.Value('i', 0)
+
+    def _add(self, delta):
+        with self._pending.get_lock():
+            self._pending.value += delta
+
+    def put(self, update):
+        """ Добавляет обновление в очередь. """
+        self._add(1)
+        self._queue.put(update)
+
+    def get(self):
+        """ Забирает обновление из очереди, дожидаясь его появления. """
+        update = self._queue.get()
+        self._add(-1)
+        return update
+
+    def get_nowait(self):
+        """ Забирает обновление из очереди без ожидания или вызывает queue.Empty. """
+        update = self._queue.get_nowait()
+        self._add(-1)
+        return update
+
+    def qsize(self):
+        """ Возвращает количество обновлений, еще не забранных шардом. """
+        return self._pending.value
+
+
+class ShardRouter:
+    """
+    Распределяет обновления Telegram по процессам-шардам по идентификатору пользователя.
+
+    Каждый шард - отдельный процесс с собственным циклом событий, диспетчером бота и базой данных,
+    получающий необработанные обновления из своей очереди multiprocessing. Все обновления
+    одного пользователя попадают в один шард и в порядке поступления, поэтому порядок
+    обработки обновлений пользователя сохраняется.
+
+    Args:
+        shards (int): Количество шардов.
+        target (callable): Функция target(updates), выполняемая в процессе шарда; updates - очередь обновлений ShardQueue.
+            Обновление None означает остановку.
+        max_pending (int): Размер очереди шарда, после которого can_accept возвращает False.
+    """
+
+    def __init__(self, shards, target, max_pending=1000):
+        self.shards = shards
+        self.target = target
+        self.max_pending = max_pending
+        self.queues = []
+        self.processes = []
+
+    def start(self):
+        """
+        Запускает процессы шардов.
+
+        Номер шарда передается процессу через переменную окружения SHARD_INDEX, по которой
+        config.py выбирает базу данных, файлы логов и порт метрик шарда.
+        """
+        context = multiprocessing.get_context('spawn')
+        previous = os.environ.get('SHARD_INDEX')
+        try:
+            for index in range(self.shards):
+                os.environ['SHARD_INDEX'] = str(index)
+                queue = ShardQueue(context)
+                process = context.Process(target=self.target, args=(queue,), name=f"quiz-shard-{index}")
+                process.start()
+                self.queues.append(queue)
+                self.processes.append(process)
+        finally:
+            if previous is None:
+                os.environ.pop('SHARD_INDEX', None)
+            else:
+                os.environ['SHARD_INDEX'] = previous
+
+    def route(self, update):
+        """ Передает необработанное обновление в очередь шарда его пользователя. """
+        self.queues[shard_for(extract_user_id(update), self.shards)].put(update)
+
+    def can_accept(self, update):
+        """ Проверяет, что очередь шарда пользователя обновления не переполнена. """
+        return self.queues[shard_for(extract_user_id(update), self.shards)].qsize() < self.max_pending
+
+    async def stop(self):
+        """ Отправляет шардам сигнал остановки и дожидается завершения их процессов. """
+        for queue in self.queues:
+            queue.put(None)
+        loop = asyncio.get_running_loop()
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join)
+        self.queues = []
+        self.processes = []
+
+
+#####################################################################################
+# poll_updates
+
+
+async def poll_updates(token, router, logger, timeout=30):
+    """
+    Получает обновления методом getUpdates и передает их шардам, не разбирая в модели aiogram.
+
+    Работает до отмены задачи. При ошибке запроса повторяет его через секунду.
+
+    Args:
+        token (str): Токен бота.
+        router (ShardRouter): Распределитель обновлений по шардам.
+        logger (logging.Logger): Логгер для ошибок получения обновлений.
+        timeout (int): Время ожидания новых обновлений в одном запросе (long polling), секунд.
+    """
+    offset = None
+    url = f"{TELEGRAM_API}/bot{token}/getUpdates"
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout + 10)) as session:
+        while True:
+            params = {'timeout': timeout}
+            if offset is not None:
+                params['offset'] = offset
+            try:
+                async with session.get(url, params=params) as response:
+                    payload = await response.json()
+                if not payload.get('ok'):
+                    raise RuntimeError(payload.get('description'))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка получения обновлений: {e}")
+                await asyncio.sleep(1)
+                continue
+            for update in payload['result']:
+                router.route(update)
+                offset = update['update_id'] + 1
+
+
+#####################################################################################
+# create_front_webhook_app
+
+
+def create_front_webhook_app(router, path, secret_token=None, retry_after=1):
+    """
+    Создает aiohttp-приложение вебхука основного процесса.
+
+    Обновление только разбирается из JSON и передается шарду, ответ Telegram отправляется сразу.
+    Если очередь шарда переполнена, запрос отклоняется с кодом 503 и заголовком Retry-After.
+
+    Args:
+        router (ShardRouter): Распределитель обновлений по шардам.
+        path (str): Путь вебхука.
+        secret_token (str, optional): Секрет из заголовка X-Telegram-Bot-Api-Secret-Token.
+        retry_after (int): Значение заголовка Retry-After в секундах.
+
+    Returns:
+        web.Application: Приложение с обработчиком вебхука.
+    """
+    async def handle_update(request):
+        if secret_token and not hmac.compare_digest(request.headers.get("X-Telegram-Bot-Api-Secret-Token", "").encode(),
+                                                    secret_token.encode()):
+            return web.Response(status=401)
+        update = await request.json()
+        if not router.can_accept(update):
+            return web.Response(status=503, headers={"Retry-After": str(retry_after)})
+        router.route(update)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    return app
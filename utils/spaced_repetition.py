@@ -0,0 +1,137 @@
+import heapq
+
+# Начальный коэффициент легкости и его нижняя граница (алгоритм SM-2)
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+# Оценки ответа по шкале SM-2 (0-5)
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+
+
+class ReviewItem:
+    """ Расписание повторения одного вопроса. """
+
+    __slots__ = ('question_id', 'due_at', 'interval', 'ease', 'repetitions')
+
+    def __init__(self, question_id, due_at, interval, ease=INITIAL_EASE, repetitions=0):
+        self.question_id = question_id
+        self.due_at = due_at
+        self.interval = interval
+        self.ease = ease
+        self.repetitions = repetitions
+
+    def as_row(self):
+        """ Возвращает поля для записи в таблицу review_queue (без user_id). """
+        return self.question_id, int(self.due_at), self.interval, self.ease, self.repetitions
+
+
+class ReviewQueue:
+    """
+    Очередь повторения вопросов одного пользователя по алгоритму SM-2.
+
+    Неправильно отвеченный вопрос попадает в очередь и повторяется через first_interval секунд.
+    Каждый правильный ответ на повторении увеличивает интервал (second_interval, затем
+    в 6 раз больше, затем умножая на коэффициент легкости), неправильный - сбрасывает его
+    к first_interval и уменьшает коэффициент легкости.
+
+    Вопросы лежат в куче по времени следующего повторения, поэтому ближайший вопрос
+    находится за O(1), а перепланирование занимает O(log n). Устаревшие записи кучи
+    (после перепланирования) отбрасываются лениво. Измененные расписания копятся в changes
+    до записи в базу данных: значение None означает удаление вопроса из очереди.
+
+    Args:
+        first_interval (float): Интервал до первого повторения после ошибки в секундах.
+        second_interval (float): Интервал после первого правильного повторения в секундах.
+    """
+
+    __slots__ = ('first_interval', 'second_interval', 'items', 'heap', 'changes')
+
+    def __init__(self, first_interval=600, second_interval=86400):
+        self.first_interval = first_interval
+        self.second_interval = second_interval
+        self.items = {}
+        self.heap = []
+        self.changes = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, question_id):
+        return question_id in self.items
+
+    def load(self, item):
+        """ Добавляет расписание, прочитанное из базы данных, не помечая его как изменение. """
+        self.items[item.question_id] = item
+        heapq.heappush(self.heap, (item.due_at, item.question_id))
+
+    def record(self, question_id, is_correct, now):
+        """
+        Перепланирует вопрос по результату ответа.
+
+        Args:
+            question_id (int): Идентификатор вопроса.
+            is_correct (bool): Был ли ответ правильным.
+            now (float): Текущее время (Unix time).
+
+        Returns:
+            ReviewItem: Новое расписание вопроса.
+        """
+        item = self.items.get(question_id)
+        if item is None:
+            item = self.items[question_id] = ReviewItem(question_id, now, self.first_interval)
+        quality = QUALITY_CORRECT if is_correct else QUALITY_WRONG
+        item.ease = max(MIN_EASE, item.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        if is_correct:
+            item.repetitions += 1
+            if item.repetitions == 1:
+                item.interval = self.second_interval
+            elif item.repetitions == 2:
+                item.interval = self.second_interval * 6
+            else:
+                item.interval *= item.ease
+        else:
+            item.repetitions = 0
+            item.interval = self.first_interval
+        item.due_at = now + item.interval
+        heapq.heappush(self.heap, (item.due_at, question_id))
+        self.changes[question_id] = item
+        return item
+
+    def remove(self, question_id):
+        """ Убирает вопрос из очереди повторения. """
+        if self.items.pop(question_id, None) is not None:
+            self.changes[question_id] = None
+
+    def peek(self):
+        """ Возвращает вопрос с ближайшим временем повторения или None, если очередь пуста. """
+        heap = self.heap
+        while heap:
+            due_at, question_id = heap[0]
+            item = self.items.get(question_id)
+            if item is not None and item.due_at == due_at:
+                return item
+            heapq.heappop(heap)
+        return None
+
+    def due(self, now):
+        """ Возвращает вопрос, время повторения которого наступило, или None. """
+        item = self.peek()
+        if item is not None and item.due_at <= now:
+            return item
+        return None
+
+    def clear(self):
+        """ Удаляет все расписания. Удаление из базы данных выполняется вместе со сбросом прогресса. """
+        self.items = {}
+        self.heap = []
+        self.changes = {}
+
+    def take_changes(self):
+        """ Забирает измененные расписания для записи в базу данных. """
+        changes = self.changes
+        self.changes = {}
+        return changes
+
+    def restore_changes(self, changes):
+        """ Возвращает изменения, которые не удалось записать, чтобы повторить запись позже. """
+        self.changes = {**changes, **self.changes}
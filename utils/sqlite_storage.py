@@ -0,0 +1,553 @@
+import time
+from array import array
+from utils import bitset
+from utils.connection_pool import ConnectionPool
+from utils.spaced_repetition import ReviewItem
+from utils.storage import StoredSession
+from utils.metrics import db_timed
+
+
+class SqliteStorage:
+    """
+    Хранилище прогресса пользователей в базе данных SQLite.
+
+    Работает через пул долгоживущих соединений (ConnectionPool) в режиме WAL: чтения идут
+    через соединения для чтения и не ждут записи, а изменения сессий ставятся в очередь
+    и фиксируются группами в одной транзакции.
+
+    Прогресс хранится строками user_answers (progress_storage 'table') или битовыми картами
+    quiz_state (progress_storage 'bitset'). Битовые карты строятся по плотным индексам банка
+    вопросов, поэтому идентификаторы вопросов каждой версии банка сохраняются в bank_versions.
+
+    Args:
+        db_name (str): Путь к файлу базы данных.
+        readers (int): Количество соединений для чтения.
+        busy_timeout (int): Время ожидания блокировки базы в миллисекундах.
+        batch_delay (float): Максимальная задержка групповой фиксации в секундах.
+        batch_size (int): Количество операций, после которого группа фиксируется сразу.
+        progress_storage (str): Режим хранения прогресса: 'table' или 'bitset'.
+        logger (logging.Logger, optional): Логгер для ошибок и сообщений миграций.
+    """
+
+    def __init__(self, db_name, readers=4, busy_timeout=5000, batch_delay=0.002, batch_size=200, progress_storage='table',
+                 logger=None):
+        self.pool = ConnectionPool(db_name, readers=readers, busy_timeout=busy_timeout, batch_delay=batch_delay,
+                                   batch_size=batch_size)
+        self.progress_storage = progress_storage
+        self.logger = logger
+        self.bank = None
+        # Идентификаторы вопросов прежних версий банка по номеру версии
+        self.bank_ids = {}
+
+    @property
+    def stats(self):
+        return self.pool.stats
+
+    async def open(self):
+        await self.pool.open()
+
+    async def close(self):
+        await self.pool.close()
+
+    @db_timed
+    async def load_bank_ids(self, db, version):
+        """
+        Возвращает идентификаторы вопросов банка указанной версии в порядке плотных индексов.
+
+        Текущая версия берется из памяти, прежние - из таблицы bank_versions.
+
+        Args:
+            db (aiosqlite.Connection): Соединение с базой данных.
+            version (int): Версия банка вопросов.
+
+        Returns:
+            array: Массив идентификаторов или None, если версия неизвестна.
+        """
+        if self.bank is not None and version == self.bank.version:
+            return self.bank.ids
+        ids = self.bank_ids.get(version)
+        if ids is None:
+            async with db.execute('SELECT question_ids FROM bank_versions WHERE version = ?', (version,)) as cursor:
+                row = await cursor.fetchone()
+            if row is None:
+                return None
+            ids = self.bank_ids[version] = array('q', row[0])
+        return ids
+
+    @db_timed
+    async def load_session(self, user_id):
+        """
+        Загружает состояние квиза пользователя.
+
+        В режиме хранения 'table' ответы читаются из user_answers, в режиме 'bitset' -
+        из битовых карт quiz_state. Очередь повторения читается из review_queue по индексу
+        (user_id, due_at) уже упорядоченной по времени повторения. Битовые карты, записанные при другой версии банка вопросов,
+        переводятся в идентификаторы вопросов через bank_versions, и состояние помечается для перезаписи.
+
+        Args:
+            user_id (int): Идентификатор пользователя.
+
+        Returns:
+            StoredSession: Состояние квиза. Для нового пользователя - состояние с exists=False.
+        """
+        async with self.pool.reader() as db:
+            async with db.execute('''SELECT current_question_id, answered_bits, correct_bits, wrong_bits, bank_version, order_seed, order_cursor,
+                                     category, difficulty FROM quiz_state WHERE user_id = ?''', (user_id,)) as cursor:
+                row = await cursor.fetchone()
+
+            answers = []
+            outdated = False
+            if self.progress_storage == 'bitset':
+                if row is not None:
+                    stored_version = row[4]
+                    ids = await self.load_bank_ids(db, stored_version) if stored_version is not None else None
+                    if ids is None:
+                        if stored_version is not None and self.logger is not None:
+                            self.logger.error(f"Неизвестная версия банка вопросов {stored_version} у пользователя {user_id}")
+                        ids = self.bank.ids
+                    outdated = stored_version is not None and stored_version != self.bank.version
+                    answered, correct, wrong = (bitset.from_blob(blob) for blob in row[1:4])
+                    for index in bitset.iter_bits(answered):
+                        if index >= len(ids):
+                            continue
+                        if bitset.has_bit(correct, index):
+                            outcome = 'correct'
+                        elif bitset.has_bit(wrong, index):
+                            outcome = 'wrong'
+                        else:
+                            outcome = None
+                        answers.append((ids[index], outcome))
+            else:
+                async with db.execute('SELECT question_id, outcome FROM user_answers WHERE user_id = ?', (user_id,)) as cursor:
+                    answers = await cursor.fetchall()
+
+            async with db.execute('''SELECT question_id, due_at, interval, ease, repetitions FROM review_queue
+                                     WHERE user_id = ? ORDER BY due_at''', (user_id,)) as cursor:
+                reviews = [ReviewItem(*review) async for review in cursor]
+
+        if row is None:
+            return StoredSession(False, answers=answers, reviews=reviews)
+        return StoredSession(True, row[0], row[4], row[5], row[6] or 0, row[7], row[8], answers, reviews, outdated)
+
+    @db_timed
+    async def write_changes(self, changes):
+        """
+        Записывает изменения сессий в базу данных.
+
+        Запись ставится в очередь пула соединений и фиксируется вместе с записями других
+        пользователей в одной групповой транзакции.
+
+        Args:
+            changes (list): Список объектов SessionChanges.
+        """
+        await self.pool.submit(self.write_session_changes, changes)
+
+    def outcomes_to_bits(self, outcomes, bank):
+        """
+        Упаковывает результаты ответов в битовые карты для режима хранения 'bitset'.
+
+        Args:
+            outcomes (dict): Результаты ответов по идентификаторам вопросов.
+            bank (QuestionBank): Банк вопросов, по индексам которого строятся карты.
+
+        Returns:
+            tuple: Битовые карты отвеченных, правильных и неправильных вопросов.
+        """
+        answered = correct = wrong = 0
+        for question_id, outcome in outcomes.items():
+            index = bank.index_of(question_id)
+            if index is None:
+                continue
+            mask = 1 << index
+            answered |= mask
+            if outcome == 'correct':
+                correct |= mask
+            elif outcome == 'wrong':
+                wrong |= mask
+        return answered, correct, wrong
+
+    @db_timed
+    async def write_session_changes(self, db, changes):
+        """
+        Записывает изменения сессий через соединение для записи.
+
+        Вместе с состоянием записывается версия банка вопросов, по индексам которого
+        построены битовые карты. В той же транзакции обновляются агрегатные таблицы:
+        счетчики пользователя в user_stats и счетчики первых ответов на вопросы в question_stats.
+
+        Args:
+            db (aiosqlite.Connection): Соединение для записи с открытой транзакцией.
+            changes (list): Список объектов SessionChanges.
+        """
+        now = int(time.time())
+        for change in changes:
+            if change.reset:
+                await db.execute('DELETE FROM user_answers WHERE user_id = ?', (change.user_id,))
+                await db.execute('DELETE FROM review_queue WHERE user_id = ?', (change.user_id,))
+                await db.execute('''UPDATE score_counts SET users = users - 1
+                                    WHERE correct = (SELECT correct FROM user_stats WHERE user_id = ?)''', (change.user_id,))
+                await db.execute('DELETE FROM user_stats WHERE user_id = ?', (change.user_id,))
+                await db.execute('DELETE FROM quiz_state WHERE user_id = ?', (change.user_id,))
+            if not change.exists:
+                continue
+
+            if change.reviews:
+                await self.write_review_changes(db, change.user_id, change.reviews)
+            if change.answers:
+                await self.write_stats_changes(db, change, now)
+
+            if self.progress_storage == 'bitset':
+                await db.execute('''INSERT INTO quiz_state (user_id, current_question_id, answered_bits, correct_bits, wrong_bits, bank_version,
+                                                            order_seed, order_cursor, category, difficulty) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                    ON CONFLICT (user_id) DO UPDATE SET current_question_id = excluded.current_question_id,
+                                    answered_bits = excluded.answered_bits, correct_bits = excluded.correct_bits, wrong_bits = excluded.wrong_bits,
+                                    bank_version = excluded.bank_version, order_seed = excluded.order_seed, order_cursor = excluded.order_cursor,
+                                    category = excluded.category, difficulty = excluded.difficulty''',
+                                 (change.user_id, change.current_question_id, bitset.to_blob(change.answered_bits), bitset.to_blob(change.correct_bits),
+                                  bitset.to_blob(change.wrong_bits), change.bank_version,
+                                  change.order_seed, change.order_cursor, change.category, change.difficulty))
+                continue
+
+            await db.execute('''INSERT INTO quiz_state (user_id, current_question_id, bank_version, order_seed, order_cursor, category, difficulty)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)
+                                ON CONFLICT (user_id) DO UPDATE SET current_question_id = excluded.current_question_id, bank_version = excluded.bank_version,
+                                order_seed = excluded.order_seed, order_cursor = excluded.order_cursor,
+                                category = excluded.category, difficulty = excluded.difficulty''',
+                             (change.user_id, change.current_question_id, change.bank_version, change.order_seed, change.order_cursor,
+                              change.category, change.difficulty))
+            if change.answers:
+                await db.executemany('''INSERT INTO user_answers (user_id, question_id, outcome, answered_at) VALUES (?, ?, ?, ?)
+                                        ON CONFLICT (user_id, question_id) DO UPDATE SET outcome = COALESCE(excluded.outcome, outcome)''',
+                                     [(change.user_id, question_id, outcome, now) for question_id, outcome in change.answers.items()])
+
+    @db_timed
+    async def write_review_changes(self, db, user_id, reviews):
+        """
+        Записывает измененные расписания повторения вопросов пользователя.
+
+        Args:
+            db (aiosqlite.Connection): Соединение для записи с открытой транзакцией.
+            user_id (int): Идентификатор пользователя.
+            reviews (dict): Расписания ReviewItem по идентификаторам вопросов; None - удаление из очереди.
+        """
+        removed = [(user_id, question_id) for question_id, item in reviews.items() if item is None]
+        scheduled = [(user_id, *item.as_row()) for item in reviews.values() if item is not None]
+        if removed:
+            await db.executemany('DELETE FROM review_queue WHERE user_id = ? AND question_id = ?', removed)
+        if scheduled:
+            await db.executemany('''INSERT INTO review_queue (user_id, question_id, due_at, interval, ease, repetitions) VALUES (?, ?, ?, ?, ?, ?)
+                                    ON CONFLICT (user_id, question_id) DO UPDATE SET due_at = excluded.due_at, interval = excluded.interval,
+                                    ease = excluded.ease, repetitions = excluded.repetitions''', scheduled)
+
+    @db_timed
+    async def write_stats_changes(self, db, change, now):
+        """
+        Обновляет агрегатные таблицы статистики по изменениям сессии.
+
+        Счетчики пользователя записываются целиком из сессии, поэтому повторная запись
+        тех же изменений не искажает их. Если меняется количество правильных ответов пользователя,
+        он переносится в score_counts из строки прежнего количества в строку нового.
+        Счетчики вопроса увеличиваются только на первые ответы пользователя (first_answers).
+
+        Args:
+            db (aiosqlite.Connection): Соединение для записи с открытой транзакцией.
+            change (SessionChanges): Изменения сессии пользователя.
+            now (int): Текущее время (Unix time).
+        """
+        async with db.execute('SELECT correct FROM user_stats WHERE user_id = ?', (change.user_id,)) as cursor:
+            previous = await cursor.fetchone()
+        if previous is None or previous[0] != change.correct_count:
+            if previous is not None:
+                await db.execute('UPDATE score_counts SET users = users - 1 WHERE correct = ?', previous)
+            await db.execute('''INSERT INTO score_counts (correct, users) VALUES (?, 1)
+                                ON CONFLICT (correct) DO UPDATE SET users = users + 1''', (change.correct_count,))
+        await db.execute('''INSERT INTO user_stats (user_id, answered, correct, wrong, updated_at) VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT (user_id) DO UPDATE SET answered = excluded.answered, correct = excluded.correct,
+                            wrong = excluded.wrong, updated_at = excluded.updated_at''',
+                         (change.user_id, change.answered_count, change.correct_count, change.wrong_count, now))
+        if change.first_answers:
+            await db.executemany('''INSERT INTO question_stats (question_id, attempts, correct) VALUES (?, 1, ?)
+                                    ON CONFLICT (question_id) DO UPDATE SET attempts = attempts + 1, correct = correct + excluded.correct''',
+                                 [(question_id, int(outcome == 'correct')) for question_id, outcome in change.first_answers.items()])
+
+    @db_timed
+    async def write_bank_version(self, db, bank):
+        """
+        Сохраняет идентификаторы вопросов версии банка, чтобы сопоставлять с ними старый прогресс.
+
+        Args:
+            db (aiosqlite.Connection): Соединение для записи с открытой транзакцией.
+            bank (QuestionBank): Банк вопросов.
+        """
+        await db.execute('INSERT OR IGNORE INTO bank_versions (version, question_ids, created_at) VALUES (?, ?, ?)',
+                         (bank.version, bank.ids.tobytes(), int(time.time())))
+
+    @db_timed
+    async def save_bank_version(self, bank):
+        """
+        Записывает версию банка вопросов после его перезагрузки.
+
+        Args:
+            bank (QuestionBank): Новый банк вопросов.
+        """
+        self.bank = bank
+        await self.pool.submit(self.write_bank_version, bank)
+
+    @db_timed
+    async def get_leaderboard(self, limit):
+        """
+        Возвращает лучших пользователей по количеству правильных ответов.
+
+        Чтение идет по индексу idx_user_stats_top и не агрегирует прогресс пользователей.
+        При равенстве правильных ответов выше тот, кто ответил на меньшее количество вопросов.
+
+        Args:
+            limit (int): Количество пользователей.
+
+        Returns:
+            list: Тройки (идентификатор пользователя, правильных, отвечено).
+        """
+        async with self.pool.reader() as db:
+            async with db.execute('''SELECT user_id, correct, answered FROM user_stats
+                                     ORDER BY correct DESC, answered LIMIT ?''', (limit,)) as cursor:
+                return await cursor.fetchall()
+
+    @db_timed
+    async def count_ahead(self, correct):
+        """
+        Считает пользователей, у которых больше correct правильных ответов.
+
+        Складываются строки гистограммы score_counts с большим количеством правильных ответов,
+        поэтому стоимость зависит от количества различных результатов, а не от места пользователя.
+        """
+        async with self.pool.reader() as db:
+            async with db.execute('SELECT COALESCE(SUM(users), 0) FROM score_counts WHERE correct > ?', (correct,)) as cursor:
+                return (await cursor.fetchone())[0]
+
+    @db_timed
+    async def load_stats(self):
+        """
+        Читает агрегатные таблицы статистики через соединение для чтения.
+
+        Returns:
+            tuple: Количество пользователей, их ответов и правильных ответов и словарь
+                {идентификатор вопроса: (попыток, правильных первых ответов)}.
+        """
+        async with self.pool.reader() as db:
+            async with db.execute('SELECT COUNT(*), COALESCE(SUM(answered), 0), COALESCE(SUM(correct), 0) FROM user_stats') as cursor:
+                users, answers, correct = await cursor.fetchone()
+            async with db.execute('SELECT question_id, attempts, correct FROM question_stats') as cursor:
+                question_stats = {question_id: (attempts, correct_count) async for question_id, attempts, correct_count in cursor}
+        return users, answers, correct, question_stats
+
+    @db_timed
+    async def migrate_legacy_answers(self, db):
+        """
+        Переносит ответы из устаревших текстовых столбцов quiz_state в таблицу user_answers.
+
+        Раньше отвеченные, правильные и неправильные вопросы хранились в quiz_state строками
+        идентификаторов через запятую. Миграция выполняется один раз: после переноса
+        столбцы очищаются, а версия схемы в PRAGMA user_version повышается.
+
+        Args:
+            db (aiosqlite.Connection): Соединение для записи.
+
+        Returns:
+            dict: Перенесенные результаты ответов {пользователь: {вопрос: результат}}.
+        """
+        async with db.execute('PRAGMA table_info(quiz_state)') as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        if 'answered_questions' not in columns:
+            return {}
+
+        now = int(time.time())
+        rows = []
+        migrated = {}
+        async with db.execute('SELECT user_id, answered_questions, correct_questions, wrong_questions FROM quiz_state') as cursor:
+            async for user_id, answered, correct, wrong in cursor:
+                outcomes = migrated[user_id] = {}
+                for question_id in filter(None, (answered or '').split(',')):
+                    outcomes[int(question_id)] = None
+                for question_id in filter(None, (wrong or '').split(',')):
+                    outcomes[int(question_id)] = 'wrong'
+                for question_id in filter(None, (correct or '').split(',')):
+                    outcomes[int(question_id)] = 'correct'
+                rows.extend((user_id, question_id, outcome, now) for question_id, outcome in outcomes.items())
+
+        await db.executemany('INSERT OR IGNORE INTO user_answers (user_id, question_id, outcome, answered_at) VALUES (?, ?, ?, ?)', rows)
+        await db.execute('UPDATE quiz_state SET answered_questions = NULL, correct_questions = NULL, wrong_questions = NULL')
+        if self.logger is not None:
+            self.logger.info(f"Перенесено ответов из quiz_state в user_answers: {len(rows)}")
+        return migrated
+
+    @db_timed
+    async def write_legacy_bitsets(self, db, migrated):
+        """
+        Записывает перенесенные из текстовых столбцов ответы в битовые карты quiz_state.
+
+        Нужна в режиме хранения 'bitset', в котором прогресс читается только из битовых карт.
+        Карты строятся по индексам текущего банка вопросов, вопросы, которых нет в банке, пропускаются.
+
+        Args:
+            db (aiosqlite.Connection): Соединение для записи.
+            migrated (dict): Результаты ответов {пользователь: {вопрос: результат}} из migrate_legacy_answers.
+        """
+        rows = []
+        for user_id, outcomes in migrated.items():
+            answered, correct, wrong = self.outcomes_to_bits(outcomes, self.bank)
+            rows.append((bitset.to_blob(answered), bitset.to_blob(correct), bitset.to_blob(wrong), self.bank.version, user_id))
+        await db.executemany('''UPDATE quiz_state SET answered_bits = ?, correct_bits = ?, wrong_bits = ?, bank_version = ?
+                                WHERE user_id = ?''', rows)
+
+    @db_timed
+    async def add_columns(self, db, columns, column_type):
+        """
+        Добавляет в quiz_state недостающие столбцы.
+
+        Args:
+            db (aiosqlite.Connection): Соединение для записи.
+            columns (tuple): Имена столбцов.
+            column_type (str): Тип столбцов.
+        """
+        async with db.execute('PRAGMA table_info(quiz_state)') as cursor:
+            existing = {row[1] for row in await cursor.fetchall()}
+        for column in columns:
+            if column not in existing:
+                await db.execute(f'ALTER TABLE quiz_state ADD COLUMN {column} {column_type}')
+
+    @db_timed
+    async def backfill_stats(self, db):
+        """
+        Заполняет агрегатные таблицы статистики по уже записанному прогрессу пользователей.
+
+        В режиме хранения 'table' счетчики считаются группировкой user_answers, в режиме 'bitset' -
+        подсчетом битов quiz_state с переводом индексов в идентификаторы вопросов через bank_versions.
+
+        Args:
+            db (aiosqlite.Connection): Соединение для записи.
+        """
+        now = int(time.time())
+        if self.progress_storage != 'bitset':
+            await db.execute('''INSERT OR REPLACE INTO user_stats (user_id, answered, correct, wrong, updated_at)
+                                SELECT user_id, COUNT(*), SUM(outcome = 'correct'), SUM(outcome = 'wrong'), ?
+                                FROM user_answers GROUP BY user_id''', (now,))
+            await db.execute('''INSERT OR REPLACE INTO question_stats (question_id, attempts, correct)
+                                SELECT question_id, COUNT(*), SUM(outcome = 'correct')
+                                FROM user_answers WHERE outcome IS NOT NULL GROUP BY question_id''')
+            return
+
+        users = []
+        questions = {}
+        async with db.execute('SELECT user_id, answered_bits, correct_bits, wrong_bits, bank_version FROM quiz_state') as cursor:
+            rows = await cursor.fetchall()
+        for user_id, answered, correct, wrong, version in rows:
+            answered, correct, wrong = (bitset.from_blob(blob) for blob in (answered, correct, wrong))
+            if not answered:
+                continue
+            users.append((user_id, bitset.count(answered), bitset.count(correct), bitset.count(wrong), now))
+            ids = await self.load_bank_ids(db, version) if version is not None else None
+            if ids is None:
+                continue
+            for index in bitset.iter_bits(correct | wrong):
+                if index < len(ids):
+                    row = questions.setdefault(ids[index], [0, 0])
+                    row[0] += 1
+                    row[1] += bitset.has_bit(correct, index)
+        await db.executemany('INSERT OR REPLACE INTO user_stats (user_id, answered, correct, wrong, updated_at) VALUES (?, ?, ?, ?, ?)', users)
+        await db.executemany('INSERT OR REPLACE INTO question_stats (question_id, attempts, correct) VALUES (?, ?, ?)',
+                             [(question_id, attempts, correct) for question_id, (attempts, correct) in questions.items()])
+
+    @db_timed
+    async def init(self, bank):
+        """
+        Создает таблицы базы данных и выполняет миграции схемы.
+
+        Таблица quiz_state хранит текущий вопрос пользователя, битовые карты прогресса для режима
+        хранения 'bitset', версию банка вопросов и порядок вопросов с выбранными категорией и сложностью,
+        таблица user_answers - ответы пользователя на каждый вопрос. При первом запуске на старой базе
+        в user_answers переносятся ответы из текстовых столбцов quiz_state и добавляются новые столбцы.
+        Таблица review_queue хранит расписания повторения вопросов с индексом по времени повторения.
+        Агрегатные таблицы user_stats (с индексом для рейтинга), score_counts (количество пользователей
+        с каждым количеством правильных ответов, для места в рейтинге) и question_stats поддерживаются
+        при записи ответов и при первом запуске заполняются по уже записанному прогрессу.
+        Таблица bank_versions хранит идентификаторы вопросов каждой версии банка, начиная с текущей.
+
+        Args:
+            bank (QuestionBank): Текущий банк вопросов.
+        """
+        self.bank = bank
+        async with self.pool.writer() as db:
+            await db.execute('''CREATE TABLE IF NOT EXISTS quiz_state (
+                                user_id INTEGER PRIMARY KEY,
+                                current_question_id INTEGER,
+                                answered_bits BLOB,
+                                correct_bits BLOB,
+                                wrong_bits BLOB,
+                                bank_version INTEGER,
+                                order_seed INTEGER,
+                                order_cursor INTEGER,
+                                category TEXT,
+                                difficulty TEXT)''')
+            await db.execute('''CREATE TABLE IF NOT EXISTS user_answers (
+                                user_id INTEGER NOT NULL,
+                                question_id INTEGER NOT NULL,
+                                outcome TEXT,
+                                answered_at INTEGER NOT NULL,
+                                PRIMARY KEY (user_id, question_id)) WITHOUT ROWID''')
+            await db.execute('CREATE INDEX IF NOT EXISTS idx_user_answers_outcome ON user_answers (user_id, outcome)')
+            await db.execute('''CREATE TABLE IF NOT EXISTS review_queue (
+                                user_id INTEGER NOT NULL,
+                                question_id INTEGER NOT NULL,
+                                due_at INTEGER NOT NULL,
+                                interval REAL NOT NULL,
+                                ease REAL NOT NULL,
+                                repetitions INTEGER NOT NULL,
+                                PRIMARY KEY (user_id, question_id)) WITHOUT ROWID''')
+            await db.execute('CREATE INDEX IF NOT EXISTS idx_review_queue_due ON review_queue (user_id, due_at)')
+            await db.execute('''CREATE TABLE IF NOT EXISTS user_stats (
+                                user_id INTEGER PRIMARY KEY,
+                                answered INTEGER NOT NULL,
+                                correct INTEGER NOT NULL,
+                                wrong INTEGER NOT NULL,
+                                updated_at INTEGER NOT NULL)''')
+            await db.execute('CREATE INDEX IF NOT EXISTS idx_user_stats_top ON user_stats (correct DESC, answered)')
+            await db.execute('''CREATE TABLE IF NOT EXISTS score_counts (
+                                correct INTEGER PRIMARY KEY,
+                                users INTEGER NOT NULL)''')
+            await db.execute('''CREATE TABLE IF NOT EXISTS question_stats (
+                                question_id INTEGER PRIMARY KEY,
+                                attempts INTEGER NOT NULL,
+                                correct INTEGER NOT NULL)''')
+            await db.execute('''CREATE TABLE IF NOT EXISTS bank_versions (
+                                version INTEGER PRIMARY KEY,
+                                question_ids BLOB NOT NULL,
+                                created_at INTEGER NOT NULL)''')
+
+            async with db.execute('PRAGMA user_version') as cursor:
+                schema_version = (await cursor.fetchone())[0]
+            migrated = {}
+            if schema_version < 1:
+                migrated = await self.migrate_legacy_answers(db)
+                await db.execute('PRAGMA user_version = 1')
+            if schema_version < 2:
+                await self.add_columns(db, ('answered_bits', 'correct_bits', 'wrong_bits'), 'BLOB')
+                await db.execute('PRAGMA user_version = 2')
+            if schema_version < 3:
+                await self.add_columns(db, ('bank_version',), 'INTEGER')
+                await db.execute('PRAGMA user_version = 3')
+            if schema_version < 4:
+                await self.add_columns(db, ('order_seed', 'order_cursor'), 'INTEGER')
+                await db.execute('PRAGMA user_version = 4')
+            if schema_version < 5:
+                await self.add_columns(db, ('category', 'difficulty'), 'TEXT')
+                await db.execute('PRAGMA user_version = 5')
+            if migrated and self.progress_storage == 'bitset':
+                await self.write_legacy_bitsets(db, migrated)
+            if schema_version < 6:
+                await self.backfill_stats(db)
+                await db.execute('PRAGMA user_version = 6')
+            if schema_version < 7:
+                await db.execute('DELETE FROM score_counts')
+                await db.execute('INSERT INTO score_counts (correct, users) SELECT correct, COUNT(*) FROM user_stats GROUP BY correct')
+                await db.execute('PRAGMA user_version = 7')
+            await self.write_bank_version(db, bank)
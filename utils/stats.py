@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+
+class StatsSnapshot:
+    """
+    Материализованная сводная статистика бота.
+
+    Пересчитывается фоновой задачей (StatsRefresher) из агрегатных таблиц user_stats
+    и question_stats, поэтому команды, показывающие сводку, читают ее из памяти,
+    а не агрегируют таблицы на каждый запрос.
+
+    Атрибуты:
+        users (int): Количество пользователей с ответами.
+        answers (int): Количество ответов всех пользователей.
+        correct (int): Количество правильных ответов всех пользователей.
+        categories (list): Тройки (категория, попыток, правильных) по алфавиту.
+        hardest (list): Тройки (идентификатор вопроса, попыток, правильных) по возрастанию доли правильных.
+        refreshed_at (float): Время пересчета (Unix time) или None, если статистика еще не считалась.
+    """
+
+    __slots__ = ('users', 'answers', 'correct', 'categories', 'hardest', 'refreshed_at')
+
+    def __init__(self):
+        self.users = 0
+        self.answers = 0
+        self.correct = 0
+        self.categories = []
+        self.hardest = []
+        self.refreshed_at = None
+
+    def update(self, users, answers, correct, categories, hardest):
+        """ Заменяет статистику результатами нового пересчета. """
+        self.users = users
+        self.answers = answers
+        self.correct = correct
+        self.categories = categories
+        self.hardest = hardest
+        self.refreshed_at = time.time()
+
+
+#####################################################################################
+# percent
+
+
+def percent(correct, attempts):
+    """ Возвращает долю правильных ответов в процентах (0 при отсутствии попыток). """
+    return round(100 * correct / attempts) if attempts else 0
+
+
+class StatsRefresher:
+    """
+    Фоновая задача, пересчитывающая тяжелую статистику раз в interval секунд.
+
+    Первый пересчет выполняется сразу при запуске. Ошибка пересчета записывается в лог
+    и не останавливает задачу: до следующего пересчета остается прежняя статистика.
+
+    Args:
+        refresh (callable): Корутина без аргументов, выполняющая пересчет.
+        interval (float): Интервал пересчета в секундах (0 - только при запуске).
+        logger (logging.Logger): Логгер для ошибок пересчета.
+    """
+
+    def __init__(self, refresh, interval=60, logger=None):
+        self.refresh = refresh
+        self.interval = interval
+        self.logger = logger
+        self._task = None
+
+    async def run_once(self):
+        """ Выполняет пересчет, записывая ошибку в лог. """
+        try:
+            await self.refresh()
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Ошибка при пересчете статистики: {e}")
+
+    async def _run(self):
+        await self.run_once()
+        while self.interval > 0:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    def start(self):
+        """ Запускает фоновый пересчет статистики. """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """ Останавливает фоновый пересчет статистики. """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,176 @@
+from collections import Counter
+from typing import NamedTuple, Protocol
+from utils.spaced_repetition import ReviewItem
+from utils.metrics import db_timed
+
+
+class StoredSession(NamedTuple):
+    """
+    Сохраненное состояние квиза пользователя, из которого db.load_session собирает Session.
+
+    Attributes:
+        exists (bool): Есть ли у пользователя сохраненный квиз.
+        current_question_id (int): Текущий вопрос.
+        bank_version (int): Версия банка вопросов при последней записи состояния.
+        order_seed (int): Зерно порядка вопросов.
+        order_cursor (int): Позиция в порядке вопросов.
+        category (str): Выбранная категория.
+        difficulty (str): Выбранная сложность.
+        answers (list): Пары (идентификатор вопроса, результат ответа).
+        reviews (list): Расписания повторения ReviewItem по возрастанию времени повторения.
+        outdated (bool): Хранилище требует перезаписать состояние (например, битовые карты
+            построены по индексам другой версии банка).
+    """
+    exists: bool
+    current_question_id: int = None
+    bank_version: int = None
+    order_seed: int = None
+    order_cursor: int = 0
+    category: str = None
+    difficulty: str = None
+    answers: list = []
+    reviews: list = []
+    outdated: bool = False
+
+
+class StorageBackend(Protocol):
+    """
+    Хранилище прогресса пользователей, на которое опирается кеш сессий (db.session_cache).
+
+    Обработчики работают только с сессиями в памяти через функции db.py (get_session, record_answer,
+    get_result_counts, del_user_progress, check_user_exists и т. д.); хранилище загружает
+    состояние при первом обращении к сессии и записывает накопленные изменения сессий.
+    Реализации: SqliteStorage (utils/sqlite_storage.py) и MemoryStorage.
+
+    Счетчик stats считает операции хранилища: чтения ('reads'), записи ('writes') и транзакции ('commits').
+    """
+
+    stats: Counter
+
+    async def open(self):
+        """ Открывает хранилище. """
+
+    async def close(self):
+        """ Дожидается записи всех изменений и закрывает хранилище. """
+
+    async def init(self, bank):
+        """ Создает структуру хранилища и запоминает текущую версию банка вопросов. """
+
+    async def load_session(self, user_id) -> StoredSession:
+        """ Загружает состояние квиза пользователя. """
+
+    async def write_changes(self, changes):
+        """ Записывает список изменений сессий SessionChanges вместе с агрегатной статистикой. """
+
+    async def save_bank_version(self, bank):
+        """ Запоминает версию банка вопросов после его перезагрузки. """
+
+    async def get_leaderboard(self, limit) -> list:
+        """ Возвращает тройки (пользователь, правильных, отвечено) лучших пользователей. """
+
+    async def count_ahead(self, correct) -> int:
+        """ Возвращает количество пользователей, у которых больше correct правильных ответов. """
+
+    async def load_stats(self) -> tuple:
+        """ Возвращает пользователей, ответов, правильных ответов и словарь {вопрос: (попыток, правильных)}. """
+
+
+class MemoryStorage:
+    """
+    Хранилище прогресса пользователей в памяти процесса, без диска.
+
+    Данные пропадают при остановке бота, поэтому хранилище предназначено для нагрузочных тестов
+    (чтобы измерить стоимость обработчиков отдельно от ввода-вывода базы данных) и проверок.
+    Семантика записи совпадает с SqliteStorage: сброс прогресса удаляет все данные пользователя,
+    результат уже записанного ответа не затирается пустым, счетчики вопросов увеличиваются
+    только на первые ответы пользователей.
+    """
+
+    def __init__(self):
+        self.states = {}
+        self.answers = {}
+        self.reviews = {}
+        self.user_stats = {}
+        self.score_counts = Counter()
+        self.question_stats = {}
+        self.bank_version = None
+        self.stats = Counter()
+
+    async def open(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def init(self, bank):
+        self.bank_version = bank.version
+
+    @db_timed
+    async def load_session(self, user_id):
+        self.stats['reads'] += 1
+        state = self.states.get(user_id)
+        answers = list(self.answers.get(user_id, {}).items())
+        reviews = sorted((ReviewItem(*row) for row in self.reviews.get(user_id, {}).values()), key=lambda item: item.due_at)
+        if state is None:
+            return StoredSession(False, answers=answers, reviews=reviews)
+        return StoredSession(True, *state, answers=answers, reviews=reviews)
+
+    @db_timed
+    async def write_changes(self, changes):
+        for change in changes:
+            self.stats['writes'] += 1
+            user_id = change.user_id
+            if change.reset:
+                previous = self.user_stats.get(user_id)
+                if previous is not None:
+                    self.score_counts[previous[1]] -= 1
+                for table in (self.states, self.answers, self.reviews, self.user_stats):
+                    table.pop(user_id, None)
+            if not change.exists:
+                continue
+
+            if change.reviews:
+                reviews = self.reviews.setdefault(user_id, {})
+                for question_id, item in change.reviews.items():
+                    if item is None:
+                        reviews.pop(question_id, None)
+                    else:
+                        reviews[question_id] = item.as_row()
+            if change.answers:
+                previous = self.user_stats.get(user_id)
+                if previous is not None:
+                    self.score_counts[previous[1]] -= 1
+                self.score_counts[change.correct_count] += 1
+                self.user_stats[user_id] = (change.answered_count, change.correct_count, change.wrong_count)
+                for question_id, outcome in change.first_answers.items():
+                    attempts, correct = self.question_stats.get(question_id, (0, 0))
+                    self.question_stats[question_id] = (attempts + 1, correct + (outcome == 'correct'))
+                answers = self.answers.setdefault(user_id, {})
+                for question_id, outcome in change.answers.items():
+                    if outcome is not None or question_id not in answers:
+                        answers[question_id] = outcome
+            self.states[user_id] = (change.current_question_id, change.bank_version, change.order_seed, change.order_cursor,
+                                    change.category, change.difficulty)
+        self.stats['commits'] += 1
+
+    async def save_bank_version(self, bank):
+        self.bank_version = bank.version
+
+    @db_timed
+    async def get_leaderboard(self, limit):
+        self.stats['reads'] += 1
+        top = sorted(self.user_stats.items(), key=lambda item: (-item[1][1], item[1][0]))[:limit]
+        return [(user_id, correct, answered) for user_id, (answered, correct, _) in top]
+
+    @db_timed
+    async def count_ahead(self, correct):
+        self.stats['reads'] += 1
+        return sum(users for score, users in self.score_counts.items() if score > correct)
+
+    @db_timed
+    async def load_stats(self):
+        self.stats['reads'] += 1
+        users = len(self.user_stats)
+        answers = sum(answered for answered, _, _ in self.user_stats.values())
+        correct = sum(user_correct for _, user_correct, _ in self.user_stats.values())
+        return users, answers, correct, dict(sorted(self.question_stats.items()))
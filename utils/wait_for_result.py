@@ -1,8 +1,45 @@
+import asyncio
 import random
-import time
+from config import SUSPENSE_MODE, SUSPENSE_SECONDS, SUSPENSE_MIN_SECONDS, SUSPENSE_MAX_SECONDS
+from utils.send_scheduler import send_scheduler, PRIORITY_DECORATIVE
 
+
+#####################################################################################
+# get_suspense_duration
+def get_suspense_duration():
+    """
+    Возвращает длительность паузы перед объявлением результата в секундах.
+
+    Зависит от режима SUSPENSE_MODE: 'off' - без паузы, 'fixed' - SUSPENSE_SECONDS,
+    'random' - случайное значение от SUSPENSE_MIN_SECONDS до SUSPENSE_MAX_SECONDS.
+    Недопустимые значения режима отклоняются при загрузке config.
+    """
+    if SUSPENSE_MODE == 'off':
+        return 0
+    if SUSPENSE_MODE == 'fixed':
+        return SUSPENSE_SECONDS
+    return random.randint(SUSPENSE_MIN_SECONDS, SUSPENSE_MAX_SECONDS)
+
+
+#####################################################################################
+# wait_for_result
 async def wait_for_result(message):
-    random_sec = random.randint(3,5)
-    for sec in range(random_sec):
-        time.sleep(1)
-        await message.answer(".")
\ No newline at end of file
+    """
+    Показывает анимацию ожидания результата, не блокируя цикл событий.
+
+    Отправляет одно сообщение с точкой и каждую секунду дописывает в него еще одну,
+    редактируя сообщение на месте.
+
+    Args:
+        message (types.Message): Сообщение, в чат которого отправляется анимация.
+    """
+    seconds = get_suspense_duration()
+    if seconds <= 0:
+        return
+
+    dots_message = await send_scheduler.answer(message, ".", priority=PRIORITY_DECORATIVE, merge=False)
+    for dots in range(2, seconds + 1):
+        await asyncio.sleep(1)
+        if dots_message is not None:
+            send_scheduler.edit_text(dots_message, "." * dots)
+    await asyncio.sleep(1)
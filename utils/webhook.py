@@ -0,0 +1,56 @@
+import asyncio
+from aiohttp import web
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик вебхука с ограничением параллельности и противодавлением.
+
+    Отвечает Telegram сразу, а обновление обрабатывает в фоне. Одновременно обрабатывается
+    не больше workers обновлений, остальные ждут своей очереди. Если ожидающих и обрабатываемых
+    обновлений набирается max_pending, новые запросы отклоняются с кодом 503 и заголовком
+    Retry-After, и Telegram повторит их позже.
+
+    Переопределяет только публичный метод handle и сам ведет фоновые задачи, поэтому
+    не зависит от внутренних методов SimpleRequestHandler.
+
+    Args:
+        dispatcher (Dispatcher): Диспетчер бота.
+        bot (Bot): Экземпляр бота.
+        workers (int): Максимальное количество одновременно обрабатываемых обновлений.
+        max_pending (int): Максимальное количество принятых, но еще не обработанных обновлений.
+        retry_after (int): Значение заголовка Retry-After в секундах для отклоненных запросов.
+    """
+
+    def __init__(self, dispatcher, bot, workers=64, max_pending=1000, retry_after=1, **kwargs):
+        super().__init__(dispatcher=dispatcher, bot=bot, handle_in_background=True, **kwargs)
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._workers = asyncio.Semaphore(workers)
+        self._tasks = set()
+
+    def pending(self):
+        """ Возвращает количество принятых и еще не обработанных обновлений. """
+        return len(self._tasks)
+
+    async def handle(self, request):
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            return web.Response(body="Unauthorized", status=401)
+        if self.pending() >= self.max_pending:
+            return web.Response(status=503, headers={"Retry-After": str(self.retry_after)})
+        update = await request.json(loads=bot.session.json_loads)
+        task = asyncio.create_task(self._feed_update(bot, update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    __call__ = handle
+
+    async def _feed_update(self, bot, update):
+        async with self._workers:
+            result = await self.dispatcher.feed_raw_update(bot=bot, update=update, **self.data)
+        if isinstance(result, TelegramMethod):
+            await self.dispatcher.silent_call_request(bot=bot, result=result)
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault('TELEGRAM_TOKEN', '123456:HARNESS')
+os.environ.setdefault('SUSPENSE_MODE', 'off')
+os.environ.setdefault('DB_NAME', os.path.join(tempfile.mkdtemp(), 'harness.db'))
+os.environ.setdefault('SEND_CHAT_RATE', '0')
+os.environ.setdefault('SEND_GLOBAL_RATE', '0')
+# Логи прогона не нужны в директории logs проекта, а запись каждого обновления искажает замеры
+os.environ.setdefault('LOG_DIR', tempfile.mkdtemp())
+os.environ.setdefault('LOG_UPDATES', 'false')
+
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from config import WEBHOOK_PATH, WEBHOOK_SECRET
+from db import init_db, storage, session_cache
+from bot import create_webhook_app
+from utils.send_scheduler import send_scheduler
+from utils.fake_telegram import FakeSession, make_message_update, make_callback_update, iter_buttons
+
+
+#####################################################################################
+# wait_for_reply
+async def wait_for_reply(session, user_id, previous, timeout=10):
+    """ Ждет, пока бот пришлет пользователю новую клавиатуру или сообщение о завершении квиза. """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        message = session.last_markup.get(user_id)
+        if message is not None and message is not previous:
+            return message
+        if any("Квиз завершен" in text for text in session.texts[user_id]):
+            return None
+        await asyncio.sleep(0.005)
+    raise TimeoutError(f"Пользователь {user_id} не получил ответа от бота")
+
+
+#####################################################################################
+# play_quiz
+async def play_quiz(client, session, user_id, stats):
+    """ Проходит квиз от /start до последнего вопроса, отправляя обновления в вебхук. """
+    async def post(update):
+        headers = {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET} if WEBHOOK_SECRET else {}
+        while True:
+            response = await client.post(WEBHOOK_PATH, json=update, headers=headers)
+            stats['posted'] += 1
+            if response.status != 503:
+                return
+            stats['rejected'] += 1
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+
+    await post(make_message_update(user_id, "/start"))
+    await post(make_message_update(user_id, "Начать игру"))
+    message = await wait_for_reply(session, user_id, None)
+    while message is not None:
+        await post(make_callback_update(user_id, message, random.choice(list(iter_buttons(message)))))
+        stats['answers'] += 1
+        message = await wait_for_reply(session, user_id, message)
+
+
+#####################################################################################
+# main
+async def main():
+    """
+    Прогоняет синтетических пользователей через вебхук без обращения к сети.
+
+    Поднимает приложение вебхука на локальном тестовом сервере с ботом на FakeSession
+    и временной базой данных, после чего параллельно проходит квиз за каждого пользователя.
+    """
+    parser = argparse.ArgumentParser(description="Локальная проверка режима вебхука")
+    parser.add_argument("--users", type=int, default=20, help="количество одновременных пользователей")
+    parser.add_argument("--api-delay", type=float, default=0.0, help="задержка ответа Bot API в секундах")
+    args = parser.parse_args()
+
+    session = FakeSession(delay=args.api_delay)
+    bot = Bot(token=os.environ['TELEGRAM_TOKEN'], session=session, default=DefaultBotProperties(parse_mode='HTML'))
+    stats = {'posted': 0, 'rejected': 0, 'answers': 0}
+
+    await storage.open()
+    await init_db()
+    session_cache.start()
+    try:
+        async with TestClient(TestServer(create_webhook_app(bot))) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(play_quiz(client, session, 1000 + user, stats) for user in range(args.users)))
+            elapsed = time.perf_counter() - started
+    finally:
+        await send_scheduler.stop()
+        await session_cache.stop()
+        await storage.close()
+
+    print(f"Пользователей: {args.users}, обновлений: {stats['posted']}, ответов: {stats['answers']}, "
+          f"отклонено (503): {stats['rejected']}, время: {elapsed:.2f} с")
+    print(f"Вызовы Bot API: {dict(session.calls)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())